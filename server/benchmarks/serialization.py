@@ -0,0 +1,77 @@
+# Compares the per-row cost of building and serializing a page of each list model,
+# the validated path (model built with validation, then FastAPI's jsonable_encoder and JSONResponse)
+# against the lean one (from_query with model_construct, then ModelResponse with orjson).
+# Run from the `server` directory, no database needed, e.g.
+#   python -m benchmarks.serialization --page-size 15 --text-size 2000
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from common.responses import ModelResponse
+from data.models.category import Category
+from data.models.message import Message
+from data.models.reply import ReplyResponse
+from data.models.topic import TopicResponse
+from data.models.user import UserInfo
+
+NOW = datetime(2024, 5, 1, 12, 30)
+
+
+def sample_rows(text_size: int) -> dict[type, tuple]:
+    """
+    One database row per model, as the services read it
+    """
+    text = ('lorem ipsum ' * (text_size // 12 + 1))[:text_size]
+    return {
+        TopicResponse: (1, 'A topic title of average length', 7, 'username', 0, 12, 3, 'Category',
+                        42, 12, NOW, NOW, None),
+        ReplyResponse: (12, text, 'username', 1, 10, 2, 8, NOW, NOW),
+        UserInfo: ('username', 'user@example.com', 'First', 'Last'),
+        Message: (5, text, 7, 8, NOW, None),
+        Category: (3, 'Category', 0, 1),
+    }
+
+
+def measure(run, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-row cost of building and serializing the list models')
+    parser.add_argument('--page-size', type=int, default=15)
+    parser.add_argument('--text-size', type=int, default=2000, help='characters of reply and message texts')
+    parser.add_argument('--rounds', type=int, default=2000, help='pages per measurement')
+    args = parser.parse_args()
+
+    size = args.page_size
+    print(f'{"model":<15}{"before µs/row":>15}{"after µs/row":>15}{"speedup":>10}')
+    for model, row in sample_rows(args.text_size).items():
+        rows = [row] * size
+        # the keyword arguments the former from_query passed to the validating constructor
+        fields = [model.from_query(*row).model_dump()] * size
+
+        def before():
+            page = [model(**kwargs) for kwargs in fields]
+            return JSONResponse(jsonable_encoder(page)).body
+
+        def after():
+            page = [model.from_query(*row) for row in rows]
+            return ModelResponse(page).body
+
+        # both paths must send the same document
+        assert json.loads(before()) == json.loads(after()), model.__name__
+        before_time = measure(before, args.rounds) / size * 1e6
+        after_time = measure(after, args.rounds) / size * 1e6
+        print(f'{model.__name__:<15}{before_time:>15.2f}{after_time:>15.2f}{before_time / after_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# Shows the plan and the latency of every sorted topic listing.
+# Run from the `server` directory against a scratch copy of the database, e.g.
+#   python -m benchmarks.topics_sort --populate --topics 1000000
+#
+# --populate adds synthetic topics until there are --topics of them, using MariaDB's
+# Sequence engine, and rebuilds the topic_counts summary table.
+# For each sort the report shows the first table of the EXPLAIN plan (an index read in order
+# has no "Using filesort") and the p50/p95 latency of the first and of a deep page,
+# next to the former `ORDER BY column IS NULL, column` form and to the keyset seek
+# past the last row of the deep page. best_reply_id desc is the mixed-direction case,
+# best_reply_missing ascending then best_reply_id descending.
+# Exits with status 1 when an indexed or keyset read still needs a filesort.
+# --output also writes the report to a file, e.g. to attach it to a review.
+import argparse
+import statistics
+import time
+from pathlib import Path
+from data.database import read_query, update_query, transaction, close_pool
+from services import topics_services
+from services.topics_services import _SORT_COLUMNS, _filtered_topics_sql, _order_by, _seek_filter
+
+POPULATE_CHUNK = 100_000
+
+
+def populate(target: int) -> None:
+    existing = read_query('SELECT COUNT(*) FROM topics')[0][0]
+    user_ids = [row[0] for row in read_query('SELECT user_id FROM users ORDER BY user_id')]
+    category_ids = [row[0] for row in read_query('SELECT category_id FROM categories ORDER BY category_id')]
+    reply_id = read_query('SELECT MIN(reply_id) FROM replies')[0][0]
+
+    for first in range(existing + 1, target + 1, POPULATE_CHUNK):
+        last = min(first + POPULATE_CHUNK - 1, target)
+        with transaction():
+            # a third of the topics get a best reply, so best_reply_id sorts see both NULLs and values
+            update_query(
+                f'''INSERT INTO topics(title, user_id, is_locked, best_reply_id, category_id)
+                    SELECT CONCAT('Benchmark topic ', MD5(seq)),
+                           ELT(1 + seq % ?, {','.join('?' * len(user_ids))}),
+                           seq % 5 = 0,
+                           IF(seq % 3 = 0, ?, NULL),
+                           ELT(1 + seq % ?, {','.join('?' * len(category_ids))})
+                    FROM seq_{first}_to_{last}''',
+                (len(user_ids), *user_ids, reply_id, len(category_ids), *category_ids))
+        print(f'Inserted topics up to #{last}')
+
+    with transaction():
+        update_query('DELETE FROM topic_counts')
+        update_query('''INSERT INTO topic_counts(category_id, is_locked, total)
+                        SELECT category_id, is_locked, COUNT(*) FROM topics GROUP BY category_id, is_locked''')
+    read_query('ANALYZE TABLE topics')
+
+
+def explain(sql: str, params: tuple) -> tuple[str, bool]:
+    """
+    The plan of the topics table, which tells how the page is sorted, and whether it needs a filesort
+    """
+    for row in read_query(f'EXPLAIN {sql}', params):
+        if row[2] == 't':
+            extra = row[9] or ''
+            return f'type={row[3]} key={row[5]} rows={row[8]} extra={extra}', 'filesort' in extra
+    return '-', False
+
+
+def measure(sql: str, params: tuple, runs: int) -> tuple[float, float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        read_query(sql, params)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def legacy_order_by(column: str, sort: str) -> str:
+    return f' ORDER BY {column} IS NULL, {column} {sort.upper()}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN and time the sorted topic listings')
+    parser.add_argument('--populate', action='store_true', help='add synthetic topics first')
+    parser.add_argument('--topics', type=int, default=1_000_000, help='number of topics to populate up to')
+    parser.add_argument('--runs', type=int, default=20, help='executions per query')
+    parser.add_argument('--size', type=int, default=15, help='page size')
+    parser.add_argument('--deep-page', type=int, default=1000, help='page number of the deep page')
+    parser.add_argument('--output', type=Path, help='also write the report to this file')
+    args = parser.parse_args()
+
+    lines, filesorts = [], []
+
+    def report(line: str = '') -> None:
+        print(line)
+        lines.append(line)
+
+    try:
+        if args.populate:
+            populate(args.topics)
+
+        report(f'{read_query("SELECT COUNT(*) FROM topics")[0][0]} topics\n')
+        base_sql, base_params = _filtered_topics_sql()
+
+        for sort_by, (column, row_index) in _SORT_COLUMNS.items():
+            for sort in ('asc', 'desc'):
+                report(f'sort_by={sort_by} sort={sort}')
+                for name, order_by in (('indexed', _order_by(column, sort)),
+                                       ('legacy', legacy_order_by(column, sort))):
+                    for page in (1, args.deep_page):
+                        sql = base_sql + order_by + ' LIMIT ? OFFSET ?'
+                        params = base_params + (args.size, args.size * (page - 1))
+                        p50, p95 = measure(sql, params, args.runs)
+                        plan, filesort = explain(sql, params)
+                        report(f'  {name:8} page {page:<6} p50={p50:8.2f}ms p95={p95:8.2f}ms  {plan}')
+                        if filesort and name == 'indexed':
+                            filesorts.append(f'{sort_by} {sort} page {page}')
+
+                # the keyset seek past the last row of the deep page costs the same as the first page
+                last = read_query(base_sql + _order_by(column, sort) + ' LIMIT 1 OFFSET ?',
+                                  base_params + (args.size * args.deep_page - 1,))
+                if last:
+                    sql, params = _filtered_topics_sql(
+                        extra_filters=[_seek_filter(column, sort, (last[0][row_index], last[0][0]))])
+                    sql += _order_by(column, sort) + ' LIMIT ?'
+                    params += (args.size,)
+                    p50, p95 = measure(sql, params, args.runs)
+                    plan, filesort = explain(sql, params)
+                    report(f'  keyset   after {args.deep_page:<5} p50={p50:8.2f}ms p95={p95:8.2f}ms  {plan}')
+                    if filesort:
+                        filesorts.append(f'{sort_by} {sort} keyset')
+
+                # the full listing path, count included
+                start = time.perf_counter()
+                topics_services.get_all(1, args.size, sort=sort, sort_by=sort_by)
+                report(f'  get_all  page 1      {(time.perf_counter() - start) * 1000:8.2f}ms\n')
+
+        report('Indexed reads with a filesort: ' + (', '.join(filesorts) or 'none'))
+    finally:
+        close_pool()
+        if args.output:
+            args.output.write_text('\n'.join(lines) + '\n')
+
+    if filesorts:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
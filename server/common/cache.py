@@ -0,0 +1,216 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a time-to-live and LRU eviction
+
+    - Entries expire `ttl` seconds after being set, unless a ttl is given per entry
+    - When full, the least recently used entry is evicted
+    - Keeps hit/miss/eviction counters
+    - With an `index` field, the keys are also kept by that field of their values,
+      so invalidate_by on that field does not scan the whole cache
+    - With an InvalidationChannel, invalidations are also applied by the caches
+      with the same name in the other worker processes
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0, index: str | None = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.index = index
+
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._keys_by: dict[Any, set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._channel: InvalidationChannel | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._delete(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._delete(key)
+            self._data[key] = (value, expires_at)
+            if self.index:
+                self._keys_by.setdefault(getattr(value, self.index, None), set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._delete(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._pop(key)
+        if self._channel:
+            self._channel.publish(self.name, key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> list[Hashable]:
+        """
+        Removes every entry for which predicate(key, value) is true, returns their keys
+        Applies to this process only, see invalidate_by for invalidations shared with the other workers
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                self._delete(key)
+
+        return keys
+
+    def invalidate_by(self, field: str, value) -> list[Hashable]:
+        """
+        Removes every entry whose value has `field` equal to `value`, returns their keys
+
+        The other workers are sent the field and value rather than the removed keys,
+        so they also drop the entries that this worker does not hold
+        """
+        keys = self._drop_matching(field, value)
+        if self._channel:
+            self._channel.publish(self.name, {'field': field, 'value': value})
+        return keys
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._keys_by.clear()
+
+    def invalidate_all(self) -> None:
+        """
+        Same as clear, in this process and in the other workers
+        """
+        self.clear()
+        if self._channel:
+            self._channel.publish(self.name, {'all': True})
+
+    def attach(self, channel: InvalidationChannel) -> None:
+        self._channel = channel
+        channel.subscribe(self.name, self._on_remote)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _on_remote(self, key) -> None:
+        # a dict is published by invalidate_all or is a field match of invalidate_by, it can never be a key
+        if isinstance(key, dict) and key.get('all'):
+            self.clear()
+        elif isinstance(key, dict):
+            self._drop_matching(key['field'], key['value'])
+        else:
+            self._pop(key)
+
+    def _drop_matching(self, field: str, value) -> list[Hashable]:
+        if field != self.index:
+            return self.invalidate_where(lambda _, entry: getattr(entry, field, None) == value)
+
+        with self._lock:
+            keys = list(self._keys_by.get(value, ()))
+            for key in keys:
+                self._delete(key)
+
+        return keys
+
+    def _pop(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._delete(key)
+
+    def _delete(self, key: Hashable) -> None:
+        # the lock must be held, keeps the index in step with the entries
+        value, _ = self._data.pop(key)
+        if self.index:
+            field_value = getattr(value, self.index, None)
+            keys = self._keys_by.get(field_value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by[field_value]
+
+
+class InvalidationChannel:
+    """
+    Interface for broadcasting cache invalidations between worker processes
+
+    Keys must be JSON serializable, dicts are reserved for TTLCache.invalidate_all and invalidate_by.
+    """
+
+    def publish(self, cache_name: str, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, cache_name: str, handler: Callable[[Hashable], None]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class RedisInvalidationChannel(InvalidationChannel):
+    """
+    InvalidationChannel over Redis pub/sub, requires the `redis` package
+
+    Every worker listens on one channel in a daemon thread and drops the invalidated keys
+    from its local caches. Messages published by the worker itself are ignored.
+    """
+
+    CHANNEL = 'forum:cache-invalidation'
+
+    def __init__(self, url: str):
+        import redis
+
+        self._origin = f'{id(self)}-{time.time_ns()}'
+        self._handlers: dict[str, Callable[[Hashable], None]] = {}
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.CHANNEL: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, cache_name: str, key: Hashable) -> None:
+        message = json.dumps({'origin': self._origin, 'cache': cache_name, 'key': key})
+        self._client.publish(self.CHANNEL, message)
+
+    def subscribe(self, cache_name: str, handler: Callable[[Hashable], None]) -> None:
+        self._handlers[cache_name] = handler
+
+    def close(self) -> None:
+        self._thread.stop()
+        self._pubsub.close()
+        self._client.close()
+
+    def _on_message(self, message) -> None:
+        data = json.loads(message['data'])
+        if data['origin'] == self._origin:
+            return
+
+        handler = self._handlers.get(data['cache'])
+        if handler:
+            key = data['key']
+            handler(tuple(key) if isinstance(key, list) else key)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from common.cache import InvalidationChannel
+from data.database import read_query
+
+# how often the snapshot is reloaded in full, catches changes made outside of the API
+REGISTRY_REFRESH = float(os.environ.get('FORUM_CATEGORY_REGISTRY_REFRESH', 300))
+
+
+@dataclass(frozen=True, slots=True)
+class CategorySnapshot:
+    """
+    Immutable state of the registry, replaced as a whole on every change
+
+    - categories: category_id -> (name, is_locked, is_private)
+    - names: case-folded name -> category_id, names are unique regardless of case
+    - permissions: (user_id, category_id) -> write_access
+    """
+    version: int = 0
+    loaded_at: float | None = None
+    categories: dict[int, tuple[str, bool, bool]] = field(default_factory=dict)
+    names: dict[str, int] = field(default_factory=dict)
+    permissions: dict[tuple[int, int], bool] = field(default_factory=dict)
+
+
+class CategoryRegistry:
+    """
+    In-memory copy of the categories and of the users' permissions for them
+
+    - Loaded at startup with two queries, then kept current by the categories services
+      and reloaded in full every `refresh` seconds
+    - Readers only dereference the current snapshot, they never take a lock,
+      writers build a new snapshot and swap it in with a higher version
+    - With an InvalidationChannel, a change in one worker process makes
+      the other workers reload their snapshot
+    """
+
+    NAME = 'category_registry'
+
+    def __init__(self, refresh: float = REGISTRY_REFRESH):
+        self.refresh = refresh
+
+        self._snapshot = CategorySnapshot()
+        self._write_lock = threading.Lock()
+        self._channel: InvalidationChannel | None = None
+
+        self.loads = 0
+
+    @property
+    def snapshot(self) -> CategorySnapshot:
+        snapshot = self._snapshot
+        if snapshot.loaded_at is None or time.monotonic() - snapshot.loaded_at >= self.refresh:
+            snapshot = self.load()
+        return snapshot
+
+    def category(self, category_id: int) -> tuple[str, bool, bool] | None:
+        return self.snapshot.categories.get(category_id)
+
+    def category_id_by_name(self, name: str) -> int | None:
+        return self.snapshot.names.get(name.casefold())
+
+    def all(self) -> dict[int, tuple[str, bool, bool]]:
+        return self.snapshot.categories
+
+    def can_read(self, user_id: int, category_id: int) -> bool:
+        return (user_id, category_id) in self.snapshot.permissions
+
+    def can_write(self, user_id: int, category_id: int) -> bool:
+        return self.snapshot.permissions.get((user_id, category_id), False)
+
+    def load(self, force: bool = False) -> CategorySnapshot:
+        with self._write_lock:
+            snapshot = self._snapshot
+            # another thread may have loaded it while this one waited for the lock
+            if not force and snapshot.loaded_at is not None \
+                    and time.monotonic() - snapshot.loaded_at < self.refresh:
+                return snapshot
+
+            categories = {
+                category_id: (name, bool(is_locked), bool(is_private))
+                for category_id, name, is_locked, is_private in read_query(
+                    'SELECT category_id, name, is_locked, is_private FROM categories')}
+            permissions = {
+                (user_id, category_id): bool(write_access)
+                for user_id, category_id, write_access in read_query(
+                    'SELECT user_id, category_id, write_access FROM users_categories_permissions')}
+
+            self._snapshot = CategorySnapshot(
+                version=snapshot.version + 1,
+                loaded_at=time.monotonic(),
+                categories=categories,
+                names={name.casefold(): category_id for category_id, (name, _, _) in categories.items()},
+                permissions=permissions)
+            self.loads += 1
+            return self._snapshot
+
+    def reload(self) -> None:
+        """
+        Loads the snapshot again, the other workers load theirs on their next read
+        """
+        self.load(force=True)
+        if self._channel:
+            self._channel.publish(self.NAME, 'reload')
+
+    def set_category(self, category_id: int, name: str, is_locked: bool, is_private: bool) -> None:
+        def change(categories, names, permissions):
+            old = categories.get(category_id)
+            if old is not None:
+                names.pop(old[0].casefold(), None)
+            categories[category_id] = (name, is_locked, is_private)
+            names[name.casefold()] = category_id
+
+        self._change(change)
+
+    def update_category(self, category_id: int, **flags) -> None:
+        def change(categories, names, permissions):
+            entry = categories.get(category_id)
+            if entry is not None:
+                name, is_locked, is_private = entry
+                categories[category_id] = (
+                    name, flags.get('is_locked', is_locked), flags.get('is_private', is_private))
+
+        self._change(change)
+
+    def set_permission(self, user_id: int, category_id: int, write_access: bool) -> None:
+        def change(categories, names, permissions):
+            permissions[(user_id, category_id)] = write_access
+
+        self._change(change)
+
+    def remove_permission(self, user_id: int, category_id: int) -> None:
+        def change(categories, names, permissions):
+            permissions.pop((user_id, category_id), None)
+
+        self._change(change)
+
+    def invalidate(self, key=None) -> None:
+        """
+        Marks the snapshot as outdated, the next reader loads it again
+        """
+        with self._write_lock:
+            snapshot = self._snapshot
+            self._snapshot = CategorySnapshot(
+                version=snapshot.version, loaded_at=None, categories=snapshot.categories,
+                names=snapshot.names, permissions=snapshot.permissions)
+
+    def attach(self, channel: InvalidationChannel) -> None:
+        self._channel = channel
+        channel.subscribe(self.NAME, self.invalidate)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'categories': len(snapshot.categories),
+            'permissions': len(snapshot.permissions),
+            'loads': self.loads,
+        }
+
+    def _change(self, change) -> None:
+        # copy on write, readers keep using the snapshot they already hold
+        with self._write_lock:
+            snapshot = self._snapshot
+            categories, names, permissions = (
+                dict(snapshot.categories), dict(snapshot.names), dict(snapshot.permissions))
+            change(categories, names, permissions)
+            self._snapshot = CategorySnapshot(
+                version=snapshot.version + 1, loaded_at=snapshot.loaded_at,
+                categories=categories, names=names, permissions=permissions)
+
+        if self._channel:
+            self._channel.publish(self.NAME, 'reload')
+
+
+category_registry = CategoryRegistry()
@@ -0,0 +1,225 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Callable
+from data.database import on_commit
+
+# events waiting for a slow connection, it is closed when more pile up
+EVENT_QUEUE_SIZE = int(os.environ.get('FORUM_EVENT_QUEUE_SIZE', 100))
+# seconds between keep-alive messages on idle connections
+EVENT_KEEPALIVE = float(os.environ.get('FORUM_EVENT_KEEPALIVE', 15))
+
+
+class EventBroker:
+    """
+    Interface for fanning events out to the EventBus of every worker process
+
+    Events must be JSON serializable.
+    """
+
+    def publish(self, channel: str, event: dict) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, handler: Callable[[str, dict], None]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class LocalEventBroker(EventBroker):
+    """
+    Delivers the events to the current process only, enough for a single worker
+    """
+
+    def __init__(self):
+        self._handler: Callable[[str, dict], None] | None = None
+
+    def publish(self, channel: str, event: dict) -> None:
+        if self._handler:
+            self._handler(channel, event)
+
+    def subscribe(self, handler: Callable[[str, dict], None]) -> None:
+        self._handler = handler
+
+
+class RedisEventBroker(LocalEventBroker):
+    """
+    EventBroker over Redis pub/sub, requires the `redis` package
+
+    Events are delivered to the current process right away and to the other workers
+    through one Redis channel, which every worker listens on in a daemon thread.
+    """
+
+    CHANNEL = 'forum:events'
+
+    def __init__(self, url: str):
+        import redis
+
+        super().__init__()
+        self._origin = f'{id(self)}-{time.time_ns()}'
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.CHANNEL: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, channel: str, event: dict) -> None:
+        super().publish(channel, event)
+        message = json.dumps({'origin': self._origin, 'channel': channel, 'event': event})
+        self._client.publish(self.CHANNEL, message)
+
+    def close(self) -> None:
+        self._thread.stop()
+        self._pubsub.close()
+        self._client.close()
+
+    def _on_message(self, message) -> None:
+        data = json.loads(message['data'])
+        if data['origin'] != self._origin:
+            super().publish(data['channel'], data['event'])
+
+
+class Subscription:
+    """
+    The channels one connection listens on and the events waiting to be sent to it
+
+    Lives on the event loop of its connection, events published from other threads
+    are handed over with call_soon_threadsafe.
+    """
+
+    __slots__ = ('channels', 'overflowed', '_queue', '_loop')
+
+    def __init__(self, channels: set[str], maxsize: int):
+        self.channels = channels
+        self.overflowed = False
+        self._queue: asyncio.Queue[dict | None] = asyncio.Queue(maxsize)
+        self._loop = asyncio.get_running_loop()
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        """
+        Returns the next event, or None when the subscription was closed
+        Raises TimeoutError if no event arrives within timeout
+        """
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def put_threadsafe(self, event: dict | None) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the loop of the connection is already closed
+            pass
+
+    def _put(self, event: dict | None) -> None:
+        if self.overflowed:
+            return
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the client cannot keep up, it gets closed and has to reload what it shows
+            self.overflowed = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+
+class EventBus:
+    """
+    Pushes changes to the connected clients, instead of having them poll
+
+    - Services publish events on channels: `user:<id>` for messages, `topic:<id>` for replies and votes
+    - An event is published once the current unit of work commits, so clients never see rolled back changes
+    - The broker fans the events out to every worker, each worker hands them to its own subscriptions
+    """
+
+    NAME = 'events'
+
+    def __init__(self, broker: EventBroker | None = None, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._broker = None
+        self.use(broker or LocalEventBroker())
+
+        self.published = 0
+        self.delivered = 0
+
+    def use(self, broker: EventBroker) -> None:
+        self._broker = broker
+        broker.subscribe(self._deliver)
+
+    def publish(self, channel: str, type: str, data: dict) -> None:
+        event = {'channel': channel, 'type': type, 'data': data}
+        on_commit(lambda: self._publish_now(channel, event))
+
+    def subscribe(self, channels: set[str]) -> Subscription:
+        """
+        Must be called on the event loop of the connection
+        """
+        subscription = Subscription(set(), self.queue_size)
+        for channel in channels:
+            self.add_channel(subscription, channel)
+        return subscription
+
+    def add_channel(self, subscription: Subscription, channel: str) -> None:
+        with self._lock:
+            subscription.channels.add(channel)
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+
+    def remove_channel(self, subscription: Subscription, channel: str) -> None:
+        with self._lock:
+            subscription.channels.discard(channel)
+            subscribers = self._subscriptions.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[channel]
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for channel in list(subscription.channels):
+            self.remove_channel(subscription, channel)
+
+    def close(self) -> None:
+        """
+        Ends every subscription, their connections finish their responses
+        """
+        with self._lock:
+            subscriptions = {s for subscribers in self._subscriptions.values() for s in subscribers}
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.put_threadsafe(None)
+        self._broker.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'channels': len(self._subscriptions),
+                'subscriptions': len({s for subscribers in self._subscriptions.values() for s in subscribers}),
+                'published': self.published,
+                'delivered': self.delivered,
+            }
+
+    def _publish_now(self, channel: str, event: dict) -> None:
+        self.published += 1
+        self._broker.publish(channel, event)
+
+    def _deliver(self, channel: str, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put_threadsafe(event)
+        self.delivered += len(subscribers)
+
+
+event_bus = EventBus()
+
+
+def publish_event(channel: str, type: str, data: dict) -> None:
+    """
+    Publishes the event to the subscribers of the channel, once the current unit of work commits
+    """
+    event_bus.publish(channel, type, data)
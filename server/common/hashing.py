@@ -0,0 +1,128 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from common.responses import HTTPTooManyRequests
+
+# changing the cost makes existing hashes "need update", they are rehashed on the next login
+BCRYPT_ROUNDS = int(os.environ.get('FORUM_BCRYPT_ROUNDS', 12))
+# 0 workers hashes in the calling thread, without a process pool
+HASHING_WORKERS = int(os.environ.get('FORUM_HASHING_WORKERS', os.cpu_count() or 1))
+HASHING_MAX_PENDING = int(os.environ.get('FORUM_HASHING_MAX_PENDING', max(HASHING_WORKERS, 1) * 8))
+
+# an instance of the CryptContext class that specifies the hashing algorithm - bcrypt in this case
+pass_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def _hash(password: str) -> str:
+    return pass_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pass_context.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pass_context.verify_and_update(plain_password, hashed_password)
+
+
+class HashingService:
+    """
+    Runs bcrypt in a pool of worker processes, so it does not occupy the request threads
+
+    - The *_async methods are for the request handlers, they await the worker
+      process on the event loop and hold no thread while bcrypt runs
+    - At most `max_pending` operations are queued or running at a time,
+      beyond that callers get 429 Too Many Requests instead of waiting
+    """
+
+    def __init__(self, workers: int = HASHING_WORKERS, max_pending: int = HASHING_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+        self.rejected = 0
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify, plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Returns whether the password matches and, if the hash uses outdated settings, a new hash
+        """
+        return self._run(_verify_and_update, plain_password, hashed_password)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(_hash, password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run_async(_verify, plain_password, hashed_password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._run_async(_verify_and_update, plain_password, hashed_password)
+
+    def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Hashes a batch on all the workers at once, for bulk imports
+
+        Runs outside of the request slots, the caller waits for the whole batch.
+        """
+        if self.workers <= 0 or len(passwords) <= 1:
+            return [_hash(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._get_executor().map(_hash, passwords, chunksize=chunksize))
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+        }
+
+    def _run(self, fn, *args):
+        self._acquire_slot()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    async def _run_async(self, fn, *args):
+        self._acquire_slot()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._slots.release()
+
+    def _acquire_slot(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPTooManyRequests('Too many password operations in progress, try again later')
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # created lazily, so every uvicorn worker process gets its own pool
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+
+hashing_service = HashingService()
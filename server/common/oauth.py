@@ -1,10 +1,11 @@
 from fastapi import HTTPException, Depends
 from typing import Annotated, Union
-from data.models.user import User, AnonymousUser, Token, TokenData
-from services.users_services import find_by_username
+from data.models.user import AuthUser, AnonymousUser, Token, TokenData
+from services.users_services import find_by_username_cached
 from datetime import timedelta, datetime
 from jose import jwt, JWTError, ExpiredSignatureError
 from secret_key import SECRET_KEY
+from common.token_cache import get_verified, remember_verified
 from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
@@ -25,22 +26,33 @@ def create_access_token(data: TokenData) -> Token:
 
 # checks token exp validity
 def is_token_exp_valid(exp: str) -> bool:
-    exp_datetime = datetime.strptime(exp, '%Y-%m-%d %H:%M:%S')
-    return exp_datetime > datetime.now()
+    return parse_token_exp(exp) > datetime.now()
+
+
+def parse_token_exp(exp: str) -> datetime:
+    return datetime.strptime(exp, '%Y-%m-%d %H:%M:%S')
 
 
 # Union specifies that the returned type would be either one of these
 def verify_token_access(token: str) -> Union[TokenData, str]:
+    # verified tokens are remembered until they expire, see common.token_cache
+    token_data = get_verified(token)
+    if token_data:
+        return token_data
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
         username: str = payload.get("username")
         is_admin: bool = payload.get("is_admin")
         exp_at: str = payload.get("expire")
+        token_version: int = payload.get("token_version", 0)
 
-        if not is_token_exp_valid(exp_at):
+        exp_datetime = parse_token_exp(exp_at)
+        if not exp_datetime > datetime.now():
             raise ExpiredSignatureError()
 
-        token_data = TokenData(username=username, is_admin=is_admin)
+        token_data = TokenData(username=username, is_admin=is_admin, token_version=token_version)
+        remember_verified(token, token_data, exp_datetime)
         return token_data
 
     # in case of token exp
@@ -59,11 +71,11 @@ def get_admin_required(token: Annotated[str, Depends(oauth2_scheme)]):
     return admin
 
 
-def get_user_required(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
+def get_user_required(token: Annotated[str, Depends(oauth2_scheme)]) -> AuthUser:
     return get_current_user(token)
 
 
-def get_user_optional(token: Annotated[str, Depends(oauth2_scheme_optional)]) -> User | AnonymousUser:
+def get_user_optional(token: Annotated[str, Depends(oauth2_scheme_optional)]) -> AuthUser | AnonymousUser:
     if not token:
         return AnonymousUser()
     return get_current_user(token)
@@ -76,14 +88,17 @@ def get_current_user(token):
     if not isinstance(token_data, TokenData):
         raise HTTPException(status_code=400, detail=token_data)
 
-    user = find_by_username(token_data.username)
+    user = find_by_username_cached(token_data.username)
     # if the token is verified but there is no such user (has been deleted)
     if not user:
         raise HTTPException(status_code=404, detail="No such user")
+    # the user changed password since the token was issued
+    if user.token_version != token_data.token_version:
+        raise HTTPException(status_code=401, detail="Token has been revoked. Please log in again")
 
     return user
 
 
-UserAuthDep = Annotated[User, Depends(get_user_required)]
-AdminAuthDep = Annotated[User, Depends(get_admin_required)]
-OptionalUser = Annotated[User | AnonymousUser, Depends(get_user_optional)]
+UserAuthDep = Annotated[AuthUser, Depends(get_user_required)]
+AdminAuthDep = Annotated[AuthUser, Depends(get_admin_required)]
+OptionalUser = Annotated[AuthUser | AnonymousUser, Depends(get_user_optional)]
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import hashlib
+import os
+import threading
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from common.cache import TTLCache, InvalidationChannel
+from data.database import on_commit
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('FORUM_RESPONSE_CACHE_SIZE', 2048))
+RESPONSE_CACHE_TTL = float(os.environ.get('FORUM_RESPONSE_CACHE_TTL', 60))
+# how long clients may reuse a response without revalidating it with its ETag
+RESPONSE_CACHE_MAX_AGE = int(os.environ.get('FORUM_RESPONSE_CACHE_MAX_AGE', 0))
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'content_type', 'tags')
+
+    def __init__(self, body: bytes, content_type: str, tags: frozenset[str]):
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        self.content_type = content_type
+        self.tags = tags
+
+
+class ResponseCache:
+    """
+    Shared cache of the JSON responses served to anonymous users
+
+    - Endpoints opt in per response with cache_response(request, *tags),
+      only responses that are the same for every anonymous user may do so
+    - Services drop the responses that depend on the data they change with invalidate(*tags)
+    - A response computed while an invalidation happened is not stored,
+      so a slow request cannot put back data that was just invalidated
+    """
+
+    NAME = 'responses'
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self._cache = TTLCache(self.NAME, maxsize=maxsize, ttl=ttl)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._channel: InvalidationChannel | None = None
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str) -> CachedResponse | None:
+        return self._cache.get(key)
+
+    def set(self, key: str, response: CachedResponse, generation: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._cache.set(key, response)
+
+    def invalidate(self, *tags: str) -> None:
+        self._invalidate_local(tags)
+        if self._channel:
+            self._channel.publish(self.NAME, list(tags))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def invalidate_all(self) -> None:
+        """
+        Same as clear, in this process and in the other workers
+        """
+        self.clear()
+        if self._channel:
+            self._channel.publish(self.NAME, {'all': True})
+
+    def attach(self, channel: InvalidationChannel) -> None:
+        self._channel = channel
+        channel.subscribe(self.NAME, self._on_remote)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def _on_remote(self, tags) -> None:
+        if isinstance(tags, dict):
+            self.clear()
+        else:
+            self._invalidate_local(tags)
+
+    def _invalidate_local(self, tags) -> None:
+        tags = set(tags)
+        with self._lock:
+            self._generation += 1
+        self._cache.invalidate_where(lambda key, response: not tags.isdisjoint(response.tags))
+
+
+response_cache = ResponseCache()
+
+
+def cache_response(request: Request | None, *tags: str) -> None:
+    """
+    Marks the response of the current request as cacheable for anonymous users,
+    it is dropped when any of the tags is invalidated
+    """
+    if request is not None:
+        request.state.cache_tags = tags
+
+
+def invalidate_responses(*tags: str) -> None:
+    """
+    Drops the cached responses with any of the tags, once the current unit of work commits
+    """
+    on_commit(lambda: response_cache.invalidate(*tags))
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Serves cached responses to anonymous GET requests, with strong ETags and 304 Not Modified
+
+    Requests with an Authorization header always reach the endpoint,
+    their responses may depend on the user and are never stored.
+    """
+
+    def __init__(self, app, cache: ResponseCache = response_cache, max_age: int = RESPONSE_CACHE_MAX_AGE):
+        super().__init__(app)
+        self.cache = cache
+        self.cache_control = f'public, max-age={max_age}, must-revalidate'
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        if request.method != 'GET' or 'authorization' in request.headers:
+            return await call_next(request)
+
+        key = request.url.path + '?' + '&'.join(sorted(request.url.query.split('&')))
+        cached = self.cache.get(key)
+        if cached is None:
+            generation = self.cache.generation
+            response = await call_next(request)
+
+            tags = getattr(request.state, 'cache_tags', None)
+            if response.status_code != 200 or tags is None:
+                return response
+
+            body = b''.join([chunk async for chunk in response.body_iterator])
+            cached = CachedResponse(body, response.headers.get('content-type', 'application/json'), frozenset(tags))
+            self.cache.set(key, cached, generation)
+
+        headers = {'ETag': cached.etag, 'Cache-Control': self.cache_control, 'Vary': 'Authorization'}
+        if_none_match = request.headers.get('if-none-match', '')
+        if cached.etag in (etag.strip() for etag in if_none_match.split(',')):
+            return Response(status_code=304, headers=headers)
+
+        return Response(cached.body, headers=headers | {'Content-Type': cached.content_type})
@@ -1,4 +1,11 @@
+import asyncio
+import functools
+from typing import Callable
+import orjson
 from fastapi import Response, HTTPException
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
 
 
 class SC:
@@ -11,6 +18,9 @@ class SC:
     PaymentRequired = 402
     Forbidden = 403
     NotFound = 404
+    TooManyRequests = 429
+
+    ServiceUnavailable = 503
 
 
 class HTTPBadRequest(HTTPException):
@@ -33,6 +43,12 @@ class HTTPNotFound(HTTPException):
         super().__init__(status_code=SC.NotFound, detail=detail)
 
 
+class HTTPTooManyRequests(HTTPException):
+    def __init__(self, detail='', retry_after: int = 1):
+        super().__init__(status_code=SC.TooManyRequests, detail=detail,
+                         headers={'Retry-After': str(retry_after)})
+
+
 class BadRequest(Response):
     def __init__(self, content=''):
         super().__init__(status_code=400, content=content)
@@ -67,3 +83,47 @@ class Created(Response):
 class InternalServerError(Response):
     def __init__(self):
         super().__init__(status_code=500)
+
+
+class ModelResponse(ORJSONResponse):
+    """
+    JSON rendered by orjson, the pydantic models in the content are dumped by pydantic-core on the way
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_dump_model, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _dump_model(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+class LeanRoute(APIRoute):
+    """
+    Route class for the read endpoints, `APIRouter(route_class=LeanRoute)`
+
+    An endpoint that returns a model or a list of models gets them rendered by ModelResponse,
+    instead of FastAPI dumping them, validating the dump against the response model and walking
+    the result with jsonable_encoder. The models come from from_query and are trusted as they are.
+    The endpoints must not set headers or a status code on an injected Response.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def lean_endpoint(*args, **kw):
+                return self.render(await endpoint(*args, **kw))
+        else:
+            @functools.wraps(endpoint)
+            def lean_endpoint(*args, **kw):
+                return self.render(endpoint(*args, **kw))
+
+        super().__init__(path, lean_endpoint, **kwargs)
+
+    def render(self, content):
+        if isinstance(content, BaseModel) or (
+                isinstance(content, list) and content and isinstance(content[0], BaseModel)):
+            return ModelResponse(content, status_code=self.status_code or 200)
+        return content
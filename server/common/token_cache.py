@@ -0,0 +1,35 @@
+import hashlib
+import os
+from datetime import datetime
+from common.cache import TTLCache
+from data.models.user import TokenData
+
+# verified access tokens by digest and indexed by username, each entry lives exactly until the token's expire claim
+verified_tokens = TTLCache(
+    'tokens',
+    maxsize=int(os.environ.get('FORUM_TOKENS_CACHE_SIZE', 10000)),
+    ttl=0,
+    index='username'
+)
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_verified(token: str) -> TokenData | None:
+    return verified_tokens.get(_digest(token))
+
+
+def remember_verified(token: str, token_data: TokenData, expires_at: datetime) -> None:
+    ttl = (expires_at - datetime.now()).total_seconds()
+    if ttl > 0:
+        verified_tokens.set(_digest(token), token_data, ttl=ttl)
+
+
+def revoke_user_tokens(username: str) -> None:
+    """
+    Forgets every verified token of the user, so they are verified again on next use
+    Called when the user is deleted or changes password
+    """
+    verified_tokens.invalidate_by('username', username)
@@ -0,0 +1,44 @@
+from typing import Annotated
+from anyio import CapacityLimiter, to_thread
+from fastapi import Depends
+from data.database import UnitOfWork, begin_unit_of_work, end_unit_of_work
+
+# threads for commits and closes, set up at startup by reserve_finish_threads
+_finish_limiter: CapacityLimiter | None = None
+
+
+def reserve_finish_threads(size: int) -> None:
+    """
+    Gives the commits and closes of the units of work their own `size` threads,
+    so they never wait behind handlers that are blocked on the connection pool
+    """
+    global _finish_limiter
+    _finish_limiter = CapacityLimiter(size)
+
+
+async def finish_in_thread(func) -> None:
+    await to_thread.run_sync(func, limiter=_finish_limiter)
+
+
+async def unit_of_work():
+    """
+    Request-scoped unit of work
+
+    - Every data.database helper called while handling the request reuses one
+      connection and one transaction, which are set up on the first query
+    - Commits once when the handler returns, rolls back if it raises
+    """
+    uow, token = begin_unit_of_work()
+    try:
+        yield uow
+    except Exception:
+        await finish_in_thread(uow.rollback)
+        raise
+    else:
+        await finish_in_thread(uow.commit)
+    finally:
+        await finish_in_thread(uow.close)
+        end_unit_of_work(token)
+
+
+UnitOfWorkDep = Annotated[UnitOfWork, Depends(unit_of_work)]
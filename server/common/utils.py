@@ -1,20 +1,26 @@
 from __future__ import annotations
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from math import ceil
 from urllib.parse import parse_qs
-from passlib.context import CryptContext
 from starlette.requests import Request
 from pydantic import BaseModel
+from common.hashing import hashing_service
+from common.responses import HTTPBadRequest
 
-# an instance of the CryptContext class that specifies the hashing algorithm - bcrypt in this case
-pass_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
+# bcrypt runs in the hashing service's worker processes, see common.hashing,
+# awaiting them holds neither the event loop nor a request thread
+async def hash_pass(password: str) -> str:
+    return await hashing_service.hash_async(password)
 
-def hash_pass(password: str) -> str:
-    return pass_context.hash(password)
 
+async def verify_password(plain_password, hashed_password) -> bool:
+    return await hashing_service.verify_async(plain_password, hashed_password)
 
-def verify_password(plain_password, hashed_password) -> bool:
-    return pass_context.verify(plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password, hashed_password) -> tuple[bool, str | None]:
+    return await hashing_service.verify_and_update_async(plain_password, hashed_password)
 
 
 class Page:
@@ -26,22 +32,26 @@ class PaginationInfo(BaseModel):
     page: int
     size: int
     pages: int
+    cursor: str | None = None  # set only in cursor (keyset) pagination mode
+    next_cursor: str | None = None
 
 
 class Links(BaseModel):
     current_url: str
     first: str
-    last: str
+    last: str | None
     next: str | None
     prev: str | None
 
 
-def get_pagination_info(total_elements, page, size) -> PaginationInfo:
+def get_pagination_info(total_elements, page, size, cursor=None, next_cursor=None) -> PaginationInfo:
     info = PaginationInfo(
         total_elements=total_elements,
         page=page,
         size=size,
-        pages=ceil(total_elements / size)
+        pages=ceil(total_elements / size),
+        cursor=cursor,
+        next_cursor=next_cursor
     )
     return info
 
@@ -56,10 +66,20 @@ def create_links(request: Request, pagination_info: PaginationInfo) -> Links:
 
     Returns:
         Links: An object containing pagination links, including current, first, last, next, and previous links.
+        In cursor mode only the first and next links can be built, last and prev are None.
     """
    
     pi = pagination_info
 
+    if pi.cursor is not None:
+        return Links(
+            current_url=f"{request.url}",
+            first=cursor_url(request, '', pi.size),
+            last=None,
+            next=cursor_url(request, pi.next_cursor, pi.size) if pi.next_cursor else None,
+            prev=None
+        )
+
     links = Links(
         current_url=f"{request.url}",
         first=f"{result_url(request, 1, pi.size)}",
@@ -93,3 +113,40 @@ def result_url(request: Request, page: int, size: int) -> str:
     new_url += f'?{new_query}'
 
     return new_url
+
+
+def cursor_url(request: Request, cursor: str, size: int) -> str:
+    """
+    Same as result_url, but for cursor pagination - the page parameter is replaced by the cursor
+    """
+    parsed_query = parse_qs(request.url.query)
+    parsed_query.pop('page', None)
+
+    parsed_query.update({'cursor': [cursor], 'size': [str(size)]})
+    new_query = '&'.join(f'{key}={val[0]}' for key, val in parsed_query.items())
+
+    return f'{request.url.scheme}://{request.url.netloc}{request.url.path}?{new_query}'
+
+
+def encode_cursor(kind: str, *values) -> str:
+    """
+    Opaque cursor of keyset pagination, holds the listing it belongs to and the key of the last row
+    """
+    raw = json.dumps([kind, *values], separators=(',', ':'))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, kind: str) -> list:
+    """
+    Returns the values of the cursor
+    Raises 400 if the cursor is malformed or was issued for another listing
+    """
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_kind, *values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPBadRequest('Invalid cursor')
+
+    if cursor_kind != kind:
+        raise HTTPBadRequest('Invalid cursor')
+    return values
@@ -1,6 +1,16 @@
-from mariadb import connect
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from mariadb import connect, Error as MariaDBError
 from mariadb.connections import Connection
 from hidden import database_password
+from data.pool import ConnectionPool
+
+# pool settings can be overridden per deployment through environment variables
+POOL_SIZE = int(os.environ.get('FORUM_DB_POOL_SIZE', 10))
+POOL_TIMEOUT = float(os.environ.get('FORUM_DB_POOL_TIMEOUT', 5))
+POOL_MAX_IDLE = float(os.environ.get('FORUM_DB_POOL_MAX_IDLE', 60))
+POOL_MAX_LIFETIME = float(os.environ.get('FORUM_DB_POOL_MAX_LIFETIME', 3600))
 
 
 def _get_connection() -> Connection:
@@ -13,8 +23,142 @@ def _get_connection() -> Connection:
     )
 
 
+_pool = ConnectionPool(
+    _get_connection,
+    size=POOL_SIZE,
+    timeout=POOL_TIMEOUT,
+    max_idle=POOL_MAX_IDLE,
+    max_lifetime=POOL_MAX_LIFETIME
+)
+
+
+def pool_stats() -> dict:
+    return _pool.stats()
+
+
+def close_pool() -> None:
+    _pool.close()
+
+
+class UnitOfWork:
+    """
+    One connection and one transaction shared by every query of a unit of work
+
+    - The connection is checked out lazily, on the first query
+    - Queries run through the helpers below do not commit on their own,
+      the owner of the unit of work commits or rolls back once at the end
+    """
+
+    def __init__(self):
+        self._pooled = None
+        self._after_commit = []
+
+    @property
+    def connection(self) -> Connection:
+        if self._pooled is None:
+            self._pooled = _pool.acquire()
+        return self._pooled.conn
+
+    def commit(self) -> None:
+        if self._pooled is not None:
+            self._pooled.conn.commit()
+
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self) -> None:
+        self._after_commit = []
+        if self._pooled is not None:
+            try:
+                self._pooled.conn.rollback()
+            except MariaDBError:
+                # a broken connection must not go back to the pool
+                self.close(discard=True)
+
+    def close(self, discard: bool = False) -> None:
+        if self._pooled is not None:
+            _pool.release(self._pooled, discard=discard)
+            self._pooled = None
+
+
+_current_unit_of_work: ContextVar[UnitOfWork | None] = ContextVar('unit_of_work', default=None)
+
+
+def begin_unit_of_work() -> tuple[UnitOfWork, object]:
+    uow = UnitOfWork()
+    return uow, _current_unit_of_work.set(uow)
+
+
+def end_unit_of_work(token) -> None:
+    _current_unit_of_work.reset(token)
+
+
+def release_connection() -> None:
+    """
+    Commits the current unit of work so far and returns its connection to the pool
+    Used before slow work that needs no database, the next query checks out a connection again
+    """
+    uow = _current_unit_of_work.get()
+    if uow is not None:
+        uow.commit()
+        uow.close()
+
+
+def on_commit(callback) -> None:
+    """
+    Runs callback once the current unit of work commits, or right away outside of one
+    Used to drop cached data only after the change is visible to other connections
+    """
+    uow = _current_unit_of_work.get()
+    if uow is None:
+        callback()
+    else:
+        uow._after_commit.append(callback)
+
+
+@contextmanager
+def transaction(join: bool = True):
+    """
+    Runs the enclosed queries in a single transaction
+
+    Joins the current unit of work, if there is one, so nested calls
+    and calls made during an HTTP request commit together.
+    join=False always starts a separate transaction, for jobs that commit in chunks.
+    """
+    if join and _current_unit_of_work.get() is not None:
+        yield _current_unit_of_work.get()
+        return
+
+    uow, token = begin_unit_of_work()
+    try:
+        yield uow
+    except Exception:
+        uow.rollback()
+        raise
+    else:
+        uow.commit()
+    finally:
+        uow.close()
+        end_unit_of_work(token)
+
+
+@contextmanager
+def _use_connection():
+    """
+    Yields a connection and whether the caller should commit its own changes
+    """
+    uow = _current_unit_of_work.get()
+    if uow is not None:
+        yield uow.connection, False
+        return
+
+    with _pool.connection() as conn:
+        yield conn, True
+
+
 def read_query(sql: str, sql_params=()):
-    with _get_connection() as conn:
+    with _use_connection() as (conn, _):
         cursor = conn.cursor()
         cursor.execute(sql, sql_params)
 
@@ -22,31 +166,50 @@ def read_query(sql: str, sql_params=()):
 
 
 def insert_query(sql: str, sql_params=()) -> int:
-    with _get_connection() as conn:
+    with _use_connection() as (conn, autocommit):
         cursor = conn.cursor()
         cursor.execute(sql, sql_params)
-        conn.commit()
+        if autocommit:
+            conn.commit()
 
         return cursor.lastrowid
 
 
 def update_query(sql: str, sql_params=()) -> bool:
-    with _get_connection() as conn:
+    with _use_connection() as (conn, autocommit):
         cursor = conn.cursor()
         cursor.execute(sql, sql_params)
-        conn.commit()
+        if autocommit:
+            conn.commit()
 
         return True
 
 
 def query_count(sql: str, sql_params=()):
-    with _get_connection() as conn:
+    with _use_connection() as (conn, _):
         cursor = conn.cursor()
         cursor.execute(sql, sql_params)
 
         return cursor.fetchone()[0]
 
 
+def stream_query(sql: str, sql_params=(), batch_size: int = 1000):
+    """
+    Yields the rows one by one through an unbuffered cursor, the result set is never held in memory
+
+    Uses a connection of its own until the rows are exhausted or the generator is closed,
+    an unbuffered result blocks any other query on its connection.
+    """
+    with _pool.connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(sql, sql_params)
+            while rows := cursor.fetchmany(batch_size):
+                yield from rows
+        finally:
+            cursor.close()
+
+
 # def additional_data_seed():
 #     print('Inserting categories')
 #     insert_query("""INSERT INTO categories(name) VALUES ('NEW')""")
@@ -4,6 +4,8 @@ SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES,N
 
 -- -----------------------------------------------------
 -- Schema forum
+-- The schema as it was before versioned migrations, it is not edited anymore,
+-- every later change ships in data/migrations, run `python -m data.migrate up` after this script
 -- -----------------------------------------------------
 
 CREATE SCHEMA IF NOT EXISTS `forum` DEFAULT CHARACTER SET latin1 ;
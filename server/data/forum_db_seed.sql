@@ -1,6 +1,7 @@
 USE `forum` ;
 -- -----------------------------------------------------
 -- ADDITIONAL SEED
+-- run after `python -m data.migrate up`, it fills the tables and columns the migrations add
 -- -----------------------------------------------------
 -- INSERTING USERS
 INSERT INTO users(username,password,email,is_admin) -- 1
@@ -37,6 +38,10 @@ INSERT INTO topics(title,user_id,category_id) VALUES('Anyone coding in python?',
 
 INSERT INTO topics(title,user_id,category_id) VALUES('Where to go fishing?', 2,6);-- 10 private
 
+-- COUNTING TOPICS (topics are inserted directly, bypassing topics_services)
+INSERT INTO topic_counts(category_id,is_locked,total)
+SELECT category_id, is_locked, COUNT(*) FROM topics GROUP BY category_id, is_locked;
+
 -- INSERTING PERMISSIONS
 INSERT INTO users_categories_permissions(user_id,category_id) VALUES(3,6); -- readonly
 INSERT INTO users_categories_permissions(user_id,category_id,write_access) VALUES(4, 6, 1);-- write
@@ -50,5 +55,12 @@ INSERT INTO replies(text,user_id,topic_id) VALUES('Good luck!',2, 3);
 INSERT INTO replies(text,user_id,topic_id) VALUES('Do you like it!',2, 3);
 INSERT INTO replies(text,user_id,topic_id) VALUES('The best!',2, 3);
 
+-- COUNTING REPLIES (replies are inserted directly, bypassing replies_services)
+UPDATE topics t
+JOIN (SELECT topic_id, COUNT(*) AS total, MAX(reply_id) AS last_reply_id FROM replies GROUP BY topic_id) r
+  ON r.topic_id = t.topic_id
+JOIN replies lr ON lr.reply_id = r.last_reply_id
+SET t.reply_count = r.total, t.last_reply_id = r.last_reply_id, t.last_activity_at = lr.created_at;
+
 -- INSERT INTO messages(text,sender_id,receiver_id) VALUES('done',1, 2);
 -- INSERT INTO users_categories_permissions(user_id,category_id,write_access) VALUES(2, 6,1);
\ No newline at end of file
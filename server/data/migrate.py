@@ -0,0 +1,245 @@
+# Versioned schema migrations.
+# Every change to the schema ships as data/migrations/NNNN_name.up.sql with its NNNN_name.down.sql,
+# forum_db_schema.sql is the schema from before the migrations and is not edited anymore.
+#
+# Run from the `server` directory:
+#   python -m data.migrate status
+#   python -m data.migrate up [--to VERSION]
+#   python -m data.migrate down --to VERSION
+#
+# Databases created before schema_version existed, some from schema scripts that already had the changes
+# of the first migrations, get their version from SCHEMA_MARKERS the first time the runner looks at them.
+from __future__ import annotations
+import argparse
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from data.database import read_query, update_query, insert_query, close_pool
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+_FILE_NAME = re.compile(r'^(\d{4})_(\w+)\.up\.sql$')
+
+logger = logging.getLogger(__name__)
+
+# a table, column or index each migration adds, new migrations add theirs here
+SCHEMA_MARKERS = {
+    1: ('table', 'topic_counts', None),
+    2: ('index', 'topics', 'ft_topics_title'),
+    3: ('column', 'replies', 'upvotes'),
+    4: ('index', 'topics', 'idx_topics_title_sort'),
+    5: ('index', 'users', 'idx_users_username_deleted'),
+    6: ('table', 'conversations', None),
+    7: ('column', 'topics', 'reply_count'),
+    8: ('column', 'topics', 'last_activity_at'),
+    9: ('table', 'topic_scores', None),
+    10: ('column', 'users', 'token_version'),
+}
+
+_MARKER_QUERIES = {
+    'table': 'SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = ?',
+    'column': '''SELECT COUNT(*) FROM information_schema.columns
+                 WHERE table_schema = DATABASE() AND table_name = ? AND column_name = ?''',
+    'index': '''SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = ? AND index_name = ?''',
+}
+
+
+class MigrationError(Exception):
+    """
+    Raised when the migration files are inconsistent or a target version does not exist
+    """
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    up: Path
+    down: Path
+
+    def statements(self, direction: str) -> list[str]:
+        return split_statements((self.up if direction == 'up' else self.down).read_text())
+
+
+def split_statements(sql: str) -> list[str]:
+    """
+    Splits a script on the semicolons ending a line, skipping `--` comment lines
+    The driver runs one statement per call, migrations must not use DELIMITER
+    """
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith('--')]
+    statements = re.split(r';\s*$', '\n'.join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def available_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+    for path in sorted(directory.glob('*.up.sql')):
+        match = _FILE_NAME.match(path.name)
+        if not match:
+            raise MigrationError(f'Unexpected migration file name {path.name}')
+
+        down = path.with_name(path.name.replace('.up.sql', '.down.sql'))
+        if not down.exists():
+            raise MigrationError(f'Missing {down.name}')
+        migrations.append(Migration(int(match.group(1)), match.group(2), path, down))
+
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError('Two migrations share a version number')
+
+    return migrations
+
+
+def ensure_version_table() -> None:
+    update_query('''CREATE TABLE IF NOT EXISTS schema_version (
+                      version INT(11) NOT NULL,
+                      name VARCHAR(100) NOT NULL,
+                      applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                      PRIMARY KEY (version))''')
+
+
+def current_version() -> int:
+    """
+    The recorded version, a database without schema_version gets it created and its baseline recorded first
+    """
+    if not _has('table', 'schema_version', None):
+        ensure_version_table()
+        stamp_baseline()
+    return _recorded_version()
+
+
+def detect_baseline(migrations: list[Migration] | None = None) -> int:
+    """
+    The version of a database that has no schema_version yet, from the SCHEMA_MARKERS it already has
+
+    Stops at the first migration whose marker is missing, later markers are never trusted on their own.
+    """
+    version = 0
+    for migration in migrations or available_migrations():
+        marker = SCHEMA_MARKERS.get(migration.version)
+        if marker is None or not _has(*marker):
+            break
+        version = migration.version
+    return version
+
+
+def stamp_baseline(migrations: list[Migration] | None = None) -> list[Migration]:
+    """
+    Records the migrations whose changes the database already has, without running them
+    """
+    migrations = migrations or available_migrations()
+    baseline = detect_baseline(migrations)
+    stamped = [migration for migration in migrations if migration.version <= baseline]
+    for migration in stamped:
+        insert_query('INSERT INTO schema_version(version, name) VALUES(?,?)', (migration.version, migration.name))
+    if stamped:
+        logger.info('Recorded the existing schema as version %04d', baseline)
+
+    return stamped
+
+
+def _has(kind: str, table: str, name: str | None) -> bool:
+    params = (table,) if name is None else (table, name)
+    return read_query(_MARKER_QUERIES[kind], params)[0][0] > 0
+
+
+def _recorded_version() -> int:
+    return read_query('SELECT COALESCE(MAX(version), 0) FROM schema_version')[0][0]
+
+
+def pending_migrations(migrations: list[Migration] | None = None) -> list[Migration]:
+    version = current_version()
+    return [migration for migration in (migrations or available_migrations()) if migration.version > version]
+
+
+def upgrade(target: int | None = None, migrations: list[Migration] | None = None) -> list[Migration]:
+    """
+    Applies the pending migrations up to target (the latest by default), returns the applied ones
+
+    MariaDB commits DDL implicitly, so each migration is recorded as soon as it completes,
+    a failed migration leaves the version of the last one that succeeded.
+    """
+    applied = []
+    for migration in pending_migrations(migrations):
+        if target is not None and migration.version > target:
+            break
+
+        logger.info('Applying migration %04d_%s', migration.version, migration.name)
+        for statement in migration.statements('up'):
+            update_query(statement)
+        insert_query('INSERT INTO schema_version(version, name) VALUES(?,?)',
+                     (migration.version, migration.name))
+        applied.append(migration)
+
+    return applied
+
+
+def downgrade(target: int, migrations: list[Migration] | None = None) -> list[Migration]:
+    """
+    Reverts the applied migrations newer than target, newest first, returns the reverted ones
+    """
+    migrations = migrations or available_migrations()
+    if target and target not in {migration.version for migration in migrations}:
+        raise MigrationError(f'No migration with version {target}')
+
+    version = current_version()
+    reverted = []
+    for migration in reversed(migrations):
+        if migration.version <= target or migration.version > version:
+            continue
+
+        logger.info('Reverting migration %04d_%s', migration.version, migration.name)
+        for statement in migration.statements('down'):
+            update_query(statement)
+        update_query('DELETE FROM schema_version WHERE version = ?', (migration.version,))
+        reverted.append(migration)
+
+    return reverted
+
+
+def check_schema() -> bool:
+    """
+    Warns when the live schema is behind the migrations shipped with the code, returns whether it is current
+
+    Read-only, it never creates schema_version, and it only logs when the database cannot be read,
+    so the server still starts while the database is down
+    """
+    try:
+        version = _recorded_version()
+    except Exception:
+        logger.warning('Could not read the schema version, the database is unreachable or was never migrated, '
+                       'run `python -m data.migrate status`', exc_info=True)
+        return False
+
+    pending = [migration for migration in available_migrations() if migration.version > version]
+    if pending:
+        logger.warning('Database schema is %d migration(s) behind (%s), run `python -m data.migrate up`',
+                       len(pending), ', '.join(f'{m.version:04d}_{m.name}' for m in pending))
+    return not pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply or revert schema migrations')
+    parser.add_argument('command', choices=('status', 'up', 'down'))
+    parser.add_argument('--to', type=int, help='target version, required by down')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        if args.command == 'up':
+            upgrade(args.to)
+        elif args.command == 'down':
+            if args.to is None:
+                parser.error('down requires --to VERSION')
+            downgrade(args.to)
+
+        version = current_version()
+        for migration in available_migrations():
+            print(f"{'x' if migration.version <= version else ' '} {migration.version:04d}_{migration.name}")
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+-- Number of topics per category and status, kept in sync by topics_services
+CREATE TABLE topic_counts (
+  category_id INT(11) NOT NULL,
+  is_locked TINYINT(2) NOT NULL,
+  total INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (category_id, is_locked),
+  CONSTRAINT fk_topic_counts_categories1
+    FOREIGN KEY (category_id)
+    REFERENCES categories (category_id)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION)
+ENGINE = InnoDB;
+
+INSERT INTO topic_counts(category_id, is_locked, total)
+SELECT category_id, is_locked, COUNT(*) FROM topics GROUP BY category_id, is_locked;
@@ -0,0 +1,3 @@
+ALTER TABLE replies DROP INDEX ft_replies_text;
+
+ALTER TABLE topics DROP INDEX ft_topics_title;
@@ -0,0 +1,3 @@
+ALTER TABLE topics ADD FULLTEXT INDEX ft_topics_title (title);
+
+ALTER TABLE replies ADD FULLTEXT INDEX ft_replies_text (text);
@@ -0,0 +1,4 @@
+ALTER TABLE replies
+  DROP COLUMN score,
+  DROP COLUMN downvotes,
+  DROP COLUMN upvotes;
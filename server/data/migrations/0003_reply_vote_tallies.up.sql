@@ -0,0 +1,10 @@
+ALTER TABLE replies
+  ADD COLUMN upvotes INT(11) NOT NULL DEFAULT 0,
+  ADD COLUMN downvotes INT(11) NOT NULL DEFAULT 0,
+  ADD COLUMN score INT(11) AS (upvotes - downvotes) STORED;
+
+UPDATE replies r
+  JOIN (SELECT reply_id, SUM(type = 1) AS upvotes, SUM(type = 0) AS downvotes
+        FROM votes
+        GROUP BY reply_id) v ON v.reply_id = r.reply_id
+  SET r.upvotes = v.upvotes, r.downvotes = v.downvotes;
@@ -0,0 +1,11 @@
+ALTER TABLE topics
+  DROP INDEX idx_topics_best_reply_sort_desc,
+  DROP INDEX idx_topics_best_reply_sort,
+  DROP INDEX idx_topics_locked_sort,
+  DROP INDEX idx_topics_title_sort,
+  DROP INDEX fk_topics_categories1_idx,
+  ADD INDEX fk_topics_categories1_idx (category_id),
+  DROP INDEX fk_topics_users1_idx,
+  ADD INDEX fk_topics_users1_idx (user_id);
+
+ALTER TABLE topics DROP COLUMN best_reply_missing;
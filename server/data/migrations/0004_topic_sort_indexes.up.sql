@@ -0,0 +1,13 @@
+-- 1 when best_reply_id is NULL, sorting on it first keeps the topics without a best reply last
+ALTER TABLE topics ADD COLUMN best_reply_missing TINYINT(1) AS (best_reply_id IS NULL) STORED;
+
+-- every sortable column is indexed together with topic_id, the tie breaker of the listings
+ALTER TABLE topics
+  DROP INDEX fk_topics_users1_idx,
+  ADD INDEX fk_topics_users1_idx (user_id, topic_id),
+  DROP INDEX fk_topics_categories1_idx,
+  ADD INDEX fk_topics_categories1_idx (category_id, topic_id),
+  ADD INDEX idx_topics_title_sort (title, topic_id),
+  ADD INDEX idx_topics_locked_sort (is_locked, topic_id),
+  ADD INDEX idx_topics_best_reply_sort (best_reply_missing, best_reply_id, topic_id),
+  ADD INDEX idx_topics_best_reply_sort_desc (best_reply_missing, best_reply_id DESC, topic_id DESC);
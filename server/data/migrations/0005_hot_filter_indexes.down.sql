@@ -0,0 +1,9 @@
+ALTER TABLE votes
+  DROP INDEX fk_votes_replies1_idx,
+  ADD INDEX fk_votes_replies1_idx (reply_id);
+
+ALTER TABLE messages
+  DROP INDEX fk_messages_users1_idx,
+  ADD INDEX fk_messages_users1_idx (sender_id);
+
+ALTER TABLE users DROP INDEX idx_users_username_deleted;
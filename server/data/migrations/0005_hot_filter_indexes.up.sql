@@ -0,0 +1,12 @@
+-- username lookups skip deleted users, the pair is answered from the index alone
+ALTER TABLE users ADD INDEX idx_users_username_deleted (username, is_deleted);
+
+-- one conversation, in message order
+ALTER TABLE messages
+  DROP INDEX fk_messages_users1_idx,
+  ADD INDEX fk_messages_users1_idx (sender_id, receiver_id, message_id);
+
+-- votes of a reply by type, used to rebuild the reply tallies
+ALTER TABLE votes
+  DROP INDEX fk_votes_replies1_idx,
+  ADD INDEX fk_votes_replies1_idx (reply_id, type);
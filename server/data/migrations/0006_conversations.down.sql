@@ -0,0 +1,6 @@
+DROP TABLE conversations;
+
+ALTER TABLE messages
+  DROP INDEX idx_messages_pair,
+  DROP COLUMN user_high_id,
+  DROP COLUMN user_low_id;
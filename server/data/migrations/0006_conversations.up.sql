@@ -0,0 +1,36 @@
+-- The two participants of a message in a fixed order, a conversation reads one index range
+ALTER TABLE messages
+  ADD COLUMN user_low_id INT(11) AS (LEAST(sender_id, receiver_id)) STORED,
+  ADD COLUMN user_high_id INT(11) AS (GREATEST(sender_id, receiver_id)) STORED,
+  ADD INDEX idx_messages_pair (user_low_id, user_high_id, message_id);
+
+-- One row per participant of a conversation, kept in sync by messages_services
+CREATE TABLE conversations (
+  user_id INT(11) NOT NULL,
+  other_user_id INT(11) NOT NULL,
+  last_message_id INT(11) NOT NULL,
+  last_activity DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  unread_count INT(11) NOT NULL DEFAULT 0,
+  message_count INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, other_user_id),
+  INDEX idx_conversations_inbox (user_id, last_activity, other_user_id),
+  INDEX fk_conversations_users2_idx (other_user_id),
+  CONSTRAINT fk_conversations_users1
+    FOREIGN KEY (user_id)
+    REFERENCES users (user_id)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION,
+  CONSTRAINT fk_conversations_users2
+    FOREIGN KEY (other_user_id)
+    REFERENCES users (user_id)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION)
+ENGINE = InnoDB;
+
+-- messages carry no timestamps, existing conversations start with the migration time and nothing unread
+INSERT INTO conversations(user_id, other_user_id, last_message_id, message_count)
+SELECT p.user_id, p.other_user_id, MAX(p.message_id), COUNT(*)
+FROM (SELECT sender_id AS user_id, receiver_id AS other_user_id, message_id FROM messages
+      UNION ALL
+      SELECT receiver_id, sender_id, message_id FROM messages WHERE receiver_id <> sender_id) p
+GROUP BY p.user_id, p.other_user_id;
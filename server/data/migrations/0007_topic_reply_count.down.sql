@@ -0,0 +1 @@
+ALTER TABLE topics DROP COLUMN reply_count;
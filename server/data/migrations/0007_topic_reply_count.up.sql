@@ -0,0 +1,6 @@
+-- Number of replies of each topic, kept in sync by replies_services
+ALTER TABLE topics ADD COLUMN reply_count INT(11) NOT NULL DEFAULT 0;
+
+UPDATE topics t
+JOIN (SELECT topic_id, COUNT(*) AS total FROM replies GROUP BY topic_id) r ON r.topic_id = t.topic_id
+SET t.reply_count = r.total;
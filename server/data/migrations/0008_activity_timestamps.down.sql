@@ -0,0 +1,14 @@
+ALTER TABLE messages
+  DROP COLUMN updated_at,
+  DROP COLUMN created_at;
+
+ALTER TABLE replies
+  DROP COLUMN updated_at,
+  DROP COLUMN created_at;
+
+ALTER TABLE topics
+  DROP INDEX idx_topics_activity_sort,
+  DROP COLUMN last_activity_at,
+  DROP COLUMN last_reply_id,
+  DROP COLUMN updated_at,
+  DROP COLUMN created_at;
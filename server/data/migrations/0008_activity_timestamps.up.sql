@@ -0,0 +1,19 @@
+-- Rows created before this migration get its time, the tables had no timestamps
+ALTER TABLE topics
+  ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  ADD COLUMN updated_at DATETIME NULL DEFAULT NULL,
+  ADD COLUMN last_reply_id INT(11) NULL DEFAULT NULL,
+  ADD COLUMN last_activity_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  ADD INDEX idx_topics_activity_sort (last_activity_at, topic_id);
+
+ALTER TABLE replies
+  ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  ADD COLUMN updated_at DATETIME NULL DEFAULT NULL;
+
+ALTER TABLE messages
+  ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  ADD COLUMN updated_at DATETIME NULL DEFAULT NULL;
+
+UPDATE topics t
+JOIN (SELECT topic_id, MAX(reply_id) AS last_reply_id FROM replies GROUP BY topic_id) r ON r.topic_id = t.topic_id
+SET t.last_reply_id = r.last_reply_id;
@@ -0,0 +1 @@
+DROP TABLE topic_scores;
@@ -0,0 +1,13 @@
+-- Snapshot of the hot and top scores of the topics, written periodically by the topic ranking
+-- so that a restarted server does not score every topic again
+CREATE TABLE topic_scores (
+  topic_id INT(11) NOT NULL,
+  hot DOUBLE NOT NULL,
+  top INT(11) NOT NULL,
+  PRIMARY KEY (topic_id),
+  CONSTRAINT fk_topic_scores_topics1
+    FOREIGN KEY (topic_id)
+    REFERENCES topics (topic_id)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION)
+ENGINE = InnoDB;
@@ -0,0 +1,3 @@
+-- Bumped when the user changes password or is deleted, tokens issued with an older version are rejected
+ALTER TABLE users
+  ADD COLUMN token_version INT(11) NOT NULL DEFAULT 0;
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pydantic import BaseModel
 from common.utils import Links, PaginationInfo
 from data.models.topic import TopicResponse
@@ -11,7 +12,7 @@ class Category(BaseModel):
 
     @classmethod
     def from_query(cls, category_id, name, is_locked, is_private):
-        return cls(
+        return cls.model_construct(
             category_id=category_id,
             name=name,
             is_locked=True if is_locked == 1 else False,
@@ -19,6 +20,17 @@ class Category(BaseModel):
         )
 
 
+@dataclass(frozen=True, slots=True)
+class CategoryRecord:
+    """
+    A category as kept by the category registry, see categories_services.get_record
+    """
+    category_id: int
+    name: str
+    is_locked: bool
+    is_private: bool
+
+
 class CategoryTopicsPaginate(BaseModel):
     category: Category
     topics: list[TopicResponse]
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from pydantic import BaseModel
+from common.utils import PaginationInfo, Links
 
 
 class Message(BaseModel):
@@ -6,16 +8,52 @@ class Message(BaseModel):
     text: str
     sender_id: int
     receiver_id: int
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
 
     @classmethod
-    def from_query(cls, message_id, text, sender_id, receiver_id):
-        return cls(
+    def from_query(cls, message_id, text, sender_id, receiver_id, created_at=None, updated_at=None):
+        return cls.model_construct(
             message_id=message_id,
             text=text,
             sender_id=sender_id,
-            receiver_id=receiver_id
+            receiver_id=receiver_id,
+            created_at=created_at,
+            updated_at=updated_at
         )
 
 
 class MessageText(BaseModel):
     text: str  # = Field(..., min_length=1)
+
+
+class ConversationSummary(BaseModel):
+    user_id: int
+    username: str
+    last_message: Message
+    last_activity: datetime
+    unread_count: int
+    message_count: int
+
+    @classmethod
+    def from_query(cls, user_id, username, last_activity, unread_count, message_count, *last_message):
+        return cls.model_construct(
+            user_id=user_id,
+            username=username,
+            last_message=Message.from_query(*last_message),
+            last_activity=last_activity,
+            unread_count=unread_count,
+            message_count=message_count
+        )
+
+
+class InboxPaginate(BaseModel):
+    conversations: list[ConversationSummary]
+    pagination_info: PaginationInfo
+    links: Links
+
+
+class MessagesPaginate(BaseModel):
+    messages: list[Message]
+    pagination_info: PaginationInfo
+    links: Links
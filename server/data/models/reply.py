@@ -1,4 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
+from data.models.vote import VoteTally
 
 
 class ReplyCreateUpdate(BaseModel):
@@ -10,12 +12,21 @@ class ReplyResponse(BaseModel):
     text: str
     username: str
     topic_id: int
+    votes: VoteTally | None = None
+    is_best_reply: bool | None = None
+    my_vote: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
 
     @classmethod
-    def from_query(cls, reply_id, text, username, topic_id):
-        return cls(
+    def from_query(cls, reply_id, text, username, topic_id, upvotes=None, downvotes=None, score=None,
+                   created_at=None, updated_at=None):
+        return cls.model_construct(
             reply_id=reply_id,
             text=text,
             username=username,
-            topic_id=topic_id
+            topic_id=topic_id,
+            votes=VoteTally.from_query(upvotes, downvotes, score) if upvotes is not None else None,
+            created_at=created_at,
+            updated_at=updated_at
         )
@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from common.utils import PaginationInfo, Links
+
+
+class SearchKind:
+    TOPIC = 'topic'
+    REPLY = 'reply'
+
+
+class SearchResult(BaseModel):
+    kind: str
+    topic_id: int
+    reply_id: int | None = None
+    title: str
+    snippet: str
+    score: float
+
+    @classmethod
+    def from_query(cls, kind, topic_id, reply_id, title, snippet, score):
+        return cls(
+            kind=kind,
+            topic_id=topic_id,
+            reply_id=reply_id,
+            title=title,
+            snippet=snippet,
+            score=score
+        )
+
+
+class SearchResultsPaginate(BaseModel):
+    query: str
+    results: list[SearchResult]
+    pagination_info: PaginationInfo
+    links: Links
@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+from datetime import datetime
 from pydantic import BaseModel, Field
 from common.utils import PaginationInfo, Links
 from data.models.reply import ReplyResponse
@@ -14,6 +16,22 @@ class Status:
 UNCATEGORIZED_ID = 1  # 'Uncategorized' category is created on db initialization
 
 
+@dataclass(frozen=True, slots=True)
+class TopicRecord:
+    """
+    The columns the access checks read, see topics_services.get_record
+    """
+    topic_id: int
+    title: str
+    user_id: int
+    status: str
+    category_id: int
+
+    @classmethod
+    def from_query(cls, topic_id, title, user_id, is_locked, category_id):
+        return cls(topic_id, title, user_id, Status.int_str[is_locked], category_id)
+
+
 class TopicUpdate(BaseModel):
     # title: str | None = None
     best_reply_id: int | None = None
@@ -28,10 +46,17 @@ class TopicResponse(BaseModel):
     best_reply_id: int | None
     category_id: int = UNCATEGORIZED_ID
     category_name: str
+    reply_count: int | None = None
+    last_reply_id: int | None = None
+    last_activity_at: datetime | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
 
     @classmethod
-    def from_query(cls, topic_id, title, user_id, author, status, best_reply_id, category_id, category_name):
-        return cls(
+    def from_query(cls, topic_id, title, user_id, author, status, best_reply_id, category_id, category_name,
+                   reply_count=None, last_reply_id=None, last_activity_at=None, created_at=None, updated_at=None):
+        # rows come from the database already typed, validating every field of a page again is wasted work
+        return cls.model_construct(
             topic_id=topic_id,
             title=title,
             user_id=user_id,
@@ -39,7 +64,12 @@ class TopicResponse(BaseModel):
             status=Status.int_str[status],
             best_reply_id=best_reply_id,
             category_id=category_id,
-            category_name=category_name
+            category_name=category_name,
+            reply_count=reply_count,
+            last_reply_id=last_reply_id,
+            last_activity_at=last_activity_at,
+            created_at=created_at,
+            updated_at=updated_at
         )
 
 
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Annotated
 from pydantic import BaseModel, StringConstraints
 
@@ -10,9 +11,10 @@ class User(BaseModel):
     first_name: str | None = None
     last_name: str | None = None
     is_admin: bool | None = None
+    token_version: int = 0
 
     @classmethod
-    def from_query(cls, user_id, username, password, email, first_name, last_name, is_admin):
+    def from_query(cls, user_id, username, password, email, first_name, last_name, is_admin, token_version=0):
         return cls(
             user_id=user_id,
             username=username,
@@ -20,10 +22,32 @@ class User(BaseModel):
             email=email,
             first_name=first_name,
             last_name=last_name,
-            is_admin=is_admin
+            is_admin=is_admin,
+            token_version=token_version
         )
 
 
+@dataclass(frozen=True, slots=True)
+class AuthUser:
+    """
+    The authenticated user of a request, as kept in users_cache
+
+    Leaves out the password hash, see users_services.get_password_hash
+    """
+    user_id: int
+    username: str
+    email: str
+    first_name: str | None
+    last_name: str | None
+    is_admin: bool
+    # tokens carrying an older version were revoked
+    token_version: int = 0
+
+    @classmethod
+    def from_query(cls, user_id, username, email, first_name, last_name, is_admin, token_version):
+        return cls(user_id, username, email, first_name, last_name, bool(is_admin), token_version)
+
+
 class UserRegister(BaseModel):
     username: Annotated[str, StringConstraints(min_length=4)]
     password: Annotated[str, StringConstraints(min_length=4)]
@@ -55,7 +79,7 @@ class UserInfo(BaseModel):
 
     @classmethod
     def from_query(cls, username, email, first_name, last_name):
-        return cls(
+        return cls.model_construct(
             username=username,
             email=email,
             first_name=first_name,
@@ -75,3 +99,5 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: str
     is_admin: bool
+    # tokens issued before the claim existed count as version 0
+    token_version: int = 0
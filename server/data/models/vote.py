@@ -1,3 +1,20 @@
+from pydantic import BaseModel
+
+
 class VoteStatus:
     str_to_int = {'up': 1, 'down': 0}
     int_to_str = {0: 'down', 1: 'up'}
+
+
+class VoteTally(BaseModel):
+    upvotes: int = 0
+    downvotes: int = 0
+    score: int = 0
+
+    @classmethod
+    def from_query(cls, upvotes, downvotes, score):
+        return cls.model_construct(
+            upvotes=upvotes,
+            downvotes=downvotes,
+            score=score
+        )
@@ -0,0 +1,187 @@
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from mariadb import Error as MariaDBError
+
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no connection becomes available within the checkout timeout
+    """
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    timeouts: int = 0
+    created: int = 0
+    recycled: int = 0
+    failed_health_checks: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    @property
+    def avg_wait_time(self) -> float:
+        return self.total_wait_time / self.checkouts if self.checkouts else 0.0
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections
+
+    - At most `size` connections are open at the same time
+    - Checkout waits up to `timeout` seconds, then raises PoolTimeoutError
+    - Connections idle for more than `max_idle` seconds are pinged before reuse
+    - Connections older than `max_lifetime` seconds are closed and replaced
+    """
+
+    def __init__(self, factory, size: int = 10, timeout: float = 5.0,
+                 max_idle: float = 60.0, max_lifetime: float = 3600.0):
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+
+        self._idle: deque[_PooledConnection] = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self.metrics = PoolMetrics()
+
+    def acquire(self) -> _PooledConnection:
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._open >= self.size:
+                        self.metrics.timeouts += 1
+                        raise PoolTimeoutError(f'No connection available after {self.timeout}s')
+
+            pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                # reserve the slot before connecting outside of the lock
+                self._open += 1
+
+            waited = time.monotonic() - start
+            self.metrics.checkouts += 1
+            self.metrics.total_wait_time += waited
+            self.metrics.max_wait_time = max(self.metrics.max_wait_time, waited)
+
+        if pooled is not None:
+            pooled = self._ensure_healthy(pooled)
+        else:
+            pooled = self._create()
+
+        return pooled
+
+    def release(self, pooled: _PooledConnection, discard: bool = False) -> None:
+        if not discard:
+            try:
+                # ends any transaction left open, so the next reader gets a fresh snapshot
+                pooled.conn.rollback()
+            except MariaDBError:
+                discard = True
+
+        if discard:
+            self._close(pooled)
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+
+        pooled.last_used_at = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        pooled = self.acquire()
+        discard = False
+        try:
+            yield pooled.conn
+        except MariaDBError:
+            discard = True
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def close(self) -> None:
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'checkouts': self.metrics.checkouts,
+                'timeouts': self.metrics.timeouts,
+                'created': self.metrics.created,
+                'recycled': self.metrics.recycled,
+                'failed_health_checks': self.metrics.failed_health_checks,
+                'avg_wait_time': self.metrics.avg_wait_time,
+                'max_wait_time': self.metrics.max_wait_time,
+            }
+
+    def _create(self) -> _PooledConnection:
+        try:
+            pooled = _PooledConnection(self._factory())
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self.metrics.created += 1
+        return pooled
+
+    def _ensure_healthy(self, pooled: _PooledConnection) -> _PooledConnection:
+        now = time.monotonic()
+
+        if now - pooled.created_at > self.max_lifetime:
+            with self._cond:
+                self.metrics.recycled += 1
+            return self._replace(pooled)
+
+        if now - pooled.last_used_at > self.max_idle:
+            try:
+                pooled.conn.ping()
+            except MariaDBError:
+                with self._cond:
+                    self.metrics.failed_health_checks += 1
+                return self._replace(pooled)
+
+        return pooled
+
+    def _replace(self, pooled: _PooledConnection) -> _PooledConnection:
+        # the slot stays reserved, only the underlying connection changes
+        self._close(pooled)
+        return self._create()
+
+    @staticmethod
+    def _close(pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except MariaDBError:
+            pass
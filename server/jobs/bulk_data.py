@@ -0,0 +1,103 @@
+# Exports the forum data to NDJSON or CSV files, or imports it from them.
+# Run from the `server` directory, e.g.
+#   python -m jobs.bulk_data export --dir backup --format ndjson
+#   python -m jobs.bulk_data import --dir backup --format ndjson --batch-size 1000
+#
+# There is one file per entity, e.g. backup/users.ndjson. An interrupted import is resumed
+# from the checkpoint file, which records the rows committed so far and is removed at the end.
+# With FORUM_REDIS_URL set, the running servers drop their cached data after an import.
+import argparse
+import json
+import os
+from pathlib import Path
+from data.database import close_pool
+from common.cache import RedisInvalidationChannel
+from common.category_registry import category_registry
+from common.hashing import hashing_service
+from common.response_cache import response_cache
+from services import users_services
+from services.bulk_services import ENTITIES, import_rows, export, read_rows, refresh_derived
+
+REDIS_URL = os.environ.get('FORUM_REDIS_URL')
+
+
+def export_files(directory: Path, format: str, names: list[str]) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        path = directory / f'{name}.{format}'
+        rows = -1 if format == 'csv' else 0  # the header
+        with path.open('w', encoding='utf-8', newline='') as file:
+            for chunk in export(name, format):
+                file.write(chunk)
+                rows += 1
+        print(f'Exported {rows} {name} to {path}')
+
+
+def import_files(directory: Path, format: str, names: list[str], batch_size: int, checkpoint_path: Path) -> None:
+    checkpoint = json.loads(checkpoint_path.read_text()) if checkpoint_path.exists() else {'done': [], 'rows': {}}
+
+    def save(name: str, rows: int) -> None:
+        checkpoint['rows'][name] = rows
+        temporary = checkpoint_path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(checkpoint))
+        os.replace(temporary, checkpoint_path)
+
+    imported = set()
+    for name in names:
+        path = directory / f'{name}.{format}'
+        if name in checkpoint['done'] or not path.exists():
+            continue
+
+        skip = checkpoint['rows'].get(name, 0)
+        with path.open(encoding='utf-8', newline='') as file:
+            rows = import_rows(name, read_rows(file, format), batch_size=batch_size, skip=skip,
+                               on_batch=lambda done: save(name, done))
+
+        checkpoint['done'].append(name)
+        save(name, skip + rows)
+        imported.add(name)
+        print(f'Imported {rows} {name}' + (f', resumed after {skip}' if skip else ''))
+
+    print('Rebuilding reply counts, last activity, vote tallies, topic counts, topic scores and conversations')
+    refresh_derived(imported | set(checkpoint['done']))
+    checkpoint_path.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk export or import of the forum data')
+    parser.add_argument('command', choices=('export', 'import'))
+    parser.add_argument('--dir', type=Path, required=True, help='directory of the entity files')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--entities', default=','.join(ENTITIES), help='comma separated, all by default')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows per INSERT and transaction')
+    parser.add_argument('--checkpoint', type=Path, help='defaults to <dir>/import.checkpoint.json')
+    args = parser.parse_args()
+
+    names = args.entities.split(',')
+    unknown = set(names) - set(ENTITIES)
+    if unknown:
+        parser.error(f'unknown entities: {", ".join(sorted(unknown))}')
+    # always in dependency order
+    names = [name for name in ENTITIES if name in names]
+
+    channel = RedisInvalidationChannel(REDIS_URL) if REDIS_URL and args.command == 'import' else None
+    if channel:
+        response_cache.attach(channel)
+        users_services.users_cache.attach(channel)
+        category_registry.attach(channel)
+
+    try:
+        if args.command == 'export':
+            export_files(args.dir, args.format, names)
+        else:
+            import_files(args.dir, args.format, names, args.batch_size,
+                         args.checkpoint or args.dir / 'import.checkpoint.json')
+    finally:
+        if channel:
+            channel.close()
+        hashing_service.shutdown()
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
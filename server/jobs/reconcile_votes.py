@@ -0,0 +1,37 @@
+# Rebuilds the upvotes/downvotes counters of the replies from the votes table.
+# Run from the `server` directory, e.g. nightly:  python -m jobs.reconcile_votes --batch-size 1000
+# With FORUM_REDIS_URL set, the running servers drop their cached responses of the corrected replies
+# and rank their topics again.
+import argparse
+import os
+from data.database import close_pool
+from common.cache import RedisInvalidationChannel
+from common.response_cache import response_cache
+from services.topic_ranking import topic_ranking
+from services.votes_services import reconcile_tallies
+
+REDIS_URL = os.environ.get('FORUM_REDIS_URL')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the vote tallies of all replies')
+    parser.add_argument('--batch-size', type=int, default=1000, help='reply ids per transaction')
+    args = parser.parse_args()
+
+    channel = RedisInvalidationChannel(REDIS_URL) if REDIS_URL else None
+    if channel:
+        response_cache.attach(channel)
+        topic_ranking.attach(channel)
+
+    try:
+        scanned = reconcile_tallies(batch_size=args.batch_size)
+    finally:
+        if channel:
+            channel.close()
+        close_pool()
+
+    print(f'Reconciled vote tallies of replies #1-#{scanned}')
+
+
+if __name__ == '__main__':
+    main()
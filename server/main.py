@@ -1,5 +1,24 @@
+import logging
+import os
 import uvicorn
-from fastapi import FastAPI, Request
+from anyio import to_thread
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends
+from fastapi.responses import ORJSONResponse
+from common.unit_of_work import unit_of_work, reserve_finish_threads
+from data.database import close_pool, POOL_SIZE
+from data.pool import PoolTimeoutError
+from data.migrate import check_schema
+from common.cache import RedisInvalidationChannel
+from common.responses import SC
+from common.token_cache import verified_tokens
+from common.category_registry import category_registry
+from common.response_cache import ResponseCacheMiddleware, response_cache
+from common.hashing import hashing_service
+from common.events import event_bus, RedisEventBroker
+from services import users_services
+from services.vote_queue import vote_queue, VOTE_QUEUE_ENABLED
+from services.topic_ranking import topic_ranking
 from routers.users import users_router
 from routers.categories import categories_router
 from routers.topics import topics_router
@@ -7,8 +26,59 @@ from routers.admin import admin_router
 from routers.replies import replies_router
 from routers.votes import votes_router
 from routers.messages import messages_router
+from routers.search import search_router
+from routers.events import events_router
 
-app = FastAPI()
+# sync handlers run in this threadpool, Starlette's default of 40 threads caps in-flight requests,
+# requests past the connection pool size wait for a connection and get a 503 after FORUM_DB_POOL_TIMEOUT
+THREADPOOL_SIZE = int(os.environ.get('FORUM_THREADPOOL_SIZE', 200))
+
+logger = logging.getLogger(__name__)
+
+# optional, shares cache invalidations and pushed events between uvicorn workers (requires the `redis` package)
+REDIS_URL = os.environ.get('FORUM_REDIS_URL')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    reserve_finish_threads(POOL_SIZE)
+
+    channel = RedisInvalidationChannel(REDIS_URL) if REDIS_URL else None
+    if channel:
+        users_services.users_cache.attach(channel)
+        verified_tokens.attach(channel)
+        category_registry.attach(channel)
+        response_cache.attach(channel)
+        topic_ranking.attach(channel)
+        event_bus.use(RedisEventBroker(REDIS_URL))
+
+    check_schema()
+    category_registry.load(force=True)
+    topic_ranking.start()
+
+    if VOTE_QUEUE_ENABLED:
+        vote_queue.start()
+
+    yield
+
+    # ends the open event streams, so the server does not wait for them to disconnect
+    event_bus.close()
+    # writes the queued votes while the connection pool is still open
+    try:
+        vote_queue.stop()
+    except Exception:
+        logger.exception('Writing the queued votes on shutdown failed, %s votes lost', vote_queue.stats()['depth'])
+    # saves the scores that changed since the last snapshot
+    topic_ranking.stop()
+    if channel:
+        channel.close()
+    hashing_service.shutdown()
+    close_pool()
+
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(unit_of_work)], default_response_class=ORJSONResponse)
+app.add_middleware(ResponseCacheMiddleware)
 app.include_router(users_router)
 app.include_router(categories_router)
 app.include_router(topics_router)
@@ -16,6 +86,16 @@ app.include_router(admin_router)
 app.include_router(replies_router)
 app.include_router(votes_router)
 app.include_router(messages_router)
+app.include_router(search_router)
+app.include_router(events_router)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # every connection stayed busy for the whole checkout timeout, the client should back off
+    return ORJSONResponse({'detail': 'The server is busy, try again later'},
+                          status_code=SC.ServiceUnavailable, headers={'Retry-After': '1'})
+
 
 if __name__ == '__main__':
     uvicorn.run('main:app', host='127.0.0.1', port=8000)
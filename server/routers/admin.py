@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
+import io
+from fastapi import APIRouter, HTTPException, UploadFile, Query
+from starlette.responses import StreamingResponse
 from common.responses import SC, HTTPBadRequest, HTTPForbidden, HTTPNotFound, HTTPUnauthorized
 from data.models.category import Category
 from routers.topics import switch_topic_locking_helper
-from services import categories_services, users_services
+from services import categories_services, users_services, bulk_services
 from common.oauth import AdminAuthDep
+from data.database import pool_stats
+from common.token_cache import verified_tokens
+from common.hashing import hashing_service
+from common.category_registry import category_registry
+from services.vote_queue import vote_queue
+from services.topic_ranking import topic_ranking
+from common.response_cache import response_cache
+from common.events import event_bus
 
 admin_router = APIRouter(prefix='/admin', tags=['admin'])
 
@@ -124,3 +134,67 @@ def switch_topic_locking(topic_id: int, current_admin: AdminAuthDep):
     - A locked Topic no longer accepts Replies
     """
     return switch_topic_locking_helper(topic_id, current_admin)
+
+
+# ============================== Bulk data ==============================
+
+@admin_router.get('/export/{entity}')
+def export_entity(entity: str, current_admin: AdminAuthDep, format: str = 'ndjson'):
+    """
+    - Admin can download all rows of users, categories, permissions, topics, replies, votes or messages
+    - As NDJSON (default) or CSV, streamed from the database without loading them in memory
+    """
+    try:
+        chunks = bulk_services.export(entity, format)
+    except bulk_services.BulkError as error:
+        raise HTTPBadRequest(str(error))
+
+    return StreamingResponse(chunks, media_type=bulk_services.FORMATS[format],
+                             headers={'Content-Disposition': f'attachment; filename="{entity}.{format}"'})
+
+
+@admin_router.post('/import/{entity}')
+def import_entity(
+        entity: str,
+        file: UploadFile,
+        current_admin: AdminAuthDep,
+        format: str = 'ndjson',
+        batch_size: int = Query(1000, ge=1, le=10000),
+        skip: int = Query(0, ge=0, description="Rows already imported by an interrupted upload")
+):
+    """
+    - Admin can upload rows in the format of the export, existing rows are updated
+    - Rows are written in batches, each committed on its own
+    - Plain-text user passwords are hashed, bcrypt hashes are kept as they are
+    - If the upload fails, `imported` rows are committed, the file can be uploaded again with skip
+    """
+    try:
+        bulk_services.check_format(format)
+        text = io.TextIOWrapper(file.file, encoding='utf-8', newline='')
+        imported = bulk_services.import_rows(entity, bulk_services.read_rows(text, format),
+                                             batch_size=batch_size, skip=skip)
+    except (bulk_services.BulkError, UnicodeDecodeError) as error:
+        raise HTTPBadRequest(str(error))
+
+    bulk_services.refresh_derived({entity})
+    return {'entity': entity, 'imported': imported, 'skipped': skip}
+
+
+# ============================== Metrics ==============================
+
+@admin_router.get('/metrics')
+def view_metrics(current_admin: AdminAuthDep):
+    """
+    - Admin can view runtime metrics of the server process
+    """
+    return {
+        'db_pool': pool_stats(),
+        'users_cache': users_services.users_cache.stats(),
+        'tokens_cache': verified_tokens.stats(),
+        'hashing': hashing_service.stats(),
+        'category_registry': category_registry.stats(),
+        'vote_queue': vote_queue.stats(),
+        'response_cache': response_cache.stats(),
+        'events': event_bus.stats(),
+        'topic_ranking': topic_ranking.stats()
+    }
@@ -1,19 +1,21 @@
 from starlette.requests import Request
 from fastapi import APIRouter, HTTPException, Query
 from common.oauth import OptionalUser
-from common.responses import SC
+from common.responses import SC, LeanRoute
 from data.models.user import AnonymousUser
 from data.models.category import Category, CategoryTopicsPaginate
 from services import categories_services, topics_services
-from common.utils import Page, Links, create_links, get_pagination_info
+from services.topics_services import RANKED_SORTS
+from common.utils import Page
+from common.response_cache import cache_response
 
-categories_router = APIRouter(prefix='/categories', tags=['categories'])
+categories_router = APIRouter(prefix='/categories', tags=['categories'], route_class=LeanRoute)
 
 
 @categories_router.get('/')
-def get_all_categories(
-        search: str | None = None) -> list[Category]:
+def get_all_categories(request: Request, search: str | None = None) -> list[Category]:
     categories = categories_services.get_all(search=search)
+    cache_response(request, 'categories')
     return categories
 
 
@@ -27,6 +29,8 @@ def get_category_by_id(
         search: str | None = None,
         sort: str | None = None,
         sort_by: str | None = 'topic_id',
+        cursor: str | None = None,
+        estimate_total: bool = False
 ) -> CategoryTopicsPaginate:
     """
     - Returns Category with a list of Topics, if Category is public
@@ -37,9 +41,13 @@ def get_category_by_id(
         - user_id of the author
         - status (open or locked)
         - best_reply_id
+        - hot (votes and replies, favouring recent activity) or top (net votes on the replies),
+          highest first unless sort=asc, cannot be combined with search
     - Topics can be searched by:
-        - title
+        - title (every word of the search starts a word of the title)
     - User can choose number of pages displayed (1 by default) and number of items per page (1 by default, maximum 15)
+    - Passing a cursor (empty for the first page) switches to cursor pagination
+    - estimate_total=true returns an estimated total_elements when searching, which is cheaper
     """
 
     category = categories_services.get_by_id(category_id)
@@ -64,14 +72,22 @@ def get_category_by_id(
             detail=f"Invalid sort parameter"
         )
 
-    if sort_by and sort_by.lower() not in ['topic_id', 'title', 'user_id', 'status', 'best_reply_id', 'category_id']:
+    if sort_by and sort_by.lower() not in ['topic_id', 'title', 'user_id', 'status', 'best_reply_id', 'category_id',
+                                             'hot', 'top']:
         raise HTTPException(
             status_code=SC.BadRequest,
             detail=f"Invalid sort_by parameter"
         )
 
     topics, pagination_info, links = topics_services.get_topics_paginate_links(
-        request=request, page=page, size=size, sort=sort, sort_by=sort_by, search=search, category=category.name)
+        request=request, page=page, size=size, sort=sort, sort_by=sort_by, search=search, category=category.name,
+        cursor=cursor, estimate_total=estimate_total)
+
+    if not category.is_private:
+        tags = ('categories', 'topics', f'category:{category_id}')
+        if sort_by and sort_by.lower() in RANKED_SORTS:
+            tags += ('ranking',)
+        cache_response(request, *tags)
 
     return CategoryTopicsPaginate(
         category=category,
@@ -0,0 +1,169 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from common.events import event_bus, EVENT_KEEPALIVE
+from common.oauth import get_current_user
+from common.responses import SC
+from common.unit_of_work import UnitOfWorkDep, finish_in_thread
+from data.models.user import AuthUser, AnonymousUser
+from services import topics_services, categories_services
+
+events_router = APIRouter(prefix='/events', tags=['events'])
+
+
+@events_router.get('/stream')
+async def stream_events(
+        request: Request,
+        uow: UnitOfWorkDep,
+        topic_id: list[int] = Query([], description="Topics to follow"),
+        token: str | None = None
+):
+    """
+    - Server-Sent Events with the changes the user follows, instead of polling:
+        - message_created, message_updated: messages of the logged user
+        - reply_created, reply_updated, reply_deleted, votes_changed: replies of the followed topics
+    - The access token goes in the Authorization header or, for EventSource clients, in the token parameter
+    - Guests can follow topics in public categories
+    - The stream ends when the client falls too far behind, it should reload what it shows and reconnect
+    """
+    user = await _authenticate(token or _bearer(request.headers.get('authorization')))
+    channels = await run_in_threadpool(_channels, user, topic_id)
+    await _release_connection(uow)
+
+    subscription = event_bus.subscribe(channels)
+
+    async def stream():
+        try:
+            yield ': connected\n\n'
+            while True:
+                try:
+                    event = await subscription.get(timeout=EVENT_KEEPALIVE)
+                except TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@events_router.websocket('/ws')
+async def websocket_events(
+        websocket: WebSocket,
+        uow: UnitOfWorkDep,
+        topic_id: list[int] = Query([]),
+        token: str | None = None
+):
+    """
+    - Same events as /events/stream, over a WebSocket
+    - The client can change the followed topics with {"subscribe": topic_id} and {"unsubscribe": topic_id}
+    """
+    try:
+        user = await _authenticate(token or _bearer(websocket.headers.get('authorization')))
+        channels = await run_in_threadpool(_channels, user, topic_id)
+    except HTTPException as error:
+        await websocket.close(code=1008, reason=error.detail)
+        return
+    finally:
+        await _release_connection(uow)
+
+    await websocket.accept()
+    subscription = event_bus.subscribe(channels)
+    receiver = asyncio.create_task(_receive_subscriptions(websocket, uow, user, subscription))
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({next_event, receiver}, timeout=EVENT_KEEPALIVE,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_event not in done:
+                next_event.cancel()
+                if receiver in done:
+                    # the client went away
+                    break
+                await websocket.send_json({'type': 'keep-alive'})
+                continue
+
+            event = next_event.result()
+            if event is None:
+                await websocket.close(code=1013 if subscription.overflowed else 1001)
+                break
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        event_bus.unsubscribe(subscription)
+
+
+async def _receive_subscriptions(websocket: WebSocket, uow, user, subscription) -> None:
+    while True:
+        try:
+            message = await websocket.receive_json()
+            if 'subscribe' in message:
+                channel, = await run_in_threadpool(_channels, user, [int(message['subscribe'])], False)
+                event_bus.add_channel(subscription, channel)
+            elif 'unsubscribe' in message:
+                event_bus.remove_channel(subscription, f"topic:{int(message['unsubscribe'])}")
+        except WebSocketDisconnect:
+            return
+        except HTTPException as error:
+            await websocket.send_json({'type': 'error', 'data': {'status_code': error.status_code,
+                                                                 'detail': error.detail}})
+        except (TypeError, ValueError):
+            await websocket.send_json({'type': 'error', 'data': {'status_code': SC.BadRequest,
+                                                                 'detail': 'Invalid message'}})
+        finally:
+            await _release_connection(uow)
+
+
+def _bearer(authorization: str | None) -> str | None:
+    if authorization and authorization.lower().startswith('bearer '):
+        return authorization[len('bearer '):]
+    return None
+
+
+async def _authenticate(token: str | None) -> AuthUser | AnonymousUser:
+    if not token:
+        return AnonymousUser()
+    return await run_in_threadpool(get_current_user, token)
+
+
+def _channels(user: AuthUser | AnonymousUser, topic_ids: list[int], include_user: bool = True) -> set[str]:
+    """
+    The channels of the topics, after the same access checks as viewing them,
+    plus the channel of the user's own messages
+    """
+    channels = {f'user:{user.user_id}'} if include_user and isinstance(user, AuthUser) else set()
+
+    for topic_id in topic_ids:
+        topic = topics_services.get_record(topic_id)
+        if not topic:
+            raise HTTPException(status_code=SC.NotFound, detail=f"Topic #ID:{topic_id} does not exist")
+
+        category = categories_services.get_record(topic.category_id)
+        if category.is_private:
+            if isinstance(user, AnonymousUser):
+                raise HTTPException(status_code=SC.Unauthorized,
+                                    detail='Login to view topics in private categories')
+            if not user.is_admin and not categories_services.has_access_to_private_category(
+                    user.user_id, category.category_id):
+                raise HTTPException(status_code=SC.Forbidden,
+                                    detail='You do not have permission to access this private category')
+
+        channels.add(f'topic:{topic_id}')
+
+    return channels
+
+
+async def _release_connection(uow) -> None:
+    # the connection goes back to the pool before a long-lived stream starts
+    await finish_in_thread(uow.commit)
+    await finish_in_thread(uow.close)
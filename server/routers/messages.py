@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from common.responses import SC
-from data.models.message import MessageText
+from fastapi import APIRouter, HTTPException, Query
+from starlette.requests import Request
+from common.responses import SC, LeanRoute
+from common.utils import Page, get_pagination_info, create_links
+from data.models.message import MessageText, InboxPaginate, MessagesPaginate
 from services import messages_services, users_services
 from common.oauth import UserAuthDep
 
 
-messages_router = APIRouter(prefix='/messages', tags=['messages'])
+messages_router = APIRouter(prefix='/messages', tags=['messages'], route_class=LeanRoute)
 
 
 @messages_router.post('/{receiver_id}', status_code=201)
@@ -37,15 +39,68 @@ def get_all_conversations(current_user: UserAuthDep):
     return result or 'No conversations'
 
 
+@messages_router.get('/inbox')
+def get_inbox(
+        request: Request,
+        current_user: UserAuthDep,
+        size: int = Query(Page.SIZE, ge=1, le=50, description="Page size"),
+        cursor: str = ''
+):
+    """
+    - Returns the conversations of the current user, most recently active first, with:
+        - the last message
+        - the number of unread and of all messages
+    - The next page is requested with the returned next_cursor
+    - Returns 'No conversations', if no conversations
+    """
+    conversations, total, next_cursor = messages_services.get_inbox(current_user.user_id, size, cursor)
+    if not conversations:
+        return 'No conversations'
+
+    pagination_info = get_pagination_info(total, 1, size, cursor=cursor, next_cursor=next_cursor)
+    return InboxPaginate(
+        conversations=conversations,
+        pagination_info=pagination_info,
+        links=create_links(request, pagination_info)
+    )
+
+
 @messages_router.get('/{receiver_id}')
-def get_conversation(receiver_id: int, current_user: UserAuthDep):
+def get_conversation(
+        request: Request,
+        receiver_id: int,
+        current_user: UserAuthDep,
+        size: int = Query(Page.SIZE, ge=1, le=50, description="Page size"),
+        cursor: str = ''
+):
     """
-    - Returns all messages the current user has exchanged with another user
+    - Returns the messages the current user has exchanged with another user, newest first
+    - The next (older) page is requested with the returned next_cursor
     - Returns 'No such conversation', if no messages
     """
-    result = messages_services.get_conversation(current_user.user_id, receiver_id)
+    messages, total, next_cursor = messages_services.get_conversation(
+        current_user.user_id, receiver_id, size, cursor)
+    if not messages:
+        return 'No such conversation'
+
+    pagination_info = get_pagination_info(total, 1, size, cursor=cursor, next_cursor=next_cursor)
+    return MessagesPaginate(
+        messages=messages,
+        pagination_info=pagination_info,
+        links=create_links(request, pagination_info)
+    )
+
+
+@messages_router.patch('/{receiver_id}/read')
+def mark_conversation_read(receiver_id: int, current_user: UserAuthDep):
+    """
+    - Marks the conversation with another user as read, if it exists
+    """
+    if not messages_services.conversation_exists(current_user.user_id, receiver_id):
+        raise HTTPException(status_code=SC.NotFound, detail='No such conversation')
 
-    return result or 'No such conversation'
+    messages_services.mark_read(current_user.user_id, receiver_id)
+    return 'Conversation marked as read'
 
 
 @messages_router.patch('/{message_id}')
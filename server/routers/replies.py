@@ -70,7 +70,7 @@ def edit_reply(topic_id: int, reply_id: int, update: ReplyCreateUpdate, current_
     if not update.text:
         raise HTTPException(status_code=SC.BadRequest, detail="Reply text is required")
 
-    replies_services.update_reply(reply_id, update.text)
+    replies_services.update_reply(reply_id, update.text, reply_to_update.topic_id)
     return f'Reply with ID {reply_id} successfully updated'
 
 
@@ -101,5 +101,5 @@ def delete_reply(topic_id: int, reply_id: int, current_user: UserAuthDep):
             detail=msg
         )
 
-    replies_services.delete_reply(reply_id)
+    replies_services.delete_reply(reply_id, reply_to_delete.topic_id)
     return 'Reply deleted'
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Query
+from starlette.requests import Request
+from common.oauth import OptionalUser
+from common.utils import Page
+from data.models.search import SearchResultsPaginate
+from services import search_services
+
+search_router = APIRouter(prefix='/search', tags=['search'])
+
+
+@search_router.get('/')
+def search(
+        current_user: OptionalUser,
+        request: Request,
+        q: str = Query(..., min_length=1, description="Search terms"),
+        page: int = Query(1, ge=1, description="Page number"),
+        size: int = Query(Page.SIZE, ge=1, le=15, description="Page size")
+) -> SearchResultsPaginate:
+    """
+    - Searches Topic titles and Reply texts, most relevant results first
+    - Each result has a snippet of the matching text
+    - Topics and Replies in private Categories are found only by users with access to them
+    """
+    results, pagination_info, links = search_services.search_paginate_links(
+        request=request, query=q, user=current_user, page=page, size=size)
+
+    return SearchResultsPaginate(
+        query=q,
+        results=results,
+        pagination_info=pagination_info,
+        links=links
+    )
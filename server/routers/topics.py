@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Body, HTTPException, Query
 from services import topics_services, categories_services, users_services, replies_services
+from services.topics_services import RANKED_SORTS
 from common.oauth import OptionalUser, UserAuthDep
-from common.responses import SC
+from common.responses import SC, LeanRoute
 from data.models.topic import Status, TopicUpdate, TopicCreate, TopicsPaginate, TopicRepliesPaginate
 from data.models.user import AnonymousUser
 from common.utils import Page
+from common.response_cache import cache_response
 from starlette.requests import Request
 
-topics_router = APIRouter(prefix='/topics', tags=['topics'])
+topics_router = APIRouter(prefix='/topics', tags=['topics'], route_class=LeanRoute)
+
+# votes is accepted for compatibility, the tallies are always included
+REPLY_EXPANSIONS = {'votes', 'my_vote'}
 
 
 @topics_router.get('/')
@@ -20,7 +25,9 @@ def get_all_topics(
         search: str | None = None,
         username: str | None = None,
         category: str | None = None,
-        status: str | None = None
+        status: str | None = None,
+        cursor: str | None = None,
+        estimate_total: bool = False
 ):
     """
     - User can view all Topics
@@ -31,12 +38,19 @@ def get_all_topics(
         - status (open or locked)
         - best_reply_id
         - category_id
+        - activity (time of the last reply, or creation for topics without replies), sort=desc for the most active
+        - hot (votes and replies, favouring recent activity) or top (net votes on the replies),
+          highest first unless sort=asc, cannot be combined with search or username
     - Topics can be searched by:
-        - title
+        - title (every word of the search starts a word of the title)
         - username (of the author)
         - category name
         - status (open or locked)
     - User can choose number of pages displayed (1 by default) and number of items per page (1 by default, maximum 15)
+    - Passing a cursor (empty for the first page) switches to cursor pagination:
+        - the next page is requested with the returned next_cursor
+        - deep pages cost the same as the first one
+    - estimate_total=true returns an estimated total_elements for searches by title or username, which is cheaper
     """
 
     if username and not users_services.exists_by_username(username):
@@ -63,7 +77,8 @@ def get_all_topics(
             detail=f"Invalid sort parameter"
         )
 
-    if sort_by and sort_by.lower() not in ['topic_id', 'title', 'user_id', 'status', 'best_reply_id', 'category_id']:
+    if sort_by and sort_by.lower() not in ['topic_id', 'title', 'user_id', 'status', 'best_reply_id', 'category_id',
+                                             'activity', 'hot', 'top']:
         raise HTTPException(
             status_code=SC.BadRequest,
             detail=f"Invalid sort_by parameter"
@@ -71,9 +86,17 @@ def get_all_topics(
 
     topics, pagination_info, links = topics_services.get_topics_paginate_links(
         request=request, page=page, size=size, sort=sort, sort_by=sort_by,
-        search=search, username=username, category=category, status=status
+        search=search, username=username, category=category, status=status, cursor=cursor,
+        estimate_total=estimate_total
     )
 
+    tags = ('topics', 'categories')
+    if sort_by and sort_by.lower() in RANKED_SORTS:
+        # the ranking changes with the votes, without touching the topics
+        tags += ('ranking',)
+    # as for the topics of a category, the listing of a private category is never cached
+    if not (category and categories_services.get_by_name(category).is_private):
+        cache_response(request, *tags)
     if not topics:
         return []
 
@@ -90,12 +113,25 @@ def get_topic_by_id(
         current_user: OptionalUser,
         request: Request,
         page: int = Query(1, ge=1, description="Page number"),
-        size: int = Query(Page.SIZE, ge=1, le=15, description="Page size")
+        size: int = Query(Page.SIZE, ge=1, le=15, description="Page size"),
+        expand: str | None = Query(None, description="Comma separated: votes, my_vote"),
+        cursor: str | None = None
 ) -> TopicRepliesPaginate:
     """
     - A guest can view a Topic with all of its Replies, if the Topic belongs to a public Category
     - If the Category is private, authentication is required
+    - Every Reply comes with its votes and whether it is the best Reply
+    - expand=my_vote adds the vote of the logged user on each Reply,
+      expand=votes is accepted and changes nothing
+    - Passing a cursor (empty for the first page) switches to cursor pagination,
+      the next page is requested with the returned next_cursor
     """
+    expansions = set(expand.split(',')) if expand else set()
+    if not expansions <= REPLY_EXPANSIONS:
+        raise HTTPException(
+            status_code=SC.BadRequest,
+            detail=f"Invalid expand parameter"
+        )
 
     topic = topics_services.get_by_id(topic_id)
 
@@ -123,7 +159,13 @@ def get_topic_by_id(
             )
 
     replies, pagination_info, links = replies_services.get_all(topic_id=topic.topic_id, request=request, page=page,
-                                                               size=size)
+                                                               size=size, cursor=cursor)
+    user_id = None if isinstance(current_user, AnonymousUser) else current_user.user_id
+    replies_services.expand(replies, topic, user_id=user_id, my_vote='my_vote' in expansions)
+
+    if not category.is_private:
+        cache_response(request, f'topic:{topic.topic_id}', f'category:{category.category_id}',
+                       *(f'reply:{reply.reply_id}' for reply in replies))
 
     result = TopicRepliesPaginate(
         topic=topic, replies=replies, pagination_info=pagination_info, links=links)
@@ -195,7 +237,7 @@ def switch_topic_locking(topic_id: int, existing_user: UserAuthDep):
 
 
 def switch_topic_locking_helper(topic_id, user):
-    topic = topics_services.get_by_id(topic_id)
+    topic = topics_services.get_record(topic_id)
     if not topic:
         raise HTTPException(SC.BadRequest, "No such topic")
 
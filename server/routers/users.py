@@ -1,18 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from common.responses import SC
+from starlette.concurrency import run_in_threadpool
+from common.responses import SC, LeanRoute
 from data.models.user import UserRegister, UserUpdate, UserChangePassword, UserDelete, TokenData
 from services import users_services
 from common.oauth import create_access_token, UserAuthDep
-from common.utils import verify_password
 from typing import Annotated
 from common import utils
 
-users_router = APIRouter(prefix='/users', tags=['users'])
+users_router = APIRouter(prefix='/users', tags=['users'], route_class=LeanRoute)
 
 
 @users_router.post('/register', status_code=SC.Created)
-def register_user(user: UserRegister):
+async def register_user(user: UserRegister):
     """
     - Registers the user, if:
         - username is at least 4 chars and is not already taken
@@ -20,7 +20,7 @@ def register_user(user: UserRegister):
         - email follows the example
     - First name and last name are not required upon registration
     """
-    result = users_services.register(user)
+    result = await users_services.register(user)
 
     if not isinstance(result, int):
         raise HTTPException(status_code=SC.BadRequest, detail=result.msg)
@@ -29,12 +29,12 @@ def register_user(user: UserRegister):
 
 
 @users_router.post('/login')
-def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     """
     - Logs the user, if username and password are correct
     - Returns access Token
     """
-    user = users_services.try_login(form_data.username, form_data.password)
+    user = await users_services.try_login(form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -44,7 +44,7 @@ def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
         )
 
     token = create_access_token(
-        TokenData(username=user.username, is_admin=user.is_admin))
+        TokenData(username=user.username, is_admin=user.is_admin, token_version=user.token_version))
     return token
 
 
@@ -76,33 +76,33 @@ def update_user(user: UserUpdate, existing_user: UserAuthDep):
 
 
 @users_router.patch('/password')
-def change_user_password(data: UserChangePassword, existing_user: UserAuthDep):
+async def change_user_password(data: UserChangePassword, existing_user: UserAuthDep):
     """
     1. Verifies the current password
     2. Verifies the new password match
     3. Updates in db with new_hashed_password
     """
-    if not utils.verify_password(data.current_password, existing_user.password):
+    if not await users_services.verify_current_password(existing_user.user_id, data.current_password):
         raise HTTPException(SC.Unauthorized, "Current password does not match")
     if not data.current_password != data.new_password:
         raise HTTPException(SC.BadRequest, "New password must be different from current password")
     if not data.new_password == data.confirm_password:
         raise HTTPException(SC.Unauthorized, "New password does not match")
 
-    new_hashed_password = utils.hash_pass(data.new_password)
-    users_services.change_password(existing_user.user_id, new_hashed_password)
+    new_hashed_password = await utils.hash_pass(data.new_password)
+    await run_in_threadpool(users_services.change_password, existing_user.user_id, new_hashed_password)
     return 'Password changed successfully'
 
 
 @users_router.delete('/', status_code=SC.NoContent)
-def delete_user_by_id(existing_user: UserAuthDep, body: UserDelete):
+async def delete_user_by_id(existing_user: UserAuthDep, body: UserDelete):
     """
     - Verifies the current password
     - Flags the user as deleted in db
         - Triggers an object in db that deletes his messages
     """
-    if not utils.verify_password(body.current_password, existing_user.password):
+    if not await users_services.verify_current_password(existing_user.user_id, body.current_password):
         raise HTTPException(status_code=SC.BadRequest,
                             detail=f"Current password does not match")
 
-    users_services.delete(existing_user.user_id)
+    await run_in_threadpool(users_services.delete, existing_user.user_id)
@@ -1,9 +1,10 @@
 from typing import Annotated
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import StringConstraints
 from common.oauth import UserAuthDep
 from common.responses import SC
 from services import votes_services
+from services.vote_queue import vote_queue, VOTE_QUEUE_ENABLED
 from services.replies_services import exists as reply_exists, can_user_access_topic_content
 from services.topics_services import exists as topic_exists
 
@@ -15,9 +16,11 @@ allowed_vote_type = Annotated[str, StringConstraints(pattern=r'^(up|down)$')]
 
 
 @votes_router.get('/')
-def get_all_votes_for_reply_by_type(reply_id: int, topic_id: int, type: allowed_vote_type, current_user: UserAuthDep):
+def get_all_votes_for_reply_by_type(reply_id: int, topic_id: int, current_user: UserAuthDep,
+                                    type: allowed_vote_type | None = None):
     """
-    Returns all votes for a reply by type (up|down)
+    - Returns all votes for a reply by type (up|down)
+    - Without a type, returns the upvotes, downvotes and score of the reply
     """
 
     if not topic_exists(id=topic_id):
@@ -41,13 +44,16 @@ def get_all_votes_for_reply_by_type(reply_id: int, topic_id: int, type: allowed_
             detail=msg
         )
 
+    if type is None:
+        return votes_services.get_tally(reply_id=reply_id)
+
     result = votes_services.get_all(reply_id=reply_id, type=type)
     return {f'Total {type}votes': result}
 
 
 @votes_router.put('/', status_code=SC.Created)
 def add_or_switch(type: allowed_vote_type,
-                  reply_id: int, topic_id: int, current_user: UserAuthDep):
+                  reply_id: int, topic_id: int, current_user: UserAuthDep, response: Response = None):
     """
     1. Creates a vote of the specified type (up|down), if:
         - topic exists
@@ -55,6 +61,8 @@ def add_or_switch(type: allowed_vote_type,
         - user can modify content in this topic
     2. If the user has already up/down voted this reply, switches it, if different
     3. If the vote type given is the same as before, displays a message
+    4. If the vote was switched or removed by a concurrent request, displays a message
+    5. With the vote queue enabled, the vote is accepted (202) and written shortly after
     """
 
     if not topic_exists(id=topic_id):
@@ -78,6 +86,11 @@ def add_or_switch(type: allowed_vote_type,
             detail=msg
         )
 
+    if VOTE_QUEUE_ENABLED:
+        vote_queue.put(user_id=current_user.user_id, reply_id=reply_id, type=type)
+        response.status_code = SC.Accepted
+        return f'Your {type}vote for REPLY with ID: {reply_id} is accepted'
+
     vote = votes_services.get_vote_with_type(
         reply_id=reply_id, user_id=current_user.user_id)
 
@@ -87,21 +100,23 @@ def add_or_switch(type: allowed_vote_type,
         return f'You {type}voted REPLY with ID: {reply_id}'
 
     if vote != type:
-        votes_services.switch_vote(user_id=current_user.user_id,
-                                   reply_id=reply_id, type=vote)
-        return f'Vote switched to {type}vote'
+        if votes_services.switch_vote(user_id=current_user.user_id,
+                                      reply_id=reply_id, type=vote):
+            return f'Vote switched to {type}vote'
+        return f'Your vote for REPLY with ID: {reply_id} changed meanwhile, it was not switched'
 
     return f'Reply already {type}voted. Choose different type to switch it'
 
 
 @votes_router.delete('/', status_code=SC.NoContent)
-def remove_vote(topic_id: int, reply_id: int, current_user: UserAuthDep):
+def remove_vote(topic_id: int, reply_id: int, current_user: UserAuthDep, response: Response = None):
     """
     1. Removes user's vote, if:
         - topic exists
         - reply exists in this topic
         - user can modify content in this topic
     2. Does nothing, if no such vote
+    3. With the vote queue enabled, the removal is accepted (202) and written shortly after
     """
     if not topic_exists(id=topic_id):
         raise HTTPException(
@@ -124,4 +139,9 @@ def remove_vote(topic_id: int, reply_id: int, current_user: UserAuthDep):
             detail=msg
         )
 
+    if VOTE_QUEUE_ENABLED:
+        vote_queue.put(user_id=current_user.user_id, reply_id=reply_id, type=None)
+        response.status_code = SC.Accepted
+        return
+
     votes_services.delete_vote(reply_id=reply_id, user_id=current_user.user_id)
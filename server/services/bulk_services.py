@@ -0,0 +1,285 @@
+from __future__ import annotations
+import csv
+import io
+import json
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, TextIO
+from common.category_registry import category_registry
+from common.hashing import hashing_service, pass_context
+from common.response_cache import response_cache
+from data.database import stream_query, update_query, transaction
+from data.models.vote import VoteStatus
+from services import users_services
+from services.votes_services import reconcile_tallies
+from services.topic_ranking import topic_ranking
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+class BulkError(ValueError):
+    """
+    Raised for an unknown entity or format, or a row that cannot be imported
+    """
+
+
+@dataclass(frozen=True)
+class Entity:
+    table: str
+    keys: tuple[str, ...]
+    # (column, type), type is one of int, str, bool, vote, datetime, with a trailing ? when nullable
+    columns: tuple[tuple[str, str], ...]
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(name for name, _ in self.columns)
+
+
+# in import order, every entity comes after the ones it references
+# derived columns and tables (reply counts, last activity, vote tallies, topic_counts, topic scores,
+# conversations) are rebuilt after an import
+ENTITIES = {
+    'users': Entity('users', ('user_id',), (
+        ('user_id', 'int'), ('username', 'str'), ('password', 'str'), ('email', 'str'),
+        ('first_name', 'str?'), ('last_name', 'str?'), ('is_admin', 'bool'), ('is_deleted', 'bool'))),
+    'categories': Entity('categories', ('category_id',), (
+        ('category_id', 'int'), ('name', 'str'), ('is_locked', 'bool'), ('is_private', 'bool'))),
+    'permissions': Entity('users_categories_permissions', ('user_id', 'category_id'), (
+        ('user_id', 'int'), ('category_id', 'int'), ('write_access', 'bool'))),
+    'topics': Entity('topics', ('topic_id',), (
+        ('topic_id', 'int'), ('title', 'str'), ('user_id', 'int'), ('is_locked', 'bool'),
+        ('best_reply_id', 'int?'), ('category_id', 'int'), ('created_at', 'datetime'), ('updated_at', 'datetime?'))),
+    'replies': Entity('replies', ('reply_id',), (
+        ('reply_id', 'int'), ('text', 'str'), ('user_id', 'int'), ('topic_id', 'int'), ('edited', 'bool'),
+        ('created_at', 'datetime'), ('updated_at', 'datetime?'))),
+    'votes': Entity('votes', ('user_id', 'reply_id'), (
+        ('user_id', 'int'), ('reply_id', 'int'), ('type', 'vote'))),
+    'messages': Entity('messages', ('message_id',), (
+        ('message_id', 'int'), ('text', 'str'), ('sender_id', 'int'), ('receiver_id', 'int'),
+        ('created_at', 'datetime'), ('updated_at', 'datetime?'))),
+}
+
+
+def get_entity(name: str) -> Entity:
+    if name not in ENTITIES:
+        raise BulkError(f'Unknown entity {name}, expected one of {", ".join(ENTITIES)}')
+    return ENTITIES[name]
+
+
+def check_format(format: str) -> str:
+    if format not in FORMATS:
+        raise BulkError(f'Unknown format {format}, expected one of {", ".join(FORMATS)}')
+    return format
+
+
+def export_rows(name: str) -> Iterator[dict]:
+    """
+    Yields every row of the entity in key order, streamed from the server with constant memory
+    """
+    entity = get_entity(name)
+    sql = f'SELECT {", ".join(entity.names)} FROM {entity.table} ORDER BY {", ".join(entity.keys)}'
+    for row in stream_query(sql):
+        yield {name: _from_db(type, value) for (name, type), value in zip(entity.columns, row)}
+
+
+def export(name: str, format: str) -> Iterator[str]:
+    """
+    Yields the entity serialized as NDJSON or CSV, in chunks of one row
+    """
+    return write_rows(export_rows(name), check_format(format), get_entity(name).names)
+
+
+def write_rows(rows: Iterable[dict], format: str, names: tuple[str, ...]) -> Iterator[str]:
+    if format == 'ndjson':
+        for row in rows:
+            yield json.dumps(row, separators=(',', ':')) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def line(values) -> str:
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(names)
+    for row in rows:
+        yield line('' if row[name] is None else str(row[name]).lower() if isinstance(row[name], bool)
+                   else row[name] for name in names)
+
+
+def read_rows(stream: TextIO, format: str) -> Iterator[dict]:
+    if check_format(format) == 'csv':
+        yield from csv.DictReader(stream)
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise BulkError(f'line {line_number}: {error}')
+
+
+def import_rows(
+        name: str,
+        rows: Iterable[dict],
+        batch_size: int = 1000,
+        skip: int = 0,
+        on_batch: Callable[[int], None] | None = None
+) -> int:
+    """
+    Upserts the rows in multi-row INSERT statements of `batch_size` rows, one transaction per batch
+
+    - The first `skip` rows are read but not written, to resume an interrupted import
+    - on_batch(rows done) is called after every committed batch, e.g. to save a checkpoint
+    - Rows that exist already are updated, so importing a batch twice is harmless
+    - Plain-text passwords of users are hashed on all the hashing workers, bcrypt hashes are kept
+    - Returns the number of rows written
+    """
+    entity = get_entity(name)
+    imported, batch = 0, []
+
+    for line, row in enumerate(rows, start=1):
+        if line <= skip:
+            continue
+
+        batch.append(_parse_row(name, entity, row, line))
+        if len(batch) == batch_size:
+            _write_batch(name, entity, batch)
+            imported += len(batch)
+            batch = []
+            if on_batch:
+                on_batch(skip + imported)
+
+    if batch:
+        _write_batch(name, entity, batch)
+        imported += len(batch)
+        if on_batch:
+            on_batch(skip + imported)
+
+    return imported
+
+
+def refresh_derived(names: set[str]) -> None:
+    """
+    Rebuilds what the services normally keep in sync row by row, after the imported entities
+    """
+    if 'topics' in names:
+        with transaction(join=False):
+            update_query('DELETE FROM topic_counts')
+            update_query('''INSERT INTO topic_counts(category_id, is_locked, total)
+                            SELECT category_id, is_locked, COUNT(*) FROM topics GROUP BY category_id, is_locked''')
+
+    if names & {'topics', 'replies'}:
+        with transaction(join=False):
+            update_query('''UPDATE topics t
+                            LEFT JOIN (SELECT topic_id, COUNT(*) AS total, MAX(reply_id) AS last_reply_id
+                                       FROM replies GROUP BY topic_id) r
+                            ON r.topic_id = t.topic_id
+                            LEFT JOIN replies lr ON lr.reply_id = r.last_reply_id
+                            SET t.reply_count = COALESCE(r.total, 0),
+                                t.last_reply_id = r.last_reply_id,
+                                t.last_activity_at = COALESCE(lr.created_at, t.created_at)''')
+
+    if names & {'replies', 'votes'}:
+        reconcile_tallies()
+
+    if names & {'topics', 'replies', 'votes'}:
+        topic_ranking.rebuild()
+        topic_ranking.persist()
+
+    if 'messages' in names:
+        with transaction(join=False):
+            update_query('DELETE FROM conversations')
+            update_query('''INSERT INTO conversations(user_id, other_user_id, last_message_id, message_count)
+                            SELECT p.user_id, p.other_user_id, MAX(p.message_id), COUNT(*)
+                            FROM (SELECT sender_id AS user_id, receiver_id AS other_user_id, message_id
+                                  FROM messages
+                                  UNION ALL
+                                  SELECT receiver_id, sender_id, message_id
+                                  FROM messages WHERE receiver_id <> sender_id) p
+                            GROUP BY p.user_id, p.other_user_id''')
+
+    # reaches the other workers through the invalidation channel, when one is attached
+    if names & {'categories', 'permissions'}:
+        category_registry.reload()
+    if 'users' in names:
+        users_services.users_cache.invalidate_all()
+    response_cache.invalidate_all()
+
+
+def _write_batch(name: str, entity: Entity, batch: list[tuple]) -> None:
+    if name == 'users':
+        batch = _hash_passwords(entity, batch)
+
+    names = entity.names
+    updates = [f'{column} = VALUES({column})' for column in names if column not in entity.keys]
+    sql = (f'INSERT INTO {entity.table}({", ".join(names)}) '
+           f'VALUES {",".join(["(" + ",".join("?" * len(names)) + ")"] * len(batch))} '
+           f'ON DUPLICATE KEY UPDATE {", ".join(updates)}')
+
+    with transaction(join=False):
+        # rows may reference rows of a later batch or entity, e.g. topics their best reply
+        update_query('SET foreign_key_checks = 0')
+        try:
+            update_query(sql, tuple(value for row in batch for value in row))
+        finally:
+            update_query('SET foreign_key_checks = 1')
+
+
+def _hash_passwords(entity: Entity, batch: list[tuple]) -> list[tuple]:
+    index = entity.names.index('password')
+    plain = [i for i, row in enumerate(batch) if pass_context.identify(row[index], required=False) is None]
+    if not plain:
+        return batch
+
+    hashes = hashing_service.hash_many([batch[i][index] for i in plain])
+    batch = list(batch)
+    for i, hashed in zip(plain, hashes):
+        batch[i] = batch[i][:index] + (hashed,) + batch[i][index + 1:]
+    return batch
+
+
+def _parse_row(name: str, entity: Entity, row: dict, line: int) -> tuple:
+    try:
+        return tuple(_to_db(type, row.get(column)) for column, type in entity.columns)
+    except (KeyError, TypeError, ValueError, AttributeError) as error:
+        raise BulkError(f'{name} row {line}: {error!r}')
+
+
+def _from_db(type: str, value):
+    if value is None:
+        return None
+    if type == 'bool':
+        return bool(value)
+    if type == 'vote':
+        return VoteStatus.int_to_str[value]
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def _to_db(type: str, value):
+    nullable, type = type.endswith('?'), type.rstrip('?')
+    if value is None or (value == '' and type != 'str'):
+        if nullable:
+            return None
+        raise ValueError('missing value')
+
+    if type == 'int':
+        return int(value)
+    if type == 'bool':
+        if isinstance(value, str):
+            if value.lower() not in ('0', '1', 'true', 'false'):
+                raise ValueError(f'not a boolean: {value}')
+            return int(value.lower() in ('1', 'true'))
+        return int(bool(value))
+    if type == 'vote':
+        return VoteStatus.str_to_int[value]
+    if type == 'datetime':
+        return datetime.fromisoformat(value)
+    return str(value) if value != '' or not nullable else None
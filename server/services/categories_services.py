@@ -1,36 +1,44 @@
-from data.models.category import Category
-from data.database import read_query, update_query, insert_query
+from data.models.category import Category, CategoryRecord
+from data.database import read_query, update_query, insert_query, on_commit
 from mariadb import IntegrityError
 from data.models.topic import TopicResponse
+from common.category_registry import category_registry
+from common.response_cache import invalidate_responses
 
 
 def exists_by_name(name) -> bool:
-    return any(read_query(
-        '''SELECT 1 FROM categories WHERE name = ?''', (name,)))
+    return category_registry.category_id_by_name(name) is not None
 
 
 def get_all(search: str | None = None) -> list[Category]:
-    sql = '''SELECT category_id, name, is_locked, is_private
-        FROM categories'''
+    """
+    Served from the category registry, search matches a part of the name regardless of case
+    """
+    search = search.casefold() if search else None
+    categories = [Category.from_query(category_id, *entry)
+                  for category_id, entry in sorted(category_registry.all().items())
+                  if not search or search in entry[0].casefold()]
 
-    query_params = ()
+    return categories
 
-    if search:
-        sql += ' WHERE name LIKE ?'
-        query_params += (f'%{search}%',)
 
-    result = read_query(sql, query_params)
-    categories = [Category.from_query(*row) for row in result]
+def get_by_id(category_id) -> Category | None:
+    entry = category_registry.category(category_id)
+    if entry:
+        return Category.from_query(category_id, *entry)
 
-    return categories
 
+def get_record(category_id: int) -> CategoryRecord | None:
+    entry = category_registry.category(category_id)
+    if entry:
+        name, is_locked, is_private = entry
+        return CategoryRecord(category_id, name, bool(is_locked), bool(is_private))
 
-def get_by_id(category_id) -> Category | None:
-    data = read_query(
-        '''SELECT category_id, name, is_locked, is_private
-        FROM categories WHERE category_id = ?''', (category_id,))
-    if data:
-        return Category.from_query(*data[0])
+
+def get_by_name(name: str) -> Category | None:
+    category_id = category_registry.category_id_by_name(name)
+    if category_id is not None:
+        return get_by_id(category_id)
 
 
 def create(category: Category) -> Category | IntegrityError:
@@ -43,27 +51,30 @@ def create(category: Category) -> Category | IntegrityError:
             (category.name, category.is_locked, category.is_private)
         )
         category.category_id = generated_id
+        on_commit(lambda: category_registry.set_category(
+            generated_id, category.name, category.is_locked, category.is_private))
+        invalidate_responses('categories')
         return category
     except IntegrityError as e:
         return e
 
 
 def has_access_to_private_category(user_id: int, category_id: int) -> bool:
-    return any(read_query(
-        '''SELECT 1
-           FROM users_categories_permissions
-           WHERE user_id = ? AND category_id = ?''',
-        (user_id, category_id,)))
+    return category_registry.can_read(user_id, category_id)
 
 
 def update_privacy(privacy: bool, category_id: int) -> None:
     update_query('UPDATE categories SET is_private = ? WHERE category_id = ?',
                  (privacy, category_id,))
+    on_commit(lambda: category_registry.update_category(category_id, is_private=bool(privacy)))
+    invalidate_responses('categories', 'topics', f'category:{category_id}')
 
 
 def update_locking(locking: bool, category_id: int) -> None:
     update_query('UPDATE categories SET is_locked = ? WHERE category_id = ?',
                  (locking, category_id,))
+    on_commit(lambda: category_registry.update_category(category_id, is_locked=bool(locking)))
+    invalidate_responses('categories', 'topics', f'category:{category_id}')
 
 
 def get_user_access_level(user_id: int, category_id: int) -> bool | None:
@@ -80,6 +91,7 @@ def update_user_access_level(user_id: int, category_id: int, access: bool) -> No
         '''UPDATE users_categories_permissions SET write_access = ?
         WHERE user_id = ? AND category_id = ?''', (access, user_id, category_id)
     )
+    on_commit(lambda: category_registry.set_permission(user_id, category_id, bool(access)))
 
 
 def is_user_in(user_id: int, category_id: int) -> bool:
@@ -93,20 +105,17 @@ def is_user_in(user_id: int, category_id: int) -> bool:
 def add_user(user_id: int, category_id: int) -> None:
     insert_query('INSERT INTO users_categories_permissions(user_id,category_id) VALUES(?,?)',
                  (user_id, category_id,))
+    on_commit(lambda: category_registry.set_permission(user_id, category_id, False))
 
 
 def remove_user(user_id: int, category_id: int) -> None:
     update_query('DELETE FROM users_categories_permissions WHERE user_id = ? AND category_id = ?',
                  (user_id, category_id,))
+    on_commit(lambda: category_registry.remove_permission(user_id, category_id))
 
 
 def has_write_access(user_id: int, category_id: int) -> bool:
-    return any(read_query(
-        '''SELECT 1
-           FROM users_categories_permissions
-           WHERE user_id = ? AND category_id = ? AND write_access = ?''',
-        (user_id, category_id, 1))
-    )
+    return category_registry.can_write(user_id, category_id)
 
 
 def get_privileged_users(category_id) -> list:
@@ -138,7 +147,8 @@ def response_obj_privileged_users(category: Category, users: list[tuple]) -> dic
 
 def get_topics_by_cat_id(category_id: int) -> list[TopicResponse] | None:
     data = read_query(
-        '''SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name
+        '''SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name,
+                      t.reply_count, t.last_reply_id, t.last_activity_at, t.created_at, t.updated_at
                FROM topics t 
                JOIN users u ON t.user_id = u.user_id
                JOIN categories c ON t.category_id = c.category_id WHERE t.category_id = ?''', (category_id,))
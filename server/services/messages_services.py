@@ -1,6 +1,11 @@
-from data.models.message import Message
+from datetime import datetime
+from common.responses import HTTPBadRequest
+from common import utils
+from common.utils import encode_cursor
+from common.events import publish_event
+from data.models.message import Message, ConversationSummary
 from data.models.user import UserInfo
-from data.database import read_query, update_query, insert_query
+from data.database import read_query, update_query, insert_query, query_count, transaction
 
 
 def exists(message_id):
@@ -9,39 +14,162 @@ def exists(message_id):
 
 
 def create(message_text, sender_id, receiver_id):
-    return insert_query(
-        'INSERT INTO messages(text, sender_id, receiver_id) VALUES(?,?,?)',
-        (message_text, sender_id, receiver_id))
+    """
+    Stores the message and brings the conversation summaries of both users up to date
+    """
+    with transaction():
+        message_id = insert_query(
+            'INSERT INTO messages(text, sender_id, receiver_id) VALUES(?,?,?)',
+            (message_text, sender_id, receiver_id))
+
+        # (user_id, other_user_id, unread), in user_id order so that two users writing
+        # to each other at the same time lock the rows in the same order
+        rows = sorted({(sender_id, receiver_id, 0), (receiver_id, sender_id, 1)} if sender_id != receiver_id
+                      else {(sender_id, receiver_id, 0)})
+        update_query(
+            f'''INSERT INTO conversations(user_id, other_user_id, last_message_id, unread_count, message_count)
+                VALUES {','.join(['(?,?,?,?,1)'] * len(rows))}
+                ON DUPLICATE KEY UPDATE
+                  last_message_id = VALUES(last_message_id),
+                  last_activity = CURRENT_TIMESTAMP(6),
+                  unread_count = unread_count + VALUES(unread_count),
+                  message_count = message_count + 1''',
+            tuple(value for user_id, other_user_id, unread in rows
+                  for value in (user_id, other_user_id, message_id, unread)))
+
+    _publish_message('message_created', Message(
+        message_id=message_id, text=message_text, sender_id=sender_id, receiver_id=receiver_id))
+    return message_id
 
 
 def get_all_conversations(user_id: int):
     data = read_query('''SELECT u.username, u.email, u.first_name, u.last_name
-                        FROM users u
-                        JOIN messages m
-                        ON u.user_id = m.receiver_id
-                        WHERE m.sender_id = ?
-                        UNION
-                        SELECT u.username, u.email, u.first_name, u.last_name
-                        FROM users u
-                        JOIN messages m
-                        ON u.user_id = m.sender_id
-                        WHERE m.receiver_id = ?;''', (user_id, user_id))
+                        FROM conversations c
+                        JOIN users u ON u.user_id = c.other_user_id
+                        WHERE c.user_id = ?
+                        ORDER BY c.last_activity DESC, c.other_user_id DESC''', (user_id,))
 
     return [UserInfo.from_query(*row) for row in data]
 
 
-def get_conversation(sender_id: int, receiver_id: int):
-    data = read_query('''SELECT message_id, text, sender_id, receiver_id
-                      FROM messages
-                      WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)
-                      ORDER BY message_id ASC''',
-                      (sender_id, receiver_id, receiver_id, sender_id))
+def get_inbox(user_id: int, size: int, cursor: str = ''):
+    """
+    The conversations of the user, most recently active first
 
-    return [Message.from_query(*row) for row in data]
+    - Reads one range of the (user_id, last_activity, other_user_id) index, deep pages cost the same as the first one
+    - An empty cursor returns the first page
+    - Returns the conversations, their total count and the cursor of the next page (None on the last page)
+    """
+    total_count = query_count('SELECT COUNT(*) FROM conversations WHERE user_id = ?', (user_id,))
 
+    sql = '''SELECT c.other_user_id, u.username, c.last_activity, c.unread_count, c.message_count,
+                    m.message_id, m.text, m.sender_id, m.receiver_id, m.created_at, m.updated_at
+             FROM conversations c
+             JOIN users u ON u.user_id = c.other_user_id
+             JOIN messages m ON m.message_id = c.last_message_id
+             WHERE c.user_id = ?'''
+    params = (user_id,)
+    if cursor:
+        last_activity, other_user_id = decode_cursor(cursor, 'inbox')
+        sql += ' AND (c.last_activity < ? OR (c.last_activity = ? AND c.other_user_id < ?))'
+        params += (last_activity, last_activity, other_user_id)
 
-def update_text(message_id, message_text: str):
+    # one extra row tells whether there is a next page
+    data = read_query(sql + ' ORDER BY c.last_activity DESC, c.other_user_id DESC LIMIT ?', params + (size + 1,))
+    has_next, data = len(data) > size, data[:size]
+    conversations = [ConversationSummary.from_query(*row) for row in data]
+
+    next_cursor = None
+    if has_next:
+        last = conversations[-1]
+        next_cursor = encode_cursor('inbox', last.last_activity.isoformat(), last.user_id)
+
+    return conversations, total_count, next_cursor
+
+
+def get_conversation(user_id: int, other_user_id: int, size: int, cursor: str = ''):
+    """
+    The messages exchanged by the two users, newest first
+
+    - Seeks the (user_low_id, user_high_id, message_id) index past the last message of the previous page
+    - Returns the messages, their total count and the cursor of the next (older) page, None on the last page
+    """
+    summary = read_query('SELECT message_count FROM conversations WHERE user_id = ? AND other_user_id = ?',
+                         (user_id, other_user_id))
+    if not summary:
+        return [], 0, None
+
+    sql = '''SELECT message_id, text, sender_id, receiver_id, created_at, updated_at
+             FROM messages
+             WHERE user_low_id = ? AND user_high_id = ?'''
+    params = (min(user_id, other_user_id), max(user_id, other_user_id))
+    if cursor:
+        message_id, = decode_cursor(cursor, 'messages')
+        sql += ' AND message_id < ?'
+        params += (message_id,)
+
+    data = read_query(sql + ' ORDER BY message_id DESC LIMIT ?', params + (size + 1,))
+    has_next, data = len(data) > size, data[:size]
+    messages = [Message.from_query(*row) for row in data]
+
+    next_cursor = encode_cursor('messages', messages[-1].message_id) if has_next else None
+
+    return messages, summary[0][0], next_cursor
+
+
+def conversation_exists(user_id: int, other_user_id: int) -> bool:
+    return any(read_query('SELECT 1 FROM conversations WHERE user_id = ? AND other_user_id = ?',
+                          (user_id, other_user_id)))
+
+
+def mark_read(user_id: int, other_user_id: int):
+    """
+    Clears the unread count of user_id in the conversation with other_user_id
+    """
     update_query(
-        'UPDATE messages SET text = ? WHERE message_id = ?',
-        (message_text, message_id,)
-    )
+        'UPDATE conversations SET unread_count = 0 WHERE user_id = ? AND other_user_id = ? AND unread_count > 0',
+        (user_id, other_user_id))
+
+
+def update_text(message_id, message_text: str):
+    with transaction():
+        update_query(
+            'UPDATE messages SET text = ?, updated_at = CURRENT_TIMESTAMP WHERE message_id = ?',
+            (message_text, message_id,)
+        )
+        # an edit is activity in the conversation, for both users
+        update_query(
+            '''UPDATE conversations c
+               JOIN messages m
+               ON (c.user_id = m.sender_id AND c.other_user_id = m.receiver_id)
+               OR (c.user_id = m.receiver_id AND c.other_user_id = m.sender_id)
+               SET c.last_activity = CURRENT_TIMESTAMP(6)
+               WHERE m.message_id = ?''',
+            (message_id,)
+        )
+        data = read_query('''SELECT message_id, text, sender_id, receiver_id, created_at, updated_at
+                             FROM messages WHERE message_id = ?''', (message_id,))
+        if data:
+            _publish_message('message_updated', Message.from_query(*data[0]))
+
+
+def _publish_message(type: str, message: Message):
+    # both users see the message, in every window they have open
+    for user_id in {message.sender_id, message.receiver_id}:
+        publish_event(f'user:{user_id}', type, message.model_dump(mode='json'))
+
+
+def decode_cursor(cursor: str, kind: str) -> tuple:
+    """
+    Returns the typed values of an inbox or messages cursor
+    """
+    values = utils.decode_cursor(cursor, kind)
+    try:
+        if kind == 'inbox':
+            last_activity, other_user_id = values
+            return datetime.fromisoformat(last_activity), int(other_user_id)
+
+        message_id, = values
+        return int(message_id),
+    except (ValueError, TypeError):
+        raise HTTPBadRequest('Invalid cursor')
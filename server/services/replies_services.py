@@ -1,37 +1,89 @@
 from __future__ import annotations
 from typing import Union
-from data.models.category import Category
 from data.models.reply import ReplyCreateUpdate, ReplyResponse
 from data.models.topic import TopicResponse
-from data.database import read_query, update_query, insert_query
-from services.topics_services import get_by_id as get_topic_by_id
-from services.categories_services import get_by_id as get_cat_by_id, has_write_access
-from common.utils import get_pagination_info, create_links
+from data.database import read_query, update_query, insert_query, transaction
+from services.topics_services import get_record as get_topic_record
+from services.categories_services import get_record as get_cat_record, has_write_access
+from services.votes_services import get_user_votes
+from common.utils import get_pagination_info, create_links, encode_cursor, decode_cursor
+from common.responses import HTTPBadRequest
+from common.response_cache import invalidate_responses
+from common.events import publish_event
+from services.topic_ranking import topic_ranking
 from starlette.requests import Request
 
 
-def get_all(topic_id: int, request: Request, page: int, size: int) -> list[ReplyResponse]:
-    params = (topic_id,)
+def get_all(topic_id: int, request: Request, page: int, size: int,
+            cursor: str | None = None) -> list[ReplyResponse]:
+    """
+    A page of the topic's replies, oldest first
+
+    - The total comes from the topic's maintained reply_count, without counting the replies
+    - Passing a cursor (empty for the first page) seeks past the last reply_id of the previous page
+      instead of skipping rows with OFFSET, deep pages cost the same as the first one
+    """
+    total_count = get_reply_count(topic_id)
 
-    sql = '''SELECT r.reply_id, r.text, u.username, r.topic_id
+    sql = '''SELECT r.reply_id, r.text, u.username, r.topic_id, r.upvotes, r.downvotes, r.score,
+                   r.created_at, r.updated_at
             FROM replies r 
             JOIN users u ON r.user_id = u.user_id
-            WHERE topic_id = ?'''
+            WHERE r.topic_id = ?'''
+    params = (topic_id,)
 
-    pagination_sql = sql + ' LIMIT ? OFFSET ?'
-    params += (size, size * (page - 1))
+    if cursor is None:
+        data = read_query(sql + ' ORDER BY r.reply_id LIMIT ? OFFSET ?', params + (size, size * (page - 1)))
+        replies = [ReplyResponse.from_query(*row) for row in data]
+        pagination_info = get_pagination_info(total_count, page, size)
+    else:
+        if cursor:
+            try:
+                last_reply_id, = decode_cursor(cursor, 'replies')
+                last_reply_id = int(last_reply_id)
+            except (ValueError, TypeError):
+                raise HTTPBadRequest('Invalid cursor')
+            sql += ' AND r.reply_id > ?'
+            params += (last_reply_id,)
+
+        # one extra row tells whether there is a next page
+        data = read_query(sql + ' ORDER BY r.reply_id LIMIT ?', params + (size + 1,))
+        replies = [ReplyResponse.from_query(*row) for row in data[:size]]
+        next_cursor = encode_cursor('replies', replies[-1].reply_id) if len(data) > size else None
+        pagination_info = get_pagination_info(total_count, 1, size, cursor=cursor, next_cursor=next_cursor)
 
-    data = read_query(pagination_sql, params)
-    replies = [ReplyResponse.from_query(*row) for row in data]
-    pagination_info = get_pagination_info(len(replies), page, size)
     links = create_links(request, pagination_info)
     
     return replies, pagination_info, links
 
 
+def get_reply_count(topic_id: int) -> int:
+    data = read_query('SELECT reply_count FROM topics WHERE topic_id = ?', (topic_id,))
+    return data[0][0] if data else 0
+
+
+def expand(replies: list[ReplyResponse], topic: TopicResponse, user_id: int | None = None,
+           my_vote: bool = False) -> list[ReplyResponse]:
+    """
+    Completes a page of replies in place, with at most one query for the whole page
+    - Marks the topic's best reply
+    - With my_vote, sets the vote of the user on each reply
+    """
+    for reply in replies:
+        reply.is_best_reply = reply.reply_id == topic.best_reply_id
+
+    if my_vote and user_id is not None:
+        votes = get_user_votes(user_id, [reply.reply_id for reply in replies])
+        for reply in replies:
+            reply.my_vote = votes.get(reply.reply_id)
+
+    return replies
+
+
 def get_by_id(id: int) -> Union[ReplyResponse, None]:
     data = read_query(
-        '''SELECT r.reply_id, r.text, u.username, r.topic_id
+        '''SELECT r.reply_id, r.text, u.username, r.topic_id, r.upvotes, r.downvotes, r.score,
+                  r.created_at, r.updated_at
         FROM replies r 
         JOIN users u ON r.user_id = u.user_id
         WHERE reply_id = ?''', (id,)
@@ -41,29 +93,63 @@ def get_by_id(id: int) -> Union[ReplyResponse, None]:
 
 
 def create_reply(topic_id: int, reply: ReplyCreateUpdate, user_id: int) -> int:
-    return insert_query(
-        'INSERT INTO replies(text, user_id, topic_id) VALUES(?,?,?)',
-        (reply.text, user_id, topic_id,)
-    )
-
-
-def update_reply(id: int, text: str):
+    with transaction():
+        reply_id = insert_query(
+            'INSERT INTO replies(text, user_id, topic_id) VALUES(?,?,?)',
+            (reply.text, user_id, topic_id,)
+        )
+        _reply_added(topic_id, reply_id)
+    invalidate_responses('topics', f'topic:{topic_id}')
+    topic_ranking.touch(topic_id)
+    publish_event(f'topic:{topic_id}', 'reply_created',
+                  {'reply_id': reply_id, 'topic_id': topic_id, 'user_id': user_id, 'text': reply.text})
+    return reply_id
+
+
+def update_reply(id: int, text: str, topic_id: int):
     edited = 1  # True
     update_query(
-        '''UPDATE replies SET text = ?, edited = ? WHERE reply_id = ?''', (
+        '''UPDATE replies SET text = ?, edited = ?, updated_at = CURRENT_TIMESTAMP WHERE reply_id = ?''', (
             text, edited, id)
     )
+    invalidate_responses(f'reply:{id}')
+    publish_event(f'topic:{topic_id}', 'reply_updated', {'reply_id': id, 'topic_id': topic_id, 'text': text})
+
+
+def delete_reply(id: int, topic_id: int):
+    with transaction():
+        update_query(
+            '''DELETE from replies WHERE reply_id = ?''', (id,)
+        )
+        _reply_removed(topic_id)
+    invalidate_responses('topics', f'reply:{id}', f'topic:{topic_id}')
+    topic_ranking.touch(topic_id)
+    publish_event(f'topic:{topic_id}', 'reply_deleted', {'reply_id': id, 'topic_id': topic_id})
 
 
-def delete_reply(id: int):
+def _reply_added(topic_id: int, reply_id: int):
+    # the topic's activity columns are kept in step with its replies, sort_by=activity reads them from an index
     update_query(
-        '''DELETE from replies WHERE reply_id = ?''', (id,)
-    )
+        '''UPDATE topics
+           SET reply_count = reply_count + 1, last_reply_id = ?, last_activity_at = CURRENT_TIMESTAMP
+           WHERE topic_id = ?''', (reply_id, topic_id))
+
+
+def _reply_removed(topic_id: int):
+    # the last remaining reply, or the topic's creation when none is left, becomes the last activity
+    update_query(
+        '''UPDATE topics t
+           LEFT JOIN (SELECT reply_id, created_at FROM replies
+                      WHERE topic_id = ? ORDER BY reply_id DESC LIMIT 1) r ON 1 = 1
+           SET t.reply_count = t.reply_count - 1,
+               t.last_reply_id = r.reply_id,
+               t.last_activity_at = COALESCE(r.created_at, t.created_at)
+           WHERE t.topic_id = ?''', (topic_id, topic_id))
 
 
 def can_user_access_topic_content(topic_id: int, user_id: int) -> tuple[bool, str]:
-    topic: TopicResponse = get_topic_by_id(topic_id)
-    category: Category = get_cat_by_id(topic.category_id)
+    topic = get_topic_record(topic_id)
+    category = get_cat_record(topic.category_id)
 
     if category.is_private and not has_write_access(user_id, category.category_id):
         return False, 'You don\'t have permissions to post, modify replies or vote in this topic'
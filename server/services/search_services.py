@@ -0,0 +1,117 @@
+from __future__ import annotations
+import os
+import re
+from data.models.search import SearchKind, SearchResult
+from data.models.user import AuthUser, AnonymousUser
+from data.database import read_query, query_count
+from common.utils import get_pagination_info, create_links
+from starlette.requests import Request
+
+SNIPPET_LENGTH = 160
+# the server's innodb_ft_min_token_size, shorter words are not in the FULLTEXT indexes
+FULLTEXT_MIN_TOKEN = int(os.environ.get('FORUM_FULLTEXT_MIN_TOKEN', 3))
+
+_MATCH_TITLE = 'MATCH(t.title) AGAINST(? IN NATURAL LANGUAGE MODE)'
+_MATCH_TEXT = 'MATCH(r.text) AGAINST(? IN NATURAL LANGUAGE MODE)'
+
+
+def title_filter(search: str) -> tuple[str, tuple]:
+    """
+    Filter of the topic listings on `search`, through the FULLTEXT index on topics.title
+
+    Every word of the search must start a word of the title. A search with no word
+    of at least FULLTEXT_MIN_TOKEN chars cannot use the index and falls back to LIKE.
+    """
+    terms = [term for term in _terms(search) if len(term) >= FULLTEXT_MIN_TOKEN]
+    if not terms:
+        return 't.title LIKE ?', (f'%{search}%',)
+    return 'MATCH(t.title) AGAINST(? IN BOOLEAN MODE)', (' '.join(f'+{term}*' for term in terms),)
+
+
+def _access_filter(user: AuthUser | AnonymousUser) -> tuple[str, tuple]:
+    """
+    Private categories are searchable only by admins and by users with access to them
+    """
+    if isinstance(user, AnonymousUser):
+        return ' AND c.is_private = 0', ()
+    if user.is_admin:
+        return '', ()
+    return (
+        ' AND (c.is_private = 0 OR c.category_id IN '
+        '(SELECT category_id FROM users_categories_permissions WHERE user_id = ?))',
+        (user.user_id,)
+    )
+
+
+def _search_sql(query: str, user: AuthUser | AnonymousUser) -> tuple[str, tuple]:
+    access_sql, access_params = _access_filter(user)
+
+    sql = (
+        f"SELECT '{SearchKind.TOPIC}' AS kind, t.topic_id, NULL AS reply_id, t.title, t.title AS body, "
+        f"{_MATCH_TITLE} AS score "
+        'FROM topics t '
+        'JOIN categories c ON t.category_id = c.category_id '
+        f'WHERE {_MATCH_TITLE}{access_sql} '
+        'UNION ALL '
+        f"SELECT '{SearchKind.REPLY}' AS kind, t.topic_id, r.reply_id, t.title, r.text AS body, "
+        f"{_MATCH_TEXT} AS score "
+        'FROM replies r '
+        'JOIN topics t ON r.topic_id = t.topic_id '
+        'JOIN categories c ON t.category_id = c.category_id '
+        f'WHERE {_MATCH_TEXT}{access_sql}'
+    )
+    params = (query, query) + access_params + (query, query) + access_params
+
+    return sql, params
+
+
+def search(query: str, user: AuthUser | AnonymousUser, page: int, size: int) -> tuple[list[SearchResult], int]:
+    """
+    Full-text search over topic titles and reply texts, most relevant first
+
+    Backed by the FULLTEXT indexes on topics.title and replies.text,
+    which InnoDB updates together with every insert, update and delete of those rows.
+    """
+    sql, params = _search_sql(query, user)
+
+    total_count = query_count(f'SELECT COUNT(*) FROM ({sql}) AS results', params)
+
+    data = read_query(
+        f'{sql} ORDER BY score DESC, topic_id DESC, reply_id LIMIT ? OFFSET ?',
+        params + (size, size * (page - 1))
+    )
+    terms = _terms(query)
+    results = [
+        SearchResult.from_query(kind, topic_id, reply_id, title, make_snippet(body, terms), score)
+        for kind, topic_id, reply_id, title, body, score in data
+    ]
+
+    return results, total_count
+
+
+def _terms(query: str) -> list[str]:
+    return [term for term in re.findall(r'\w+', query.lower()) if term]
+
+
+def make_snippet(text: str, terms: list[str], length: int = SNIPPET_LENGTH) -> str:
+    """
+    Returns up to `length` chars of the text around the first matching term
+    """
+    if len(text) <= length:
+        return text
+
+    lowered = text.lower()
+    positions = [pos for pos in (lowered.find(term) for term in terms) if pos != -1]
+    first = min(positions) if positions else 0
+
+    start = max(0, min(first - length // 4, len(text) - length))
+    end = start + length
+
+    return f"{'...' if start > 0 else ''}{text[start:end].strip()}{'...' if end < len(text) else ''}"
+
+
+def search_paginate_links(request: Request, query: str, user: AuthUser | AnonymousUser, page: int, size: int):
+    results, total = search(query, user, page, size)
+    pagination_info = get_pagination_info(total, page, size)
+    links = create_links(request, pagination_info)
+    return results, pagination_info, links
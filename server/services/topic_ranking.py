@@ -0,0 +1,440 @@
+from __future__ import annotations
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from common.cache import InvalidationChannel
+from common.response_cache import invalidate_responses
+from data.database import read_query, update_query, on_commit, transaction
+
+# seconds between two passes of the ranker over the topics that changed
+RANKING_INTERVAL = float(os.environ.get('FORUM_RANKING_INTERVAL', 1))
+# seconds between two snapshots of the scores in topic_scores
+RANKING_PERSIST_INTERVAL = float(os.environ.get('FORUM_RANKING_PERSIST_INTERVAL', 60))
+# seconds between two full rescorings, catches changes made outside of the API
+RANKING_REBUILD_INTERVAL = float(os.environ.get('FORUM_RANKING_REBUILD_INTERVAL', 3600))
+# seconds of recency a topic needs to match ten times the points
+HOT_DECAY = float(os.environ.get('FORUM_HOT_DECAY', 45000))
+# points of a reply towards the hot score, a net vote is worth one
+HOT_REPLY_WEIGHT = float(os.environ.get('FORUM_HOT_REPLY_WEIGHT', 1))
+HOT_EPOCH = datetime(2024, 1, 1).timestamp()
+RANKING_BATCH_SIZE = 500
+
+KINDS = ('hot', 'top')
+
+logger = logging.getLogger(__name__)
+
+
+def hot_score(net_votes: int, reply_count: int, last_activity_at: datetime) -> float:
+    """
+    Log-scaled points plus the recency of the last activity
+
+    The decay is relative: a newer topic needs fewer points to rank as high, instead of older
+    topics losing points over time. Scores never change while nothing happens to the topic,
+    so only the topics that get votes or replies have to be scored again.
+    """
+    points = net_votes + HOT_REPLY_WEIGHT * reply_count
+    sign = (points > 0) - (points < 0)
+    order = math.log10(max(abs(points), 1))
+    return round(sign * order + (last_activity_at.timestamp() - HOT_EPOCH) / HOT_DECAY, 7)
+
+
+def top_score(net_votes: int) -> int:
+    return int(net_votes)
+
+
+class RankedSet:
+    """
+    Topic ids ordered by score, highest first, ties broken by the newest topic
+
+    The keys (-score, -topic_id) are kept in one sorted list: a page is a slice
+    and the position after a cursor a binary search, whatever the size of the set.
+    """
+
+    __slots__ = ('_keys', '_scores')
+
+    def __init__(self):
+        self._keys: list[tuple[float, int]] = []
+        self._scores: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def score(self, topic_id: int) -> float | None:
+        return self._scores.get(topic_id)
+
+    def set(self, topic_id: int, score: float) -> bool:
+        old = self._scores.get(topic_id)
+        if old == score:
+            return False
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, -topic_id))]
+        insort(self._keys, (-score, -topic_id))
+        self._scores[topic_id] = score
+        return True
+
+    def discard(self, topic_id: int) -> None:
+        old = self._scores.pop(topic_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, -topic_id))]
+
+    def page(self, offset: int, size: int, reverse: bool = False) -> list[tuple[int, float]]:
+        """
+        (topic_id, score) of the page, lowest first when reverse
+        """
+        if reverse:
+            end = max(len(self._keys) - offset, 0)
+            keys = self._keys[max(end - size, 0):end][::-1]
+        else:
+            keys = self._keys[offset:offset + size]
+        return [(-topic_id, -score) for score, topic_id in keys]
+
+    def after(self, score: float, topic_id: int, size: int, reverse: bool = False) -> list[tuple[int, float]]:
+        """
+        (topic_id, score) of the page that follows (score, topic_id) in the same order
+        """
+        key = (-score, -topic_id)
+        if reverse:
+            end = bisect_left(self._keys, key)
+            keys = self._keys[max(end - size, 0):end][::-1]
+        else:
+            start = bisect_right(self._keys, key)
+            keys = self._keys[start:start + size]
+        return [(-topic_id, -score) for score, topic_id in keys]
+
+
+class TopicRanking:
+    """
+    Hot and top scores of the topics, kept in memory in one RankedSet per kind and filter
+
+    - top: net votes on the replies of the topic
+    - hot: see hot_score, net votes and replies weighted by the time of the last activity
+    - The services mark the topics whose votes or replies changed, once their unit of work commits,
+      a background thread scores them again every `interval` seconds with one query per batch
+    - Each topic is in the sets of its category and status, so `GET /topics/?sort_by=hot`
+      filtered by category or status reads one set, in O(page size)
+    - The scores are written to topic_scores every `persist_interval` seconds and loaded from it
+      by the background thread once it starts, topics missing from it are scored then,
+      until the load completes pages are computed by an SQL query
+    - With an InvalidationChannel, marked topics are scored again in every worker process
+    """
+
+    NAME = 'topic_ranking'
+
+    def __init__(self, interval: float = RANKING_INTERVAL, persist_interval: float = RANKING_PERSIST_INTERVAL,
+                 rebuild_interval: float = RANKING_REBUILD_INTERVAL):
+        self.interval = interval
+        self.persist_interval = persist_interval
+        self.rebuild_interval = rebuild_interval
+
+        # (kind, category_id, is_locked) -> set, None matches any category or status
+        self._sets: dict[tuple[str, int | None, int | None], RankedSet] = {}
+        # topic_id -> (category_id, is_locked)
+        self._topics: dict[int, tuple[int, int]] = {}
+        self._dirty: set[int] = set()
+        self._unsaved: set[int] = set()
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._channel: InvalidationChannel | None = None
+        self.loaded_at: float | None = None
+
+        self.scored = 0
+        self.persisted = 0
+        self.rebuilds = 0
+        self.failures = 0
+
+    def touch(self, *topic_ids: int) -> None:
+        """
+        Scores the topics again, once the current unit of work commits
+        """
+        def mark():
+            self._mark(topic_ids)
+            if self._channel:
+                self._channel.publish(self.NAME, list(topic_ids))
+
+        on_commit(mark)
+
+    def page(self, kind: str, offset: int, size: int, category_id: int | None = None,
+             is_locked: int | None = None, reverse: bool = False) -> tuple[list[tuple[int, float]], int]:
+        """
+        (topic_id, score) of the page, highest first unless reverse, and the number of ranked topics
+        """
+        if self.loaded_at is None:
+            return self._query_page(kind, size, category_id, is_locked, reverse, offset=offset)
+        with self._lock:
+            ranked = self._sets.get((kind, category_id, is_locked)) or RankedSet()
+            return ranked.page(offset, size, reverse), len(ranked)
+
+    def after(self, kind: str, score: float, topic_id: int, size: int, category_id: int | None = None,
+              is_locked: int | None = None, reverse: bool = False) -> tuple[list[tuple[int, float]], int]:
+        """
+        Same as page, for the page that follows the cursor (score, topic_id)
+        """
+        if self.loaded_at is None:
+            return self._query_page(kind, size, category_id, is_locked, reverse, after=(score, topic_id))
+        with self._lock:
+            ranked = self._sets.get((kind, category_id, is_locked)) or RankedSet()
+            return ranked.after(score, topic_id, size, reverse), len(ranked)
+
+    def load(self) -> int:
+        """
+        Reads the saved scores of all topics, returns how many were missing and are scored now
+        """
+        data = read_query('''SELECT t.topic_id, t.category_id, t.is_locked, s.hot, s.top
+                             FROM topics t
+                             LEFT JOIN topic_scores s ON s.topic_id = t.topic_id''')
+        missing = []
+        with self._lock:
+            self._sets.clear()
+            self._topics.clear()
+            for topic_id, category_id, is_locked, hot, top in data:
+                if hot is None:
+                    missing.append(topic_id)
+                else:
+                    self._set(topic_id, category_id, is_locked, {'hot': hot, 'top': top})
+
+        self.refresh(missing)
+        self.loaded_at = time.monotonic()
+        return len(missing)
+
+    def refresh(self, topic_ids) -> int:
+        """
+        Scores the topics again from their replies, returns how many changed
+        """
+        topic_ids = list(topic_ids)
+        changed = 0
+        for i in range(0, len(topic_ids), RANKING_BATCH_SIZE):
+            batch = topic_ids[i:i + RANKING_BATCH_SIZE]
+            data = read_query(
+                f'''SELECT t.topic_id, t.category_id, t.is_locked, t.reply_count, t.last_activity_at,
+                           COALESCE(SUM(r.score), 0)
+                    FROM topics t
+                    LEFT JOIN replies r ON r.topic_id = t.topic_id
+                    WHERE t.topic_id IN ({','.join('?' * len(batch))})
+                    GROUP BY t.topic_id''', tuple(batch))
+            changed += self._apply(batch, data)
+        return changed
+
+    def rebuild(self) -> int:
+        """
+        Scores every topic again, in batches of topic ids
+        """
+        max_id = read_query('SELECT COALESCE(MAX(topic_id), 0) FROM topics')[0][0]
+        with self._lock:
+            known = set(self._topics)
+
+        changed = 0
+        for first_id in range(1, max_id + 1, RANKING_BATCH_SIZE):
+            last_id = first_id + RANKING_BATCH_SIZE - 1
+            data = read_query(
+                '''SELECT t.topic_id, t.category_id, t.is_locked, t.reply_count, t.last_activity_at,
+                          COALESCE(SUM(r.score), 0)
+                   FROM topics t
+                   LEFT JOIN replies r ON r.topic_id = t.topic_id
+                   WHERE t.topic_id BETWEEN ? AND ?
+                   GROUP BY t.topic_id''', (first_id, last_id))
+            changed += self._apply([topic_id for topic_id in known if first_id <= topic_id <= last_id], data)
+
+        # topics above the last id that are still known were deleted
+        self._apply([topic_id for topic_id in known if topic_id > max_id], [])
+        self.rebuilds += 1
+        return changed
+
+    def persist(self) -> int:
+        """
+        Writes the scores that changed since the last call to topic_scores, returns how many were written
+        """
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, set()
+            rows = [(topic_id, self._sets[('hot', None, None)].score(topic_id),
+                     self._sets[('top', None, None)].score(topic_id))
+                    for topic_id in unsaved if topic_id in self._topics]
+
+        try:
+            for i in range(0, len(rows), RANKING_BATCH_SIZE):
+                batch = rows[i:i + RANKING_BATCH_SIZE]
+                with transaction(join=False):
+                    update_query(
+                        f'''INSERT INTO topic_scores(topic_id, hot, top) VALUES {','.join(['(?,?,?)'] * len(batch))}
+                            ON DUPLICATE KEY UPDATE hot = VALUES(hot), top = VALUES(top)''',
+                        tuple(value for row in batch for value in row))
+        except Exception:
+            with self._lock:
+                self._unsaved |= unsaved
+            raise
+
+        self.persisted += len(rows)
+        return len(rows)
+
+    def start(self) -> None:
+        """
+        Starts the background thread, it loads the scores first, the caller does not wait for the load
+        """
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='topic-ranker', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the ranker and saves the scores that changed
+        """
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+
+        if thread is not None:
+            thread.join()
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            self.refresh(dirty)
+            self.persist()
+
+    def attach(self, channel: InvalidationChannel) -> None:
+        self._channel = channel
+        channel.subscribe(self.NAME, self._mark)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'topics': len(self._topics),
+                'pending': len(self._dirty),
+                'unsaved': len(self._unsaved),
+                'scored': self.scored,
+                'persisted': self.persisted,
+                'rebuilds': self.rebuilds,
+                'failures': self.failures,
+            }
+
+    def _mark(self, topic_ids) -> None:
+        with self._lock:
+            self._dirty.update(topic_ids)
+
+    def _query_page(self, kind: str, size: int, category_id: int | None, is_locked: int | None, reverse: bool,
+                    offset: int = 0, after: tuple[float, int] | None = None) -> tuple[list[tuple[int, float]], int]:
+        """
+        Same as page and after, scored by the database, until the scores are loaded
+        """
+        filters, filter_params = [], ()
+        if category_id is not None:
+            filters.append('t.category_id = ?')
+            filter_params += (category_id,)
+        if is_locked is not None:
+            filters.append('t.is_locked = ?')
+            filter_params += (is_locked,)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ''
+
+        if kind == 'hot':
+            # hot_score, in SQL
+            points = 'COALESCE(SUM(r.score), 0) + ? * t.reply_count'
+            score = (f'ROUND(SIGN({points}) * LOG10(GREATEST(ABS({points}), 1)) '
+                     f'+ (UNIX_TIMESTAMP(t.last_activity_at) - ?) / ?, 7)')
+            params = (HOT_REPLY_WEIGHT, HOT_REPLY_WEIGHT, HOT_EPOCH, HOT_DECAY)
+        else:
+            score, params = 'COALESCE(SUM(r.score), 0)', ()
+
+        sql = (f'SELECT topic_id, score FROM ('
+               f'SELECT t.topic_id, {score} AS score FROM topics t '
+               f'LEFT JOIN replies r ON r.topic_id = t.topic_id {where} '
+               f'GROUP BY t.topic_id) ranked')
+        params += filter_params
+        op, direction = ('>', 'ASC') if reverse else ('<', 'DESC')
+        if after is not None:
+            sql += f' WHERE score {op} ? OR (score = ? AND topic_id {op} ?)'
+            params += (after[0], after[0], after[1])
+        sql += f' ORDER BY score {direction}, topic_id {direction} LIMIT ? OFFSET ?'
+        params += (size, offset)
+
+        to_score = float if kind == 'hot' else top_score
+        ranked = [(topic_id, to_score(value)) for topic_id, value in read_query(sql, params)]
+        total = read_query(f'SELECT COUNT(*) FROM topics t {where}', filter_params)[0][0]
+        return ranked, total
+
+    def _run(self) -> None:
+        while self.loaded_at is None and not self._stopping:
+            try:
+                self.load()
+            except Exception:
+                self.failures += 1
+                logger.exception('Loading the topic scores failed, retrying')
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(self.interval)
+
+        persisted_at = rebuilt_at = time.monotonic()
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.interval)
+                if self._stopping:
+                    return
+                dirty, self._dirty = self._dirty, set()
+
+            try:
+                if dirty and self.refresh(dirty):
+                    invalidate_responses('ranking')
+
+                now = time.monotonic()
+                if now - rebuilt_at >= self.rebuild_interval:
+                    rebuilt_at = now
+                    if self.rebuild():
+                        invalidate_responses('ranking')
+                if now - persisted_at >= self.persist_interval:
+                    persisted_at = now
+                    self.persist()
+            except Exception:
+                self.failures += 1
+                self._mark(dirty)
+                logger.exception('Ranking topics failed, retrying')
+                time.sleep(self.interval)
+
+    def _apply(self, topic_ids: list[int], data: list[tuple]) -> int:
+        changed = 0
+        with self._lock:
+            for topic_id, category_id, is_locked, reply_count, last_activity_at, net_votes in data:
+                scores = {'hot': hot_score(net_votes, reply_count, last_activity_at), 'top': top_score(net_votes)}
+                changed += self._set(topic_id, category_id, is_locked, scores)
+                self._unsaved.add(topic_id)
+
+            found = {row[0] for row in data}
+            for topic_id in topic_ids:
+                if topic_id not in found and topic_id in self._topics:
+                    self._discard(topic_id)
+                    changed += 1
+
+            self.scored += len(data)
+        return changed
+
+    def _set(self, topic_id: int, category_id: int, is_locked: int, scores: dict[str, float]) -> bool:
+        if self._topics.get(topic_id, (category_id, is_locked)) != (category_id, is_locked):
+            # moved to another status or category
+            self._discard(topic_id)
+        self._topics[topic_id] = (category_id, is_locked)
+
+        changed = False
+        for kind, score in scores.items():
+            for key in self._keys(kind, category_id, is_locked):
+                changed |= self._sets.setdefault(key, RankedSet()).set(topic_id, score)
+        return changed
+
+    def _discard(self, topic_id: int) -> None:
+        category_id, is_locked = self._topics.pop(topic_id)
+        for kind in KINDS:
+            for key in self._keys(kind, category_id, is_locked):
+                self._sets[key].discard(topic_id)
+
+    @staticmethod
+    def _keys(kind: str, category_id: int, is_locked: int) -> tuple:
+        return ((kind, None, None), (kind, category_id, None), (kind, None, is_locked),
+                (kind, category_id, is_locked))
+
+
+topic_ranking = TopicRanking()
@@ -1,16 +1,21 @@
 from __future__ import annotations
-
-from common.utils import get_pagination_info, create_links
-from data.models.topic import Status, TopicResponse, TopicCreate
-from data.models.user import User
-from data.database import read_query, update_query, insert_query, query_count
+from datetime import datetime
+from common.utils import get_pagination_info, create_links, encode_cursor, decode_cursor
+from data.models.topic import Status, TopicResponse, TopicCreate, TopicRecord
+from data.models.user import AuthUser
+from data.database import read_query, update_query, insert_query, query_count, transaction
 from mariadb import IntegrityError
-from common.responses import HTTPNotFound, HTTPForbidden 
-from common.utils import get_pagination_info, create_links
+from common.responses import HTTPBadRequest
+from common.response_cache import invalidate_responses
+from common.category_registry import category_registry
+from services.topic_ranking import topic_ranking
+from services.search_services import title_filter
 from starlette.requests import Request
 
 
 _TOPIC_BEST_REPLY = None
+# sort_by values ranked by services.topic_ranking instead of a column of topics
+RANKED_SORTS = ('hot', 'top')
 
 
 def exists(id: int):
@@ -23,6 +28,57 @@ def get_total_count(sql=None, params=None):
     return query_count('SELECT COUNT(*) FROM topics')
 
 
+def count_topics(
+        search: str = None,
+        username: str = None,
+        category: str = None,
+        status: str = None,
+        estimate: bool = False
+) -> int:
+    """
+    Counts the topics matching the filters without scanning the topics
+
+    - category/status filters are answered from the topic_counts summary table
+    - search/username filters need the filtered join, unless an estimate is enough
+    """
+    if not search and not username:
+        return get_summary_count(category, status)
+
+    sql, params = _filtered_topics_sql(search, username, category, status)
+    if estimate:
+        return get_estimated_count(sql, params)
+    return get_total_count(sql, params)
+
+
+def get_summary_count(category: str = None, status: str = None) -> int:
+    sql, params, filters = 'SELECT COALESCE(SUM(tc.total), 0) FROM topic_counts tc ', (), []
+
+    if category:
+        sql += 'JOIN categories c ON tc.category_id = c.category_id '
+        filters.append('c.name = ?')
+        params += (category,)
+    if status:
+        filters.append('tc.is_locked = ?')
+        params += (Status.str_int[status],)
+
+    return query_count(sql + ("WHERE " + " AND ".join(filters) if filters else ""), params)
+
+
+def get_estimated_count(sql: str, params: tuple) -> int:
+    """
+    Estimates the row count of a query from the optimizer's plan,
+    multiplying rows * filtered% of every joined table
+    """
+    plan = read_query(f'EXPLAIN EXTENDED {sql}', params)
+
+    estimate = 1.0
+    for row in plan:
+        rows, filtered = row[8], row[9]
+        estimate *= (rows or 0) * (filtered if filtered is not None else 100) / 100
+
+    return round(estimate) if plan else 0
+
+
 def get_all(
         page: int,
         size: int,
@@ -31,19 +87,161 @@ def get_all(
         category: str = None,
         status: str = None,
         sort: str = None,
-        sort_by: str = None
+        sort_by: str = None,
+        estimate_total: bool = False
+):
+    sql, params = _filtered_topics_sql(search, username, category, status)
+
+    # get count of filtered topics for pagination info
+    total_count = count_topics(search, username, category, status, estimate=estimate_total)
+
+    column, _ = _SORT_COLUMNS[(sort_by or 'topic_id').lower()]
+    sql += _order_by(column, (sort or 'asc').lower())
+
+    pagination_sql = sql + ' LIMIT ? OFFSET ?'
+    params += (size, size * (page - 1))
+
+    data = read_query(pagination_sql, params)
+    topics = [TopicResponse.from_query(*row) for row in data]
+    
+    return topics, total_count
+
+
+def get_all_keyset(
+        size: int,
+        cursor: str = '',
+        search: str = None,
+        username: str = None,
+        category: str = None,
+        status: str = None,
+        sort: str = None,
+        sort_by: str = None,
+        estimate_total: bool = False
+):
+    """
+    Cursor based alternative to get_all
+
+    - Seeks past the last (sort key, topic_id) of the previous page instead of skipping rows with OFFSET
+    - An empty cursor returns the first page
+    - Returns the topics, the total count and the cursor of the next page (None on the last page)
+    """
+    sort_by = (sort_by or 'topic_id').lower()
+    sort = (sort or 'asc').lower()
+    column, row_index = _SORT_COLUMNS[sort_by]
+    total_count = count_topics(search, username, category, status, estimate=estimate_total)
+
+    seek = [_seek_filter(column, sort, decode_topics_cursor(cursor, sort_by, sort))] if cursor else []
+    sql, params = _filtered_topics_sql(search, username, category, status, extra_filters=seek)
+
+    sql += _order_by(column, sort)
+
+    # one extra row tells whether there is a next page
+    data = read_query(sql + ' LIMIT ?', params + (size + 1,))
+    has_next, data = len(data) > size, data[:size]
+    topics = [TopicResponse.from_query(*row) for row in data]
+
+    next_cursor = None
+    if has_next:
+        last = data[-1]
+        next_cursor = encode_topics_cursor(sort_by, sort, last[row_index], last[0])
+
+    return topics, total_count, next_cursor
+
+
+def get_ranked(
+        size: int,
+        page: int = 1,
+        cursor: str | None = None,
+        category: str = None,
+        status: str = None,
+        sort: str = None,
+        sort_by: str = 'hot'
+):
+    """
+    Topics in hot or top order, highest score first unless sort=asc
+
+    - The topic ranking keeps one ranked set per category and status, a page of topic ids is read
+      from it in O(page size) and the topics are then read by primary key
+    - Pages by page number, or by cursor when one is given (empty for the first page)
+    - Returns the topics, the number of ranked topics and the cursor of the next page
+      (None on the last page and without a cursor)
+    """
+    sort = (sort or 'desc').lower()
+    category_id, is_locked = None, Status.str_int[status] if status else None
+    if category:
+        category_id = category_registry.category_id_by_name(category)
+        if category_id is None:
+            return [], 0, None
+
+    if cursor:
+        score, topic_id = decode_topics_cursor(cursor, sort_by, sort)
+        ranked, total_count = topic_ranking.after(sort_by, score, topic_id, size + 1, category_id, is_locked,
+                                                  reverse=sort == 'asc')
+    else:
+        offset = size * (page - 1) if cursor is None else 0
+        ranked, total_count = topic_ranking.page(sort_by, offset, size + 1, category_id, is_locked,
+                                                 reverse=sort == 'asc')
+
+    # one extra topic tells whether there is a next page
+    has_next, ranked = len(ranked) > size, ranked[:size]
+    topics = get_by_ids([topic_id for topic_id, _ in ranked])
+
+    next_cursor = None
+    if has_next and cursor is not None:
+        last_id, last_score = ranked[-1]
+        next_cursor = encode_topics_cursor(sort_by, sort, last_score, last_id)
+
+    return topics, total_count, next_cursor
+
+
+# sort_by -> (column, index of the column in the topics rows)
+# every column has an index on (column, topic_id), so a sorted page reads the index in order
+_SORT_COLUMNS = {
+    'topic_id': ('t.topic_id', 0),
+    'title': ('t.title', 1),
+    'user_id': ('t.user_id', 2),
+    'status': ('t.is_locked', 4),
+    'best_reply_id': ('t.best_reply_id', 5),
+    'category_id': ('t.category_id', 6),
+    'activity': ('t.last_activity_at', 10),
+}
+# nullable column -> stored column that is 1 when it is NULL, sorting on it first keeps the NULLs last
+_NULLS_LAST = {'t.best_reply_id': 't.best_reply_missing'}
+
+
+def _order_by(column: str, sort: str) -> str:
+    """
+    ORDER BY matching the (column, topic_id) index, topic_id breaks the ties
+    """
+    direction = sort.upper()
+    if column == 't.topic_id':
+        return f' ORDER BY t.topic_id {direction}'
+
+    if column in _NULLS_LAST:
+        return f' ORDER BY {_NULLS_LAST[column]}, {column} {direction}, t.topic_id {direction}'
+    return f' ORDER BY {column} {direction}, t.topic_id {direction}'
+
+
+def _filtered_topics_sql(
+        search: str = None,
+        username: str = None,
+        category: str = None,
+        status: str = None,
+        extra_filters: list[tuple[str, tuple]] = ()
 ):
     params, filters = (), []
     sql = (
-        'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name '
+        'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name, '
+        't.reply_count, t.last_reply_id, t.last_activity_at, t.created_at, t.updated_at '
         'FROM topics t '
         'JOIN users u ON t.user_id = u.user_id '
         'JOIN categories c ON t.category_id = c.category_id '
     )
  
     if search:
-        filters.append('t.title LIKE ?')
-        params += (f'%{search}%',)
+        search_sql, search_params = title_filter(search)
+        filters.append(search_sql)
+        params += search_params
     if username:
         filters.append('u.username = ?')
         params += (username,)
@@ -53,35 +251,70 @@ def get_all(
     if status:
         filters.append('t.is_locked = ?')
         params += (Status.str_int[status],)
+    for extra_sql, extra_params in extra_filters:
+        filters.append(extra_sql)
+        params += extra_params
     sql = (sql + ("WHERE " + " AND ".join(filters) if filters else ""))
 
-    # get count of filtered topics for pagination info
-    total_count = get_total_count(sql, params)
-
-    if sort and sort != 'topic_id':
-        if sort_by == 'user_id':
-            sort_by ='t.user_id'
-            
-        if sort_by == 'category_id':
-            sort_by ='t.category_id'
-            
-        if sort_by == 'status':
-            sort_by = 't.is_locked'
-            
-        sql += f' ORDER BY {sort_by} IS NULL, {sort_by} {sort.upper()}'
+    return sql, params
 
-    pagination_sql = sql + ' LIMIT ? OFFSET ?'
-    params += (size, size * (page - 1))
 
-    data = read_query(pagination_sql, params)
-    topics = [TopicResponse.from_query(*row) for row in data]
-    
-    return topics, total_count
-      
+def _seek_filter(column: str, sort: str, last: tuple) -> tuple[str, tuple]:
+    """
+    Builds the predicate selecting the rows after `last` = (sort key, topic_id),
+    NULL sort keys come last in both directions, as in get_all
+    """
+    op = '>' if sort == 'asc' else '<'
+    value, topic_id = last
+
+    if column == 't.topic_id':
+        return f't.topic_id {op} ?', (topic_id,)
+
+    # expanded instead of a row comparison, which the range optimizer cannot use
+    after = f'({column} {op} ? OR ({column} = ? AND t.topic_id {op} ?))'
+    if column not in _NULLS_LAST:
+        return after, (value, value, topic_id)
+
+    missing = _NULLS_LAST[column]
+    if value is None:
+        return f'({missing} = 1 AND t.topic_id {op} ?)', (topic_id,)
+    return f'({missing} = 1 OR ({missing} = 0 AND {after}))', (value, value, topic_id)
+
+
+def encode_topics_cursor(sort_by: str, sort: str, value, topic_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return encode_cursor('topics', sort_by, sort, value, topic_id)
+
+
+def decode_topics_cursor(cursor: str, sort_by: str, sort: str) -> tuple:
+    """
+    Returns (sort key, topic_id) of the cursor
+    Raises 400 if the cursor is malformed or was issued for another sort order
+    """
+    try:
+        cursor_sort_by, cursor_sort, value, topic_id = decode_cursor(cursor, 'topics')
+    except ValueError:
+        raise HTTPBadRequest('Invalid cursor')
+
+    if (cursor_sort_by, cursor_sort) != (sort_by, sort) or not isinstance(topic_id, int):
+        raise HTTPBadRequest('Cursor does not match the requested sort')
+
+    if sort_by == 'activity':
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise HTTPBadRequest('Invalid cursor')
+    elif sort_by in RANKED_SORTS and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+        raise HTTPBadRequest('Invalid cursor')
+
+    return value, topic_id
+
 
 def get_by_id(topic_id: int) -> TopicResponse | None:
     data = read_query(
-        '''SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name
+        '''SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name,
+                      t.reply_count, t.last_reply_id, t.last_activity_at, t.created_at, t.updated_at
                FROM topics t 
                JOIN users u ON t.user_id = u.user_id
                JOIN categories c ON t.category_id = c.category_id WHERE t.topic_id = ?''', (topic_id,))
@@ -89,24 +322,58 @@ def get_by_id(topic_id: int) -> TopicResponse | None:
     return next((TopicResponse.from_query(*row) for row in data), None)
 
 
+def get_record(topic_id: int) -> TopicRecord | None:
+    data = read_query('SELECT topic_id, title, user_id, is_locked, category_id FROM topics WHERE topic_id = ?',
+                      (topic_id,))
+
+    return next((TopicRecord.from_query(*row) for row in data), None)
+
+
+def get_by_ids(topic_ids: list[int]) -> list[TopicResponse]:
+    """
+    The topics in the order of the ids, ids of topics that no longer exist are skipped
+    """
+    if not topic_ids:
+        return []
+
+    sql, params = _filtered_topics_sql(
+        extra_filters=[(f't.topic_id IN ({",".join("?" * len(topic_ids))})', tuple(topic_ids))])
+    rows = {row[0]: row for row in read_query(sql, params)}
+
+    return [TopicResponse.from_query(*rows[topic_id]) for topic_id in topic_ids if topic_id in rows]
+
+
 def create(topic: TopicCreate, user_id: int):
     try:
-        generated_id = insert_query(
-            'INSERT INTO topics(title, user_id, is_locked, best_reply_id, category_id) VALUES(?,?,?,?,?)',
-            (topic.title, user_id, Status.str_int["open"], _TOPIC_BEST_REPLY, topic.category_id))
+        with transaction():
+            generated_id = insert_query(
+                'INSERT INTO topics(title, user_id, is_locked, best_reply_id, category_id) VALUES(?,?,?,?,?)',
+                (topic.title, user_id, Status.str_int["open"], _TOPIC_BEST_REPLY, topic.category_id))
+            _change_summary_count(topic.category_id, Status.str_int["open"], 1)
+            invalidate_responses('topics')
+            topic_ranking.touch(generated_id)
 
         return generated_id  # return TopicResponse()
     except IntegrityError as e:
         return e
 
 
+def _change_summary_count(category_id: int, is_locked: int, delta: int):
+    insert_query(
+        '''INSERT INTO topic_counts(category_id, is_locked, total) VALUES(?,?,?)
+           ON DUPLICATE KEY UPDATE total = total + ?''',
+        (category_id, is_locked, max(delta, 0), delta))
+
+
 def update_title(topic_id, title):
     update_query(
         '''UPDATE topics SET
-           title = ?
+           title = ?,
+           updated_at = CURRENT_TIMESTAMP
            WHERE topic_id = ? 
         ''',
         (title, topic_id))
+    invalidate_responses('topics', f'topic:{topic_id}')
 
     return f"Project title updated to {title}"
 
@@ -114,10 +381,12 @@ def update_title(topic_id, title):
 def update_best_reply(topic_id, best_reply_id):
     update_query(
         '''UPDATE topics SET
-           best_reply_id = ?
+           best_reply_id = ?,
+           updated_at = CURRENT_TIMESTAMP
            WHERE topic_id = ? 
         ''',
         (best_reply_id, topic_id))
+    invalidate_responses('topics', f'topic:{topic_id}')
 
     return f"Best Reply Id updated to {best_reply_id}"
 
@@ -157,8 +426,8 @@ def get_usernames():
     return usernames
 
 
-def validate_topic_access(topic_id: int, user: User)-> tuple[bool, str]:
-    existing_topic = get_by_id(topic_id)
+def validate_topic_access(topic_id: int, user: AuthUser)-> tuple[bool, str]:
+    existing_topic = get_record(topic_id)
 
     if not existing_topic:
         return False, f"Topic #ID:{topic_id} does not exist"
@@ -173,8 +442,18 @@ def validate_topic_access(topic_id: int, user: User)-> tuple[bool, str]:
 
 
 def update_locking(locking: bool, topic_id: int):
-    update_query('UPDATE topics SET is_locked = ? WHERE topic_id = ?',
-                 (locking, topic_id))
+    with transaction():
+        data = read_query('SELECT category_id, is_locked FROM topics WHERE topic_id = ? FOR UPDATE',
+                          (topic_id,))
+        update_query('UPDATE topics SET is_locked = ?, updated_at = CURRENT_TIMESTAMP WHERE topic_id = ?',
+                     (locking, topic_id))
+        invalidate_responses('topics', f'topic:{topic_id}')
+
+        if data and data[0][1] != int(locking):
+            category_id, was_locked = data[0]
+            _change_summary_count(category_id, was_locked, -1)
+            _change_summary_count(category_id, int(locking), 1)
+            topic_ranking.touch(topic_id)
 
 
 def is_owner(topic_id: int, user_id: int) -> bool:
@@ -194,12 +473,40 @@ def get_topics_paginate_links(
         search: str = None,
         username: str = None,
         category: str = None,
-        status: str = None
+        status: str = None,
+        cursor: str = None,
+        estimate_total: bool = False
 ):
-    
+    """
+    Paginates with LIMIT/OFFSET, or with keyset pagination when a cursor is given
+    Topics sorted by hot or top are paged from the topic ranking
+    """
+    if sort_by and sort_by.lower() in RANKED_SORTS:
+        if search or username:
+            raise HTTPBadRequest('Topics sorted by hot or top cannot be filtered by search or username')
+
+        topics, total_topics, next_cursor = get_ranked(
+            size=size, page=page, cursor=cursor, category=category, status=status,
+            sort=sort, sort_by=sort_by.lower()
+        )
+        pagination_info = get_pagination_info(total_topics, page, size, cursor=cursor, next_cursor=next_cursor)
+        links = create_links(request, pagination_info)
+        return topics, pagination_info, links
+
+    if cursor is not None:
+        topics, total_topics, next_cursor = get_all_keyset(
+            size=size, cursor=cursor, sort=sort, sort_by=sort_by,
+            search=search, username=username, category=category, status=status,
+            estimate_total=estimate_total
+        )
+        pagination_info = get_pagination_info(total_topics, page, size, cursor=cursor, next_cursor=next_cursor)
+        links = create_links(request, pagination_info)
+        return topics, pagination_info, links
+
     topics, total_topics = get_all(
         page=page, size=size, sort=sort, sort_by=sort_by,
-        search=search, username=username, category=category, status=status
+        search=search, username=username, category=category, status=status,
+        estimate_total=estimate_total
     )
     pagination_info = get_pagination_info(total_topics, page, size)
     links = create_links(request, pagination_info)
@@ -1,7 +1,19 @@
-from data.models.user import User, UserRegister, UserUpdate, UserInfo
-from data.database import read_query, update_query, insert_query
+import os
+from data.models.user import User, AuthUser, UserRegister, UserUpdate, UserInfo
+from data.database import read_query, update_query, insert_query, on_commit, transaction, release_connection
 from mariadb import IntegrityError
-from common.utils import hash_pass, verify_password
+from starlette.concurrency import run_in_threadpool
+from common.utils import hash_pass, verify_password, verify_and_update_password
+from common.cache import TTLCache
+from common.token_cache import revoke_user_tokens
+
+# authenticated users by username and indexed by user_id, see find_by_username_cached
+users_cache = TTLCache(
+    'users',
+    maxsize=int(os.environ.get('FORUM_USERS_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('FORUM_USERS_CACHE_TTL', 300)),
+    index='user_id'
+)
 
 
 def get_all() -> list[UserInfo]:
@@ -29,14 +41,70 @@ def get_by_id(user_id) -> UserInfo:
 
 def find_by_username(username: str) -> User | None:
     data = read_query(
-        '''SELECT user_id, username, password, email, first_name, last_name, is_admin FROM users 
+        '''SELECT user_id, username, password, email, first_name, last_name, is_admin, token_version FROM users 
         WHERE username = ? AND NOT is_deleted = ?''',
         (username, 1))
 
     return next((User.from_query(*row) for row in data), None)
 
 
-def register(user: UserRegister) -> User | IntegrityError:
+def find_auth_user(username: str) -> AuthUser | None:
+    data = read_query(
+        '''SELECT user_id, username, email, first_name, last_name, is_admin, token_version FROM users 
+        WHERE username = ? AND NOT is_deleted = ?''',
+        (username, 1))
+
+    return next((AuthUser.from_query(*row) for row in data), None)
+
+
+def find_by_username_cached(username: str) -> AuthUser | None:
+    """
+    Same as find_auth_user, served from users_cache when possible
+    Cached users are invalidated by update, change_password and delete
+    """
+    user = users_cache.get(username)
+    if user is None:
+        user = find_auth_user(username)
+        if user:
+            users_cache.set(username, user)
+
+    return user
+
+
+def get_password_hash(user_id: int) -> str | None:
+    data = read_query('SELECT password FROM users WHERE user_id = ?', (user_id,))
+
+    return next((row[0] for row in data), None)
+
+
+async def verify_current_password(user_id: int, password: str) -> bool:
+    hashed_password = await _read_and_release(get_password_hash, user_id)
+
+    return bool(hashed_password) and await verify_password(password, hashed_password)
+
+
+async def _read_and_release(func, *args):
+    def read():
+        result = func(*args)
+        # the connection goes back to the pool while bcrypt runs, a later query checks out another one
+        release_connection()
+        return result
+
+    return await run_in_threadpool(read)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    on_commit(lambda: users_cache.invalidate_by('user_id', user_id))
+
+
+def revoke_tokens(user_id: int) -> None:
+    data = read_query('SELECT username FROM users WHERE user_id = ?', (user_id,))
+    if data:
+        username = data[0][0]
+        on_commit(lambda: revoke_user_tokens(username))
+
+
+async def register(user: UserRegister) -> User | IntegrityError:
     """
     Creates user without is_admin
     Handles columns violations with try/except
@@ -44,8 +112,12 @@ def register(user: UserRegister) -> User | IntegrityError:
     """
 
     # hashing the password and adding it to the db - line 52
-    hashed_password = hash_pass(user.password)
+    hashed_password = await hash_pass(user.password)
+
+    return await run_in_threadpool(_insert_user, user, hashed_password)
+
 
+def _insert_user(user: UserRegister, hashed_password: str) -> int | IntegrityError:
     try:
         generated_id = insert_query(
             'INSERT INTO users(username, password, email, first_name, last_name) VALUES(?,?,?,?,?)',
@@ -57,14 +129,26 @@ def register(user: UserRegister) -> User | IntegrityError:
         return e
 
 
-def try_login(username: str, password: str) -> User | None:
-    user = find_by_username(username)
+async def try_login(username: str, password: str) -> User | None:
+    """
+    Rehashes the password when its hash was made with outdated bcrypt settings
+    """
+    user = await _read_and_release(find_by_username, username)
+    if not user:
+        return None
+
+    verified, new_hashed_password = await verify_and_update_password(password, user.password)
+    if not verified:
+        return None
+
+    if new_hashed_password:
+        await run_in_threadpool(rehash_password, user.user_id, new_hashed_password)
+        user.password = new_hashed_password
 
-    if user and verify_password(password, user.password):
-        return user
+    return user
 
 
-def update(old: User, new: UserUpdate) -> UserUpdate:
+def update(old: AuthUser, new: UserUpdate) -> UserUpdate:
     """
     Merges new user with old
     Handles columns violations with try/except
@@ -79,16 +163,33 @@ def update(old: User, new: UserUpdate) -> UserUpdate:
         'UPDATE users SET first_name = ?, last_name = ? WHERE user_id = ?',
         (merged.first_name, merged.last_name, old.user_id)
     )
+    invalidate_cached_user(old.user_id)
 
     return merged
 
 
 def change_password(user_id: int, new_hashed_password: str) -> None:
+    update_query('UPDATE users SET password = ?, token_version = token_version + 1 WHERE user_id = ?',
+                 (new_hashed_password, user_id))
+    invalidate_cached_user(user_id)
+    revoke_tokens(user_id)
+
+
+def rehash_password(user_id: int, new_hashed_password: str) -> None:
+    """
+    Stores a new hash of the same password, the user's tokens stay valid
+    """
     update_query('UPDATE users SET password = ? WHERE user_id = ?',
                  (new_hashed_password, user_id))
 
 
 def delete(user_id: int) -> None:
-    update_query(
-        'UPDATE users SET is_deleted = ? WHERE user_id = ?;', (True, user_id)
-    )
+    with transaction():
+        # the users' trigger deletes the messages, the conversation summaries go with them
+        update_query(
+            'UPDATE users SET is_deleted = ?, token_version = token_version + 1 WHERE user_id = ?;',
+            (True, user_id)
+        )
+        update_query('DELETE FROM conversations WHERE user_id = ? OR other_user_id = ?', (user_id, user_id))
+    invalidate_cached_user(user_id)
+    revoke_tokens(user_id)
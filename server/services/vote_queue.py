@@ -0,0 +1,230 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from mariadb import IntegrityError
+from common.responses import HTTPTooManyRequests
+from data.database import insert_query, read_query, update_query, transaction
+from data.models.vote import VoteStatus
+from common.response_cache import invalidate_responses
+from services.votes_services import publish_tallies
+
+# off by default, votes are then written by the request that casts them
+VOTE_QUEUE_ENABLED = os.environ.get('FORUM_VOTE_QUEUE', '0') == '1'
+VOTE_QUEUE_INTERVAL = float(os.environ.get('FORUM_VOTE_QUEUE_INTERVAL', 0.5))
+VOTE_QUEUE_BATCH_SIZE = int(os.environ.get('FORUM_VOTE_QUEUE_BATCH_SIZE', 500))
+VOTE_QUEUE_MAX_PENDING = int(os.environ.get('FORUM_VOTE_QUEUE_MAX_PENDING', 50000))
+
+logger = logging.getLogger(__name__)
+
+
+class VoteQueue:
+    """
+    Write-behind queue for votes, applied by a background thread in batches
+
+    - Pending votes are kept by (user_id, reply_id), a newer vote replaces the pending one,
+      so repeated toggles by the same user cost a single write
+    - A vote type of None removes the vote
+    - Every `interval` seconds, or sooner when `batch_size` votes are pending,
+      the writer applies them in one transaction, together with the reply tallies
+    - A vote that can never be written, e.g. on a reply deleted while the vote was queued,
+      fails the batch with an IntegrityError, its votes are then written one at a time
+      and the failing ones are dropped
+    - Beyond `max_pending` votes, callers get 429 Too Many Requests
+    """
+
+    def __init__(self, interval: float = VOTE_QUEUE_INTERVAL, batch_size: int = VOTE_QUEUE_BATCH_SIZE,
+                 max_pending: int = VOTE_QUEUE_MAX_PENDING):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+
+        self._pending: dict[tuple[int, int], str | None] = {}
+        self._oldest_at: float | None = None
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+
+    def put(self, user_id: int, reply_id: int, type: str | None) -> None:
+        key = (user_id, reply_id)
+        with self._cond:
+            if key in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                raise HTTPTooManyRequests('Too many votes in progress, try again later')
+
+            self._pending[key] = type
+            self.enqueued += 1
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='vote-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the writer after it has applied every pending vote
+        """
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def flush(self) -> int:
+        """
+        Applies the pending votes now, returns how many were written
+        """
+        with self._cond:
+            batch, self._pending = self._pending, {}
+            oldest_at, self._oldest_at = self._oldest_at, None
+
+        if not batch:
+            return 0
+
+        try:
+            apply_votes(batch)
+            written = len(batch)
+        except IntegrityError:
+            written = self._apply_each(batch, oldest_at)
+        except Exception:
+            self.failures += 1
+            self._requeue(batch, oldest_at)
+            raise
+
+        self.written += written
+        self.batches += 1
+        self.last_lag = time.monotonic() - oldest_at
+        return written
+
+    def stats(self) -> dict:
+        with self._cond:
+            oldest_at = self._oldest_at
+            return {
+                'enabled': self._thread is not None,
+                'depth': len(self._pending),
+                'lag': time.monotonic() - oldest_at if oldest_at is not None else 0.0,
+                'last_batch_lag': self.last_lag,
+                'enqueued': self.enqueued,
+                'coalesced': self.coalesced,
+                'written': self.written,
+                'batches': self.batches,
+                'failures': self.failures,
+                'dropped': self.dropped,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.interval)
+                if self._stopping:
+                    return
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing queued votes failed, retrying')
+                time.sleep(self.interval)
+
+    def _apply_each(self, batch: dict, oldest_at: float) -> int:
+        """
+        Writes the votes of a failed batch one at a time, drops those that still violate a constraint
+        """
+        written = 0
+        items = list(batch.items())
+        for index, ((user_id, reply_id), type) in enumerate(items):
+            try:
+                apply_votes({(user_id, reply_id): type})
+                written += 1
+            except IntegrityError:
+                self.dropped += 1
+                logger.warning('Dropped queued vote of user %s on reply %s', user_id, reply_id)
+            except Exception:
+                self.failures += 1
+                self._requeue(dict(items[index:]), oldest_at)
+                raise
+
+        return written
+
+    def _requeue(self, batch: dict, oldest_at: float) -> None:
+        # votes cast while the batch was being written are newer and win
+        with self._cond:
+            self._pending = batch | self._pending
+            self._oldest_at = min(filter(None, (oldest_at, self._oldest_at)), default=oldest_at)
+
+
+def apply_votes(votes: dict[tuple[int, int], str | None]) -> None:
+    """
+    Writes the final vote of each (user_id, reply_id) and adjusts the reply tallies,
+    with a constant number of statements per batch plus one tally update per reply
+    """
+    keys = list(votes)
+    pairs = ','.join('(?,?)' for _ in keys)
+    params = tuple(value for key in keys for value in key)
+
+    with transaction():
+        current = {
+            (user_id, reply_id): VoteStatus.int_to_str[type]
+            for user_id, reply_id, type in read_query(
+                f'SELECT user_id, reply_id, type FROM votes WHERE (user_id, reply_id) IN ({pairs}) FOR UPDATE',
+                params)
+        }
+
+        deltas = defaultdict(lambda: {'up': 0, 'down': 0})
+        upserts, removals = [], []
+        for (user_id, reply_id), type in votes.items():
+            previous = current.get((user_id, reply_id))
+            if previous == type:
+                continue
+            if previous is not None:
+                deltas[reply_id][previous] -= 1
+            if type is None:
+                removals.append((user_id, reply_id))
+            else:
+                deltas[reply_id][type] += 1
+                upserts.append((user_id, reply_id, VoteStatus.str_to_int[type]))
+
+        if upserts:
+            insert_query(
+                f'''INSERT INTO votes(user_id, reply_id, type) VALUES {','.join('(?,?,?)' for _ in upserts)}
+                    ON DUPLICATE KEY UPDATE type = VALUES(type)''',
+                tuple(value for row in upserts for value in row))
+
+        if removals:
+            update_query(
+                f'DELETE FROM votes WHERE (user_id, reply_id) IN ({','.join('(?,?)' for _ in removals)})',
+                tuple(value for row in removals for value in row))
+
+        changed = [reply_id for reply_id, delta in deltas.items() if delta['up'] or delta['down']]
+        for reply_id in changed:
+            delta = deltas[reply_id]
+            update_query(
+                'UPDATE replies SET upvotes = upvotes + ?, downvotes = downvotes + ? WHERE reply_id = ?',
+                (delta['up'], delta['down'], reply_id))
+            invalidate_responses(f'reply:{reply_id}')
+
+        if changed:
+            publish_tallies(changed)
+
+
+vote_queue = VoteQueue()
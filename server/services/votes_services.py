@@ -1,16 +1,27 @@
-from data.models.vote import VoteStatus
-from data.database import insert_query, read_query, update_query
+from data.models.vote import VoteStatus, VoteTally
+from data.database import insert_query, read_query, update_query, transaction
+from common.response_cache import invalidate_responses
+from common.events import publish_event
+from services.topic_ranking import topic_ranking
+
+# counter columns of replies, kept in step with the votes table
+TALLY_COLUMNS = {'up': 'upvotes', 'down': 'downvotes'}
 
 
 def get_all(reply_id: int, type: str):
-    data = read_query('''SELECT count(type) FROM votes
-                      WHERE reply_id=?
-                      AND type=?''',
-                      (reply_id, VoteStatus.str_to_int[type]))
+    data = read_query(f'SELECT {TALLY_COLUMNS[type]} FROM replies WHERE reply_id=?',
+                      (reply_id,))
     if data:
         return data[0][0]
 
 
+def get_tally(reply_id: int) -> VoteTally | None:
+    data = read_query('SELECT upvotes, downvotes, score FROM replies WHERE reply_id=?',
+                      (reply_id,))
+    if data:
+        return VoteTally.from_query(*data[0])
+
+
 def get_vote_with_type(reply_id: int, user_id: int):
     vote_type = read_query('SELECT type FROM votes WHERE reply_id=? AND user_id=?',
                            (reply_id, user_id))
@@ -19,17 +30,124 @@ def get_vote_with_type(reply_id: int, user_id: int):
         return VoteStatus.int_to_str[vote_type[0][0]]
 
 
+def get_user_votes(user_id: int, reply_ids: list[int]) -> dict[int, str]:
+    """
+    The user's vote type for each of the replies they voted for, in a single query
+    """
+    if not reply_ids:
+        return {}
+
+    placeholders = ','.join('?' * len(reply_ids))
+    data = read_query(
+        f'SELECT reply_id, type FROM votes WHERE user_id = ? AND reply_id IN ({placeholders})',
+        (user_id, *reply_ids))
+
+    return {reply_id: VoteStatus.int_to_str[type] for reply_id, type in data}
+
+
 def add_vote(user_id, reply_id: int, type: str):
-    insert_query('INSERT INTO votes(user_id, reply_id, type) VALUES(?,?,?)',
-                 (user_id, reply_id, VoteStatus.str_to_int[type]))
+    with transaction():
+        insert_query('INSERT INTO votes(user_id, reply_id, type) VALUES(?,?,?)',
+                     (user_id, reply_id, VoteStatus.str_to_int[type]))
+        _change_tally(reply_id, type, 1)
+        publish_tallies([reply_id])
 
 
-def switch_vote(user_id, reply_id: int, type: str):
+def switch_vote(user_id, reply_id: int, type: str) -> bool:
+    """
+    Switches the user's `type` vote to the other type, returns False if the vote was
+    already switched or deleted by a concurrent request
+    """
     new_type = 'up' if type == 'down' else 'down'
-    update_query('UPDATE votes SET type = ? WHERE user_id = ? AND reply_id = ?',
-                 (VoteStatus.str_to_int[new_type], user_id, reply_id))
+    with transaction():
+        # `type` was read without a lock, the tallies only move when the locked vote still needs switching
+        data = read_query('SELECT type FROM votes WHERE reply_id = ? AND user_id = ? FOR UPDATE',
+                          (reply_id, user_id))
+        if not data or VoteStatus.int_to_str[data[0][0]] == new_type:
+            return False
+
+        update_query('UPDATE votes SET type = ? WHERE user_id = ? AND reply_id = ?',
+                     (VoteStatus.str_to_int[new_type], user_id, reply_id))
+        _change_tally(reply_id, VoteStatus.int_to_str[data[0][0]], -1)
+        _change_tally(reply_id, new_type, 1)
+        publish_tallies([reply_id])
+        return True
 
 
 def delete_vote(reply_id: int, user_id: int):
-    update_query('''DELETE FROM votes
-                  WHERE reply_id = ? AND user_id = ?''', (reply_id, user_id))
+    with transaction():
+        # locks the vote, so a concurrent delete cannot decrement the tally twice
+        data = read_query('SELECT type FROM votes WHERE reply_id = ? AND user_id = ? FOR UPDATE',
+                          (reply_id, user_id))
+        if not data:
+            return
+
+        update_query('''DELETE FROM votes
+                      WHERE reply_id = ? AND user_id = ?''', (reply_id, user_id))
+        _change_tally(reply_id, VoteStatus.int_to_str[data[0][0]], -1)
+        publish_tallies([reply_id])
+
+
+def _change_tally(reply_id: int, type: str, delta: int):
+    column = TALLY_COLUMNS[type]
+    update_query(f'UPDATE replies SET {column} = {column} + ? WHERE reply_id = ?',
+                 (delta, reply_id))
+    invalidate_responses(f'reply:{reply_id}')
+
+
+def publish_tallies(reply_ids: list[int]) -> None:
+    """
+    Pushes the current tallies of the replies to the subscribers of their topics,
+    and has the topics ranked again
+    """
+    data = read_query(
+        f'''SELECT reply_id, topic_id, upvotes, downvotes, score FROM replies
+            WHERE reply_id IN ({','.join('?' * len(reply_ids))})''', tuple(reply_ids))
+
+    for reply_id, topic_id, upvotes, downvotes, score in data:
+        publish_event(f'topic:{topic_id}', 'votes_changed',
+                      {'reply_id': reply_id, **VoteTally.from_query(upvotes, downvotes, score).model_dump()})
+    topic_ranking.touch(*{row[1] for row in data})
+
+
+def reconcile_tallies(batch_size: int = 1000) -> int:
+    """
+    Rebuilds the tallies of all replies from the votes table, returns the number of replies scanned
+
+    Runs one short transaction per range of `batch_size` reply ids,
+    so the replies are never locked all at once. Only the replies whose tallies were off
+    are written, their cached responses dropped and their topics ranked again.
+    """
+    max_id = read_query('SELECT COALESCE(MAX(reply_id), 0) FROM replies')[0][0]
+
+    for first_id in range(1, max_id + 1, batch_size):
+        last_id = first_id + batch_size - 1
+        with transaction(join=False):
+            data = read_query(
+                '''SELECT r.reply_id, r.topic_id
+                   FROM replies r
+                   LEFT JOIN (SELECT reply_id, SUM(type = 1) AS upvotes, SUM(type = 0) AS downvotes
+                              FROM votes
+                              WHERE reply_id BETWEEN ? AND ?
+                              GROUP BY reply_id) v ON v.reply_id = r.reply_id
+                   WHERE r.reply_id BETWEEN ? AND ?
+                     AND (r.upvotes <> COALESCE(v.upvotes, 0) OR r.downvotes <> COALESCE(v.downvotes, 0))
+                   FOR UPDATE''',
+                (first_id, last_id, first_id, last_id))
+            if not data:
+                continue
+
+            reply_ids = [row[0] for row in data]
+            update_query(
+                f'''UPDATE replies r
+                    LEFT JOIN (SELECT reply_id, SUM(type = 1) AS upvotes, SUM(type = 0) AS downvotes
+                               FROM votes
+                               WHERE reply_id BETWEEN ? AND ?
+                               GROUP BY reply_id) v ON v.reply_id = r.reply_id
+                    SET r.upvotes = COALESCE(v.upvotes, 0), r.downvotes = COALESCE(v.downvotes, 0)
+                    WHERE r.reply_id IN ({','.join('?' * len(reply_ids))})''',
+                (first_id, last_id, *reply_ids))
+            invalidate_responses(*(f'reply:{reply_id}' for reply_id in reply_ids))
+            topic_ranking.touch(*{row[1] for row in data})
+
+    return max_id
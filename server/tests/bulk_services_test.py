@@ -0,0 +1,78 @@
+import io
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from services import bulk_services as bulk
+
+HASH = '$2b$12$snZATHX9lsgnazHFCtW1tuU9FYuGOnQlwKBeTFmIjx3Y.RZF0MNCS'
+
+
+def user_row(user_id, password=HASH):
+    return {'user_id': user_id, 'username': f'user{user_id}', 'password': password, 'email': f'u{user_id}@x.com',
+            'first_name': None, 'last_name': None, 'is_admin': False, 'is_deleted': False}
+
+
+class BulkServices_Should(unittest.TestCase):
+
+    def test_exportRows_convertsColumns(self):
+        with patch('services.bulk_services.stream_query', return_value=iter([(3, 8, 1)])) as mock_stream_query:
+
+            rows = list(bulk.export_rows('votes'))
+
+        self.assertEqual([{'user_id': 3, 'reply_id': 8, 'type': 'up'}], rows)
+        self.assertIn('ORDER BY user_id, reply_id', mock_stream_query.call_args.args[0])
+
+    def test_exportRows_andParseRow_roundTripTimestamps(self):
+        created_at = datetime(2024, 5, 1, 12, 30, 15)
+        with patch('services.bulk_services.stream_query',
+                   return_value=iter([(4, 'hi', 1, 2, created_at, None)])):
+
+            row, = bulk.export_rows('messages')
+
+        self.assertEqual(('2024-05-01 12:30:15', None), (row['created_at'], row['updated_at']))
+        self.assertEqual((4, 'hi', 1, 2, created_at, None),
+                         bulk._parse_row('messages', bulk.ENTITIES['messages'], row, 1))
+
+    def test_writeRows_andReadRows_roundTripCsv(self):
+        names = bulk.ENTITIES['users'].names
+        text = ''.join(bulk.write_rows([user_row(1)], 'csv', names))
+
+        rows = list(bulk.read_rows(io.StringIO(text), 'csv'))
+
+        self.assertEqual(','.join(names), text.splitlines()[0])
+        self.assertEqual(('false', ''), (rows[0]['is_admin'], rows[0]['first_name']))
+        self.assertEqual(bulk._parse_row('users', bulk.ENTITIES['users'], user_row(1), 1),
+                         bulk._parse_row('users', bulk.ENTITIES['users'], rows[0], 1))
+
+    def test_importRows_writesBatchesAfterSkippedRows(self):
+        rows = [{'user_id': 1, 'reply_id': reply_id, 'type': 'down'} for reply_id in range(1, 6)]
+        checkpoints = []
+        with patch('services.bulk_services.update_query') as mock_update_query:
+
+            imported = bulk.import_rows('votes', rows, batch_size=2, skip=1, on_batch=checkpoints.append)
+
+        self.assertEqual(4, imported)
+        self.assertEqual([3, 5], checkpoints)
+        inserts = [c.args for c in mock_update_query.call_args_list if c.args[0].startswith('INSERT')]
+        self.assertEqual((1, 2, 0, 1, 3, 0), inserts[0][1])
+        self.assertIn('ON DUPLICATE KEY UPDATE type = VALUES(type)', inserts[0][0])
+
+    def test_importRows_hashesOnlyPlainPasswords(self):
+        with patch('services.bulk_services.update_query') as mock_update_query, \
+                patch('services.bulk_services.hashing_service.hash_many', return_value=['hashed']) as mock_hash_many:
+
+            bulk.import_rows('users', [user_row(1), user_row(2, password='secret')])
+
+        mock_hash_many.assert_called_once_with(['secret'])
+        params = mock_update_query.call_args_list[1].args[1]
+        self.assertEqual((HASH, 'hashed'), (params[2], params[10]))
+
+    def test_importRows_raisesBulkError_withRowNumber(self):
+        with patch('services.bulk_services.update_query'), \
+                self.assertRaisesRegex(bulk.BulkError, 'votes row 2'):
+            bulk.import_rows('votes', [{'user_id': 1, 'reply_id': 1, 'type': 'up'},
+                                       {'user_id': 1, 'reply_id': 2, 'type': 'sideways'}])
+
+    def test_getEntity_raisesBulkError_whenUnknown(self):
+        with self.assertRaises(bulk.BulkError):
+            bulk.get_entity('passwords')
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import Mock, patch
+from common.cache import TTLCache, InvalidationChannel
+from data.models.user import TokenData
+
+KEY, VALUE = 'key', 'value'
+
+
+class TTLCache_Should(unittest.TestCase):
+
+    def test_get_returnsValue_andCountsHit(self):
+        cache = TTLCache('test')
+        cache.set(KEY, VALUE)
+
+        self.assertEqual(VALUE, cache.get(KEY))
+        self.assertEqual(1, cache.hits)
+
+    def test_get_returnsDefault_andCountsMiss_whenExpired(self):
+        cache = TTLCache('test', ttl=10)
+        with patch('common.cache.time.monotonic', return_value=100):
+            cache.set(KEY, VALUE)
+        with patch('common.cache.time.monotonic', return_value=111):
+            result = cache.get(KEY)
+
+        self.assertIsNone(result)
+        self.assertEqual(1, cache.misses)
+
+    def test_set_evictsLeastRecentlyUsed_whenFull(self):
+        cache = TTLCache('test', maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(1, cache.evictions)
+
+    def test_invalidateWhere_removesMatchingEntries(self):
+        cache = TTLCache('test')
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        removed = cache.invalidate_where(lambda key, value: value == 2)
+
+        self.assertEqual(['b'], removed)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+
+    def test_invalidateBy_publishesFieldMatch_soWorkersWithoutTheEntryDropTheirs(self):
+        cache, other = TTLCache('test'), TTLCache('test')
+        channel, other_channel = Mock(spec=InvalidationChannel), Mock(spec=InvalidationChannel)
+        cache.attach(channel)
+        other.attach(other_channel)
+        other.set('user', TokenData(username='user', is_admin=False))
+
+        self.assertEqual([], cache.invalidate_by('username', 'user'))
+        channel.publish.assert_called_once_with('test', {'field': 'username', 'value': 'user'})
+
+        remote_handler = other_channel.subscribe.call_args.args[1]
+        remote_handler(*channel.publish.call_args.args[1:])
+        self.assertIsNone(other.get('user'))
+
+    def test_invalidateBy_usesIndex_withoutScanningTheCache(self):
+        cache = TTLCache('test', index='username')
+        cache.set('a', TokenData(username='user', is_admin=False))
+        cache.set('b', TokenData(username='user', is_admin=True))
+        cache.set('c', TokenData(username='other', is_admin=False))
+
+        with patch.object(cache, 'invalidate_where') as invalidate_where:
+            removed = cache.invalidate_by('username', 'user')
+
+        invalidate_where.assert_not_called()
+        self.assertEqual({'a', 'b'}, set(removed))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_index_followsReplacedAndEvictedEntries(self):
+        cache = TTLCache('test', maxsize=2, index='username')
+        cache.set('a', TokenData(username='user', is_admin=False))
+        cache.set('a', TokenData(username='other', is_admin=False))
+
+        self.assertEqual([], cache.invalidate_by('username', 'user'))
+
+        cache.set('b', TokenData(username='user', is_admin=False))
+        cache.set('c', TokenData(username='user', is_admin=False))
+
+        self.assertEqual({'user': {'b', 'c'}}, cache._keys_by)
+
+    def test_invalidateAll_clearsEveryWorker(self):
+        cache, other = TTLCache('test'), TTLCache('test')
+        channel, other_channel = Mock(spec=InvalidationChannel), Mock(spec=InvalidationChannel)
+        cache.attach(channel)
+        other.attach(other_channel)
+        cache.set(KEY, VALUE)
+        other.set('other', VALUE)
+
+        cache.invalidate_all()
+        other_channel.subscribe.call_args.args[1](*channel.publish.call_args.args[1:])
+
+        self.assertIsNone(cache.get(KEY))
+        self.assertIsNone(other.get('other'))
+
+    def test_invalidate_publishesToChannel_andRemoteMessagesDropEntries(self):
+        cache = TTLCache('test')
+        channel = Mock(spec=InvalidationChannel)
+        cache.attach(channel)
+        cache.set(KEY, VALUE)
+
+        cache.invalidate(KEY)
+        channel.publish.assert_called_once_with('test', KEY)
+
+        cache.set(KEY, VALUE)
+        remote_handler = channel.subscribe.call_args.args[1]
+        remote_handler(KEY)
+        self.assertIsNone(cache.get(KEY))
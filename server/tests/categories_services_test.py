@@ -1,8 +1,9 @@
 from unittest import TestCase
-from unittest.mock import patch, Mock
+from unittest.mock import patch
 from data.models.category import Category
 from services import categories_services as s
 from services.categories_services import IntegrityError
+from common.category_registry import CategoryRegistry
 
 CAT1_ID = 1
 CAT1_NAME = 'test'
@@ -21,53 +22,61 @@ COUNT_1, COUNT_0 = 1, 0
 read_query_path = 'services.categories_services.read_query'
 update_query_path = 'services.categories_services.update_query'
 insert_query_path = 'services.categories_services.insert_query'
+registry_path = 'services.categories_services.category_registry'
+
+
+def registry_with(*category_rows):
+    registry = CategoryRegistry()
+    with patch('common.category_registry.read_query', side_effect=[list(category_rows), []]):
+        registry.load()
+    return registry
 
 
 class CategoriesServices_Should(TestCase):
     # exists_by_name
-    @patch(read_query_path)
-    def test_exists_by_name_returns_True_when_exists(self, mock_read_query):
-        mock_read_query.return_value = [(1,)]
-        result = s.exists_by_name(CAT1_NAME)
+    def test_exists_by_name_returns_True_when_exists(self):
+        with patch(registry_path, registry_with(CAT1_VALUES_TUPLE)):
+            result = s.exists_by_name(CAT1_NAME.upper())
         self.assertTrue(result)
 
-    @patch(read_query_path)
-    def test_exists_by_name_returns_False_when_exists(self, mock_read_query):
-        mock_read_query.return_value = []
-        result = s.exists_by_name(CAT1_NAME)
+    def test_exists_by_name_returns_False_when_exists(self):
+        with patch(registry_path, registry_with()):
+            result = s.exists_by_name(CAT1_NAME)
         self.assertFalse(result)
 
     # get_all
-    @patch(read_query_path)
-    def test_get_all_returns_list_of_categories(self, mock_read_query):
-        mock_read_query.return_value = [CAT1_VALUES_TUPLE, CAT2_VALUES_TUPLE2]
-        expected = [Category.from_query(*row) for row in mock_read_query.return_value]
+    def test_get_all_returns_list_of_categories(self):
+        rows = [CAT1_VALUES_TUPLE, CAT2_VALUES_TUPLE2]
+        expected = [Category.from_query(*row) for row in rows]
 
-        result = s.get_all()
+        with patch(registry_path, registry_with(*reversed(rows))):
+            result = s.get_all()
         self.assertEqual(expected, result)
 
-    @patch(read_query_path)
-    def test_get_all_returns_empty_list_when_no_categories(self, mock_read_query):
-        mock_read_query.return_value = []
+    def test_get_all_returns_matching_categories_when_search(self):
+        with patch(registry_path, registry_with(CAT1_VALUES_TUPLE, CAT2_VALUES_TUPLE2)):
+            result = s.get_all(search='T2')
+        self.assertEqual([Category.from_query(*CAT2_VALUES_TUPLE2)], result)
+
+    def test_get_all_returns_empty_list_when_no_categories(self):
         expected = []
 
-        result = s.get_all()
+        with patch(registry_path, registry_with()):
+            result = s.get_all()
         self.assertEqual(expected, result)
 
     # get_by_id
-    @patch(read_query_path)
-    def test_get_by_id_returns_correct_object_with_correct_values(self, mock_read_query):
-        mock_read_query.return_value = [CAT1_VALUES_TUPLE]
+    def test_get_by_id_returns_correct_object_with_correct_values(self):
         expected = Category.from_query(*CAT1_VALUES_TUPLE)
 
-        result = s.get_by_id(CAT1_ID)
+        with patch(registry_path, registry_with(CAT1_VALUES_TUPLE)):
+            result = s.get_by_id(CAT1_ID)
 
         self.assertEqual(expected, result)
 
-    @patch(read_query_path)
-    def test_get_by_id_returns_None_when_empty(self, mock_read_query):
-        mock_read_query.return_value = []
-        result = s.get_by_id(CAT1_ID)
+    def test_get_by_id_returns_None_when_empty(self):
+        with patch(registry_path, registry_with()):
+            result = s.get_by_id(CAT1_ID)
         self.assertIsNone(result)
 
     # create
@@ -1,5 +1,5 @@
 from unittest import TestCase
-from unittest.mock import patch, MagicMock, Mock
+from unittest.mock import patch, Mock
 from data.models.topic import TopicResponse
 from common.utils import PaginationInfo, Links
 import routers.categories
@@ -50,7 +50,7 @@ class CategoryRouter_Should(TestCase):
         mock_category_services.get_all = lambda search: [CAT1.OBJ, CAT2.OBJ]
         expected = [CAT1.OBJ, CAT2.OBJ]
 
-        result = r.get_all_categories(search=None)
+        result = r.get_all_categories(Mock(), search=None)
         self.assertEqual(expected, result)
 
     # get_category_by_id
@@ -95,11 +95,7 @@ class CategoryRouter_Should(TestCase):
 
         self.assertEqual(r.SC.Forbidden, e.exception.status_code)
 
-    @patch('routers.categories.get_pagination_info')
-    @patch('routers.categories.create_links')
-    def test_get_category_by_id_HappyCase_correct_CategoryTopicsPaginate(  # name ?
-            self, mock_create_links, mock_get_pagination_info
-    ):
+    def test_get_category_by_id_HappyCase_correct_CategoryTopicsPaginate(self):  # name ?
         public_category_mock = Mock(spec=r.Category, is_private=False)
         public_category_mock.name = CAT1.NAME
         guest_user = Mock(is_admin=False)
@@ -107,17 +103,17 @@ class CategoryRouter_Should(TestCase):
         mock_category_services.get_by_id = lambda category_id: public_category_mock
 
         topics = [Mock(spec=TopicResponse) for _ in range(2)]
-        mock_get_pagination_info.return_value = Mock(spec=PaginationInfo)
-        mock_create_links.return_value = Mock(spec=Links)
+        pagination_info = Mock(spec=PaginationInfo)
+        links = Mock(spec=Links)
 
-        mock_topic_services.get_topics_paginate_links = lambda request, page, size, sort, sort_by, search, category: \
-            (topics, mock_get_pagination_info.return_value, mock_create_links.return_value)
+        mock_topic_services.get_topics_paginate_links = lambda request, page, size, sort, sort_by, search, category, cursor, estimate_total: \
+            (topics, pagination_info, links)
 
         expected = {
             'category': public_category_mock,
             'topics': topics,
-            'pagination_info': mock_get_pagination_info.return_value,
-            'links': mock_create_links.return_value,
+            'pagination_info': pagination_info,
+            'links': links,
         }
         result = r.get_category_by_id(
             category_id=CAT1.ID, current_user=guest_user,
@@ -0,0 +1,111 @@
+from unittest import TestCase
+from unittest.mock import patch
+from common.category_registry import CategoryRegistry, CategorySnapshot
+from services import categories_services
+
+CATEGORY_ROWS = [(1, 'public', 0, 0), (2, 'private', 1, 1)]
+PERMISSION_ROWS = [(10, 2, 0), (11, 2, 1)]
+
+read_query_path = 'common.category_registry.read_query'
+
+
+class CategoryRegistry_Should(TestCase):
+
+    def setUp(self):
+        self.registry = CategoryRegistry(refresh=300)
+
+    @patch(read_query_path)
+    def test_checks_loadSnapshotOnce(self, mock_read_query):
+        mock_read_query.side_effect = [CATEGORY_ROWS, PERMISSION_ROWS]
+
+        self.assertEqual(('private', True, True), self.registry.category(2))
+        self.assertTrue(self.registry.can_read(10, 2))
+        self.assertFalse(self.registry.can_write(10, 2))
+        self.assertTrue(self.registry.can_write(11, 2))
+        self.assertFalse(self.registry.can_read(12, 2))
+        self.assertIsNone(self.registry.category(3))
+
+        self.assertEqual(2, mock_read_query.call_count)
+        self.assertEqual(1, self.registry.loads)
+
+    @patch(read_query_path)
+    def test_updates_applyWithoutReload(self, mock_read_query):
+        mock_read_query.side_effect = [CATEGORY_ROWS, PERMISSION_ROWS]
+        self.registry.category(1)
+
+        self.registry.update_category(1, is_private=True)
+        self.registry.set_category(3, 'new', False, False)
+        self.registry.set_permission(12, 2, False)
+        self.registry.remove_permission(10, 2)
+        self.registry.set_permission(11, 2, False)
+
+        self.assertEqual(('public', False, True), self.registry.category(1))
+        self.assertEqual(('new', False, False), self.registry.category(3))
+        self.assertTrue(self.registry.can_read(12, 2))
+        self.assertFalse(self.registry.can_read(10, 2))
+        self.assertFalse(self.registry.can_write(11, 2))
+        self.assertEqual(1, self.registry.loads)
+
+    @patch(read_query_path)
+    def test_changes_replaceSnapshotWithNewVersion(self, mock_read_query):
+        mock_read_query.side_effect = [CATEGORY_ROWS, PERMISSION_ROWS]
+        before = self.registry.snapshot
+
+        self.registry.set_category(1, 'Renamed', False, False)
+
+        after = self.registry.snapshot
+        self.assertEqual(before.version + 1, after.version)
+        self.assertEqual(1, before.names['public'])
+        self.assertNotIn('public', after.names)
+        self.assertEqual(1, self.registry.category_id_by_name('RENAMED'))
+
+    @patch(read_query_path)
+    def test_invalidate_reloadsOnNextCheck(self, mock_read_query):
+        mock_read_query.side_effect = [CATEGORY_ROWS, PERMISSION_ROWS, CATEGORY_ROWS, []]
+
+        self.assertTrue(self.registry.can_read(10, 2))
+        self.registry.invalidate()
+
+        self.assertFalse(self.registry.can_read(10, 2))
+        self.assertEqual(2, self.registry.loads)
+
+
+class CategoriesServicesRegistry_Should(TestCase):
+
+    def setUp(self):
+        self.registry = CategoryRegistry()
+        self.registry._snapshot = CategorySnapshot(
+            loaded_at=float('inf'), categories={2: ('private', False, True)}, names={'private': 2})
+        patcher = patch('services.categories_services.category_registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('services.categories_services.read_query')
+    def test_accessChecks_doNotQuery(self, mock_read_query):
+        self.assertFalse(categories_services.has_access_to_private_category(10, 2))
+        self.assertEqual('private', categories_services.get_by_id(2).name)
+        self.assertIsNone(categories_services.get_by_id(3))
+
+        mock_read_query.assert_not_called()
+
+    @patch('services.categories_services.insert_query')
+    @patch('services.categories_services.update_query')
+    def test_permissionChanges_updateSnapshot(self, mock_update_query, mock_insert_query):
+        categories_services.add_user(10, 2)
+        self.assertTrue(categories_services.has_access_to_private_category(10, 2))
+        self.assertFalse(categories_services.has_write_access(10, 2))
+
+        categories_services.update_user_access_level(10, 2, True)
+        self.assertTrue(categories_services.has_write_access(10, 2))
+
+        categories_services.remove_user(10, 2)
+        self.assertFalse(categories_services.has_access_to_private_category(10, 2))
+
+    @patch('services.categories_services.update_query')
+    def test_categoryChanges_updateSnapshot(self, mock_update_query):
+        categories_services.update_privacy(False, 2)
+        categories_services.update_locking(True, 2)
+
+        category = categories_services.get_by_id(2)
+        self.assertFalse(category.is_private)
+        self.assertTrue(category.is_locked)
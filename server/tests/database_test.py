@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+from data import database
+from data.pool import ConnectionPool
+
+
+def fake_pool():
+    return ConnectionPool(Mock(side_effect=lambda: MagicMock()), size=2)
+
+
+class Database_Should(unittest.TestCase):
+
+    def test_insertQuery_commitsImmediately_whenNoUnitOfWork(self):
+        with patch('data.database._pool', fake_pool()) as pool:
+            database.insert_query('INSERT INTO t VALUES(?)', (1,))
+
+            conn = pool._idle[0].conn
+            conn.commit.assert_called_once()
+
+    def test_transaction_reusesOneConnection_andCommitsOnce(self):
+        with patch('data.database._pool', fake_pool()) as pool:
+            with database.transaction():
+                database.read_query('SELECT 1')
+                database.insert_query('INSERT INTO t VALUES(?)', (1,))
+                database.update_query('UPDATE t SET c = ?', (2,))
+
+            self.assertEqual(1, pool.metrics.checkouts)
+            conn = pool._idle[0].conn
+            conn.commit.assert_called_once()
+
+    def test_transaction_rollsBack_whenExceptionRaised(self):
+        with patch('data.database._pool', fake_pool()) as pool:
+            with self.assertRaises(ValueError):
+                with database.transaction():
+                    database.update_query('UPDATE t SET c = ?', (2,))
+                    raise ValueError()
+
+            conn = pool._idle[0].conn
+            conn.commit.assert_not_called()
+            conn.rollback.assert_called()
+
+    def test_transaction_joinsOuterTransaction_whenNested(self):
+        with patch('data.database._pool', fake_pool()) as pool:
+            with database.transaction() as outer:
+                with database.transaction() as inner:
+                    database.update_query('UPDATE t SET c = ?', (2,))
+
+                self.assertIs(outer, inner)
+                self.assertEqual(0, len(pool._idle))
+
+            self.assertEqual(1, pool.metrics.checkouts)
+
+    def test_transaction_doesNotCheckOutConnection_whenNoQueries(self):
+        with patch('data.database._pool', fake_pool()) as pool:
+            with database.transaction():
+                pass
+
+            self.assertEqual(0, pool.metrics.checkouts)
+
+    def test_onCommit_runsCallbackAfterCommit_insideTransaction(self):
+        with patch('data.database._pool', fake_pool()):
+            callback = Mock()
+            with database.transaction():
+                database.on_commit(callback)
+                callback.assert_not_called()
+
+            callback.assert_called_once()
+
+    def test_onCommit_dropsCallback_whenRolledBack(self):
+        with patch('data.database._pool', fake_pool()):
+            callback = Mock()
+            with self.assertRaises(ValueError):
+                with database.transaction():
+                    database.on_commit(callback)
+                    raise ValueError()
+
+            callback.assert_not_called()
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+from common.events import EventBus, EventBroker, LocalEventBroker
+from data import database
+
+
+class RecordingBroker(EventBroker):
+    def __init__(self):
+        self.published = []
+        self.handler = None
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+
+    def subscribe(self, handler):
+        self.handler = handler
+
+
+class EventBus_Should(unittest.IsolatedAsyncioTestCase):
+
+    async def test_publish_deliversToSubscribersOfTheChannel(self):
+        bus = EventBus()
+        subscription = bus.subscribe({'topic:1'})
+        other = bus.subscribe({'topic:2'})
+
+        bus.publish('topic:1', 'reply_created', {'reply_id': 5})
+
+        event = await subscription.get(timeout=1)
+        self.assertEqual({'channel': 'topic:1', 'type': 'reply_created', 'data': {'reply_id': 5}}, event)
+        with self.assertRaises(TimeoutError):
+            await other.get(timeout=0.01)
+
+    async def test_publish_waitsForCommit_insideUnitOfWork(self):
+        broker = RecordingBroker()
+        bus = EventBus(broker)
+        uow, token = database.begin_unit_of_work()
+        try:
+            bus.publish('user:1', 'message_created', {})
+            self.assertEqual([], broker.published)
+
+            uow.commit()
+        finally:
+            database.end_unit_of_work(token)
+
+        self.assertEqual(['user:1'], [channel for channel, _ in broker.published])
+
+    async def test_publish_isDropped_whenUnitOfWorkRollsBack(self):
+        broker = RecordingBroker()
+        bus = EventBus(broker)
+        uow, token = database.begin_unit_of_work()
+        try:
+            bus.publish('user:1', 'message_created', {})
+            uow.rollback()
+            uow.commit()
+        finally:
+            database.end_unit_of_work(token)
+
+        self.assertEqual([], broker.published)
+
+    async def test_deliver_fromOtherThread_reachesSubscriber(self):
+        broker = RecordingBroker()
+        bus = EventBus(broker)
+        subscription = bus.subscribe({'topic:1'})
+
+        # as the Redis listener thread does for events of other workers
+        await asyncio.to_thread(broker.handler, 'topic:1', {'type': 'votes_changed'})
+
+        self.assertEqual({'type': 'votes_changed'}, await subscription.get(timeout=1))
+
+    async def test_subscription_isClosed_whenQueueOverflows(self):
+        bus = EventBus(queue_size=2)
+        subscription = bus.subscribe({'topic:1'})
+
+        for reply_id in range(3):
+            bus.publish('topic:1', 'reply_created', {'reply_id': reply_id})
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.overflowed)
+        self.assertIsNone(await subscription.get(timeout=1))
+
+    async def test_unsubscribe_removesEmptyChannels(self):
+        bus = EventBus()
+        subscription = bus.subscribe({'topic:1', 'user:2'})
+
+        bus.unsubscribe(subscription)
+
+        self.assertEqual(0, bus.stats()['channels'])
+
+    async def test_close_endsSubscriptions(self):
+        bus = EventBus(LocalEventBroker())
+        subscription = bus.subscribe({'topic:1'})
+
+        bus.close()
+
+        self.assertIsNone(await subscription.get(timeout=1))
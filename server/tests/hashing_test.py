@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from common.hashing import HashingService, pass_context
+from common.responses import HTTPTooManyRequests
+
+PASSWORD = 'password'
+
+
+class HashingService_Should(unittest.TestCase):
+
+    def test_hashAndVerify_inWorkerProcess(self):
+        service = HashingService(workers=1, max_pending=2)
+        try:
+            hashed = service.hash(PASSWORD)
+
+            self.assertTrue(service.verify(PASSWORD, hashed))
+            self.assertFalse(service.verify('wrong', hashed))
+        finally:
+            service.shutdown()
+
+    def test_hashAndVerifyAsync_inWorkerProcess(self):
+        service = HashingService(workers=1, max_pending=2)
+
+        async def hash_and_verify():
+            hashed = await service.hash_async(PASSWORD)
+            return await service.verify_async(PASSWORD, hashed), await service.verify_async('wrong', hashed)
+
+        try:
+            self.assertEqual((True, False), asyncio.run(hash_and_verify()))
+        finally:
+            service.shutdown()
+
+    def test_raisesTooManyRequests_whenQueueIsFull(self):
+        service = HashingService(workers=0, max_pending=1)
+        service._slots.acquire()
+
+        with self.assertRaises(HTTPTooManyRequests) as ex:
+            service.hash(PASSWORD)
+
+        self.assertEqual(429, ex.exception.status_code)
+        self.assertEqual(1, service.rejected)
+
+    def test_verifyAndUpdate_returnsNewHash_whenRoundsChanged(self):
+        service = HashingService(workers=0)
+        weak_hash = pass_context.hash(PASSWORD, rounds=4)
+
+        verified, new_hash = service.verify_and_update(PASSWORD, weak_hash)
+
+        self.assertTrue(verified)
+        self.assertIsNotNone(new_hash)
+        self.assertTrue(pass_context.verify(PASSWORD, new_hash))
+        self.assertFalse(pass_context.needs_update(new_hash))
+
+    def test_asyncRaisesTooManyRequests_whenQueueIsFull(self):
+        service = HashingService(workers=0, max_pending=1)
+        service._slots.acquire()
+
+        with self.assertRaises(HTTPTooManyRequests):
+            asyncio.run(service.hash_async(PASSWORD))
+
+        self.assertEqual(1, service.rejected)
@@ -0,0 +1,107 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from fastapi import HTTPException
+from services import messages_services as messages
+
+USER_ID = 2
+OTHER_USER_ID = 7
+ACTIVITY = datetime(2024, 5, 1, 12, 30, 0, 250000)
+
+
+def conversation_row(other_user_id=OTHER_USER_ID, last_activity=ACTIVITY, unread=1):
+    return (other_user_id, f'user{other_user_id}', last_activity, unread, 3,
+            10 + other_user_id, 'hi', other_user_id, USER_ID)
+
+
+class MessagesServices_Should(unittest.TestCase):
+
+    def test_create_updatesBothSummaries_inUserIdOrder(self):
+        with patch('services.messages_services.insert_query', return_value=11), \
+                patch('services.messages_services.update_query') as mock_update_query:
+
+            message_id = messages.create('hi', OTHER_USER_ID, USER_ID)
+
+        self.assertEqual(11, message_id)
+        sql, params = mock_update_query.call_args.args
+        self.assertIn('ON DUPLICATE KEY UPDATE', sql)
+        # the receiver gets an unread message, the sender does not
+        self.assertEqual((USER_ID, OTHER_USER_ID, 11, 1, OTHER_USER_ID, USER_ID, 11, 0), params)
+
+    def test_create_updatesOneSummary_whenMessagingSelf(self):
+        with patch('services.messages_services.insert_query', return_value=11), \
+                patch('services.messages_services.update_query') as mock_update_query:
+
+            messages.create('note', USER_ID, USER_ID)
+
+        self.assertEqual((USER_ID, USER_ID, 11, 0), mock_update_query.call_args.args[1])
+
+    def test_getInbox_returnsNextCursor_whenMoreConversations(self):
+        rows = [conversation_row(9), conversation_row(OTHER_USER_ID), conversation_row(5)]
+        with patch('services.messages_services.query_count', return_value=3), \
+                patch('services.messages_services.read_query', return_value=rows):
+
+            conversations, total, next_cursor = messages.get_inbox(USER_ID, size=2)
+
+        self.assertEqual([9, OTHER_USER_ID], [c.user_id for c in conversations])
+        self.assertEqual(3, total)
+        self.assertEqual((ACTIVITY, OTHER_USER_ID), messages.decode_cursor(next_cursor, 'inbox'))
+
+    def test_getInbox_seeksPastCursor(self):
+        cursor = messages.encode_cursor('inbox', ACTIVITY.isoformat(), OTHER_USER_ID)
+        with patch('services.messages_services.query_count', return_value=3), \
+                patch('services.messages_services.read_query', return_value=[conversation_row(5)]) as mock_read_query:
+
+            _, _, next_cursor = messages.get_inbox(USER_ID, size=2, cursor=cursor)
+
+        sql, params = mock_read_query.call_args.args
+        self.assertIn('c.last_activity < ?', sql)
+        self.assertEqual((USER_ID, ACTIVITY, ACTIVITY, OTHER_USER_ID, 3), params)
+        self.assertIsNone(next_cursor)
+
+    def test_getConversation_pagesWithoutMarkingRead_onFirstPage(self):
+        with patch('services.messages_services.read_query') as mock_read_query, \
+                patch('services.messages_services.update_query') as mock_update_query:
+            mock_read_query.side_effect = [[(3,)], [(13, 'c', USER_ID, OTHER_USER_ID),
+                                                    (12, 'b', OTHER_USER_ID, USER_ID),
+                                                    (11, 'a', USER_ID, OTHER_USER_ID)]]
+
+            result, total, next_cursor = messages.get_conversation(OTHER_USER_ID, USER_ID, size=2)
+
+        self.assertEqual([13, 12], [m.message_id for m in result])
+        self.assertEqual(3, total)
+        self.assertEqual((12,), messages.decode_cursor(next_cursor, 'messages'))
+        self.assertEqual((USER_ID, OTHER_USER_ID, 3), mock_read_query.call_args.args[1])
+        mock_update_query.assert_not_called()
+
+    def test_getConversation_seeksOlderMessages_withCursor(self):
+        with patch('services.messages_services.read_query') as mock_read_query, \
+                patch('services.messages_services.update_query') as mock_update_query:
+            mock_read_query.side_effect = [[(3,)], [(11, 'a', USER_ID, OTHER_USER_ID)]]
+
+            result, _, next_cursor = messages.get_conversation(
+                USER_ID, OTHER_USER_ID, size=2, cursor=messages.encode_cursor('messages', 12))
+
+        self.assertIn('message_id < ?', mock_read_query.call_args.args[0])
+        self.assertIsNone(next_cursor)
+        mock_update_query.assert_not_called()
+
+    def test_markRead_clearsUnreadCount_ofTheReader(self):
+        with patch('services.messages_services.update_query') as mock_update_query:
+
+            messages.mark_read(USER_ID, OTHER_USER_ID)
+
+        sql, params = mock_update_query.call_args.args
+        self.assertIn('unread_count = 0', sql)
+        self.assertEqual((USER_ID, OTHER_USER_ID), params)
+
+    def test_getConversation_returnsEmpty_whenNoConversation(self):
+        with patch('services.messages_services.read_query', return_value=[]):
+
+            self.assertEqual(([], 0, None), messages.get_conversation(USER_ID, OTHER_USER_ID, size=2))
+
+    def test_decodeCursor_raises400_whenIssuedForAnotherListing(self):
+        with self.assertRaises(HTTPException) as error:
+            messages.decode_cursor(messages.encode_cursor('messages', 12), 'inbox')
+
+        self.assertEqual(400, error.exception.status_code)
@@ -0,0 +1,137 @@
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch, call
+from data import migrate
+
+MIGRATION_FILES = {
+    '0001_first.up.sql': 'CREATE TABLE a (id INT);\n',
+    '0001_first.down.sql': 'DROP TABLE a;\n',
+    '0002_second.up.sql': '-- two statements\nALTER TABLE a\n  ADD COLUMN b INT;\n\nCREATE INDEX idx_b ON a (b);\n',
+    '0002_second.down.sql': 'DROP INDEX idx_b ON a;\nALTER TABLE a DROP COLUMN b;\n',
+}
+
+
+class Migrate_Should(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        for name, sql in MIGRATION_FILES.items():
+            (self.directory / name).write_text(sql)
+
+    def test_availableMigrations_returnsMigrationsInVersionOrder(self):
+        migrations = migrate.available_migrations(self.directory)
+
+        self.assertEqual([(1, 'first'), (2, 'second')], [(m.version, m.name) for m in migrations])
+
+    def test_availableMigrations_raises_whenDownScriptMissing(self):
+        (self.directory / '0002_second.down.sql').unlink()
+
+        with self.assertRaises(migrate.MigrationError):
+            migrate.available_migrations(self.directory)
+
+    def test_splitStatements_skipsCommentsAndBlankStatements(self):
+        statements = migrate.split_statements(MIGRATION_FILES['0002_second.up.sql'])
+
+        self.assertEqual(['ALTER TABLE a\n  ADD COLUMN b INT', 'CREATE INDEX idx_b ON a (b)'], statements)
+
+    def test_upgrade_appliesPendingMigrationsAndRecordsThem(self):
+        migrations = migrate.available_migrations(self.directory)
+        with patch('data.migrate.current_version', return_value=1), \
+                patch('data.migrate.update_query') as mock_update_query, \
+                patch('data.migrate.insert_query') as mock_insert_query:
+
+            applied = migrate.upgrade(migrations=migrations)
+
+        self.assertEqual([2], [m.version for m in applied])
+        self.assertEqual([call('ALTER TABLE a\n  ADD COLUMN b INT'), call('CREATE INDEX idx_b ON a (b)')],
+                         mock_update_query.call_args_list)
+        mock_insert_query.assert_called_once_with(
+            'INSERT INTO schema_version(version, name) VALUES(?,?)', (2, 'second'))
+
+    def test_downgrade_revertsNewestFirst(self):
+        migrations = migrate.available_migrations(self.directory)
+        with patch('data.migrate.current_version', return_value=2), \
+                patch('data.migrate.update_query') as mock_update_query:
+
+            reverted = migrate.downgrade(0, migrations=migrations)
+
+        self.assertEqual([2, 1], [m.version for m in reverted])
+        self.assertEqual(call('DELETE FROM schema_version WHERE version = ?', (1,)),
+                         mock_update_query.call_args_list[-1])
+
+    def test_checkSchema_warns_whenBehind(self):
+        migrations = migrate.available_migrations(self.directory)
+        with patch('data.migrate.read_query', return_value=[(1,)]), \
+                patch('data.migrate.available_migrations', return_value=migrations), \
+                patch('data.migrate.update_query') as mock_update_query, \
+                self.assertLogs('data.migrate', level='WARNING'):
+
+            self.assertFalse(migrate.check_schema())
+
+        mock_update_query.assert_not_called()
+
+    def test_checkSchema_warnsInsteadOfRaising_whenDatabaseUnreadable(self):
+        with patch('data.migrate.read_query', side_effect=RuntimeError('unreachable')), \
+                patch('data.migrate.update_query') as mock_update_query, \
+                self.assertLogs('data.migrate', level='WARNING'):
+
+            self.assertFalse(migrate.check_schema())
+
+        mock_update_query.assert_not_called()
+
+    def test_detectBaseline_stopsAtFirstMissingMarker(self):
+        present = {migrate.SCHEMA_MARKERS[version] for version in (1, 2, 3, 5)}
+        with patch('data.migrate._has', side_effect=lambda *marker: marker in present):
+
+            self.assertEqual(3, migrate.detect_baseline())
+
+    def test_currentVersion_recordsBaseline_whenVersionTableMissing(self):
+        migrations = migrate.available_migrations()
+        with patch('data.migrate._has', side_effect=lambda *marker: marker == migrate.SCHEMA_MARKERS[1]), \
+                patch('data.migrate.read_query', return_value=[(1,)]), \
+                patch('data.migrate.update_query') as mock_update_query, \
+                patch('data.migrate.insert_query') as mock_insert_query:
+
+            self.assertEqual(1, migrate.current_version())
+
+        self.assertIn('CREATE TABLE IF NOT EXISTS schema_version', mock_update_query.call_args.args[0])
+        mock_insert_query.assert_called_once_with(
+            'INSERT INTO schema_version(version, name) VALUES(?,?)', (1, migrations[0].name))
+
+    def test_currentVersion_leavesRecordedVersion_whenVersionTableExists(self):
+        with patch('data.migrate._has', return_value=True), \
+                patch('data.migrate.read_query', return_value=[(4,)]), \
+                patch('data.migrate.insert_query') as mock_insert_query:
+
+            self.assertEqual(4, migrate.current_version())
+
+        mock_insert_query.assert_not_called()
+
+    def test_shippedMigrations_haveSchemaMarkersTheyCreate(self):
+        for migration in migrate.available_migrations():
+            with self.subTest(migration=migration.name):
+                kind, table, name = migrate.SCHEMA_MARKERS[migration.version]
+                self.assertIn(name or table, migration.up.read_text())
+
+    def test_shippedMigrations_areConsistent(self):
+        migrations = migrate.available_migrations()
+
+        self.assertEqual(list(range(1, len(migrations) + 1)), [m.version for m in migrations])
+
+    def test_shippedMigrations_downScriptsRevertEveryChangeOfUp(self):
+        for migration in migrate.available_migrations():
+            up, down = migration.up.read_text(), migration.down.read_text()
+            created = set(re.findall(r'CREATE TABLE (\w+)', up))
+            added = set(re.findall(r'ADD (?:FULLTEXT )?INDEX (\w+)', up))
+            columns = set(re.findall(r'ADD COLUMN (\w+)', up))
+            replaced = set(re.findall(r'DROP INDEX (\w+)', up))
+
+            with self.subTest(migration=migration.name):
+                self.assertEqual(created, set(re.findall(r'DROP TABLE (\w+)', down)))
+                self.assertEqual(added, set(re.findall(r'DROP INDEX (\w+)', down)))
+                self.assertEqual(columns, set(re.findall(r'DROP COLUMN (\w+)', down)))
+                self.assertEqual(replaced, set(re.findall(r'ADD INDEX (\w+)', down)))
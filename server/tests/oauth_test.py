@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from common import oauth
+from fastapi import HTTPException
+from common.token_cache import verified_tokens, revoke_user_tokens
+from data.models.user import TokenData, AuthUser
+from tests.test_utils import USERNAME, USER_ID, EMAIL
+
+
+def create_token(expire: datetime, **claims) -> str:
+    return oauth.jwt.encode(
+        {'username': USERNAME, 'is_admin': False, 'expire': expire.strftime('%Y-%m-%d %H:%M:%S'), **claims},
+        oauth.SECRET_KEY, oauth.ALGORITHM)
+
+
+def auth_user(token_version: int) -> AuthUser:
+    return AuthUser(USER_ID, USERNAME, EMAIL, None, None, False, token_version)
+
+
+class OAuth_Should(unittest.TestCase):
+
+    def setUp(self):
+        verified_tokens.clear()
+
+    def test_verifyTokenAccess_decodesTokenOnce_forRepeatedCalls(self):
+        token = create_token(datetime.now() + timedelta(days=1))
+
+        with patch('common.oauth.jwt.decode', wraps=oauth.jwt.decode) as mock_decode:
+            first = oauth.verify_token_access(token)
+            second = oauth.verify_token_access(token)
+
+        self.assertEqual(TokenData(username=USERNAME, is_admin=False), first)
+        self.assertEqual(first, second)
+        mock_decode.assert_called_once()
+
+    def test_verifyTokenAccess_returnsExpiredMessage_andDoesNotCache(self):
+        token = create_token(datetime.now() - timedelta(seconds=1))
+
+        result = oauth.verify_token_access(token)
+
+        self.assertEqual('Token has expired. Please log in again', result)
+        self.assertEqual(0, verified_tokens.stats()['size'])
+
+    def test_revokeUserTokens_forcesVerificationAgain(self):
+        token = create_token(datetime.now() + timedelta(days=1))
+        oauth.verify_token_access(token)
+
+        revoke_user_tokens(USERNAME)
+
+        self.assertEqual(0, verified_tokens.stats()['size'])
+
+    def test_getCurrentUser_rejectsToken_issuedBeforePasswordChange(self):
+        token = create_token(datetime.now() + timedelta(days=1), token_version=1)
+
+        with patch('common.oauth.find_by_username_cached', return_value=auth_user(2)), \
+                self.assertRaises(HTTPException) as ex:
+            oauth.get_current_user(token)
+
+        self.assertEqual(401, ex.exception.status_code)
+
+    def test_getCurrentUser_returnsUser_whenTokenVersionIsCurrent(self):
+        token = create_token(datetime.now() + timedelta(days=1), token_version=2)
+
+        with patch('common.oauth.find_by_username_cached', return_value=auth_user(2)):
+            self.assertEqual(auth_user(2), oauth.get_current_user(token))
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+from data.pool import ConnectionPool, PoolTimeoutError
+from mariadb import Error as MariaDBError
+
+
+def fake_factory():
+    return Mock(side_effect=lambda: Mock())
+
+
+class ConnectionPool_Should(unittest.TestCase):
+
+    def test_acquire_reusesReleasedConnection(self):
+        factory = fake_factory()
+        pool = ConnectionPool(factory, size=2)
+
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIs(first.conn, second.conn)
+        self.assertEqual(1, factory.call_count)
+        self.assertEqual(2, pool.metrics.checkouts)
+
+    def test_release_rollsBackOpenTransaction(self):
+        pool = ConnectionPool(fake_factory(), size=1)
+
+        pooled = pool.acquire()
+        pool.release(pooled)
+
+        pooled.conn.rollback.assert_called_once()
+
+    def test_acquire_raisesPoolTimeoutError_whenExhausted(self):
+        pool = ConnectionPool(fake_factory(), size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+
+        self.assertEqual(1, pool.metrics.timeouts)
+
+    def test_acquire_replacesConnection_whenHealthCheckFails(self):
+        factory = fake_factory()
+        pool = ConnectionPool(factory, size=1, max_idle=0)
+
+        pooled = pool.acquire()
+        pooled.conn.ping.side_effect = MariaDBError
+        pool.release(pooled)
+        replaced = pool.acquire()
+
+        self.assertIsNot(pooled.conn, replaced.conn)
+        self.assertEqual(1, pool.metrics.failed_health_checks)
+
+    def test_acquire_recyclesConnection_whenOlderThanMaxLifetime(self):
+        pool = ConnectionPool(fake_factory(), size=1, max_lifetime=0)
+
+        pooled = pool.acquire()
+        pool.release(pooled)
+        recycled = pool.acquire()
+
+        self.assertIsNot(pooled.conn, recycled.conn)
+        self.assertEqual(1, pool.metrics.recycled)
+        pooled.conn.close.assert_called_once()
+
+    def test_release_freesSlot_whenConnectionDiscarded(self):
+        pool = ConnectionPool(fake_factory(), size=1, timeout=0.01)
+
+        pool.release(pool.acquire(), discard=True)
+        pool.acquire()
+
+        self.assertEqual(1, pool.stats()['open'])
+
+
+class PoolTimeoutHandler_Should(unittest.TestCase):
+
+    def test_returnsServiceUnavailable_withRetryAfter(self):
+        from main import pool_timeout_handler
+
+        response = asyncio.run(pool_timeout_handler(Mock(), PoolTimeoutError('No connection available after 5s')))
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('1', response.headers['Retry-After'])
@@ -30,12 +30,14 @@ class RepliesServices_Should(unittest.TestCase):
                 patch('services.replies_services.get_pagination_info') as mock_pagination_info, \
                 patch('services.replies_services.create_links') as mock_create_links:
             reply_id_1, reply_id_2, reply_id_3 = 1, 2, 3
-            mock_get_all_replies.return_value = [(reply_id_1, TEXT, USERNAME, TOPIC_ID),
-                                                 (reply_id_2, TEXT,
-                                                  USERNAME, TOPIC_ID),
-                                                 (reply_id_3, TEXT, USERNAME, TOPIC_ID)]
-
-            mock_pagination_info.return_value = PaginationInfo(total_elements=len(mock_get_all_replies.return_value),
+            rows = [(reply_id_1, TEXT, USERNAME, TOPIC_ID),
+                    (reply_id_2, TEXT,
+                     USERNAME, TOPIC_ID),
+                    (reply_id_3, TEXT, USERNAME, TOPIC_ID)]
+            # the topic's reply_count, then the page
+            mock_get_all_replies.side_effect = [[(len(rows),)], rows]
+
+            mock_pagination_info.return_value = PaginationInfo(total_elements=len(rows),
                                                                page=PAGE,
                                                                size=SIZE,
                                                                pages=1)
@@ -44,12 +46,36 @@ class RepliesServices_Should(unittest.TestCase):
             mock_create_links.return_value = links
 
             expected = [create_reply(reply_id_1), create_reply(reply_id_2), create_reply(reply_id_3)], PaginationInfo(
-                total_elements=len(mock_get_all_replies.return_value), page=PAGE, size=SIZE, pages=1), links
+                total_elements=len(rows), page=PAGE, size=SIZE, pages=1), links
 
             actual = replies.get_all(
                 topic_id=TOPIC_ID, request=request, page=PAGE, size=SIZE)
 
             self.assertEqual(expected, actual)
+            mock_pagination_info.assert_called_once_with(len(rows), PAGE, SIZE)
+
+    def test_getAll_seeksPastCursor_andReturnsNextCursor(self):
+        with patch('services.replies_services.read_query') as mock_read_query:
+            mock_read_query.side_effect = [[(40,)], [(11, TEXT, USERNAME, TOPIC_ID), (12, TEXT, USERNAME, TOPIC_ID)]]
+            request = Mock()
+            request.url.query = ''
+
+            result, pagination_info, _ = replies.get_all(
+                topic_id=TOPIC_ID, request=request, page=PAGE, size=1, cursor=replies.encode_cursor('replies', 10))
+
+            self.assertEqual([11], [reply.reply_id for reply in result])
+            self.assertEqual(40, pagination_info.total_elements)
+            self.assertEqual([11], replies.decode_cursor(pagination_info.next_cursor, 'replies'))
+            sql, params = mock_read_query.call_args.args
+            self.assertIn('r.reply_id > ?', sql)
+            self.assertEqual((TOPIC_ID, 10, 2), params)
+
+    def test_getAll_raisesBadRequest_whenCursorHasWrongValues(self):
+        for cursor in (replies.encode_cursor('replies'), replies.encode_cursor('replies', 'x'),
+                       replies.encode_cursor('replies', 1, 2)):
+            with patch('services.replies_services.read_query', return_value=[(40,)]), \
+                    self.assertRaises(replies.HTTPBadRequest):
+                replies.get_all(topic_id=TOPIC_ID, request=Mock(), page=PAGE, size=1, cursor=cursor)
 
     def test_getAll_returnsEmptyListPaginationInfoAndLinks_whenNoReplies(self):
         with patch('services.replies_services.read_query') as mock_get_all_replies, \
@@ -99,7 +125,8 @@ class RepliesServices_Should(unittest.TestCase):
             self.assertEqual(expected, actual)
 
     def test_createReply_returnsReplyId(self):
-        with patch('services.replies_services.insert_query') as mock_add_reply:
+        with patch('services.replies_services.insert_query') as mock_add_reply, \
+                patch('services.replies_services.update_query') as mock_update_query:
             reply_id = 1
 
             mock_add_reply.return_value = reply_id
@@ -109,10 +136,24 @@ class RepliesServices_Should(unittest.TestCase):
                                           reply=ReplyCreateUpdate(text='text'), user_id=USER_ID)
 
             self.assertEqual(expected, actual)
+            sql, params = mock_update_query.call_args.args
+            self.assertIn('reply_count = reply_count + 1, last_reply_id = ?, last_activity_at = CURRENT_TIMESTAMP',
+                          sql)
+            self.assertEqual((reply_id, TOPIC_ID), params)
+
+    def test_deleteReply_decrementsReplyCount_andMovesLastActivityToPreviousReply(self):
+        with patch('services.replies_services.update_query') as mock_update_query:
+
+            replies.delete_reply(REPLY_ID, TOPIC_ID)
+
+            sql, params = mock_update_query.call_args.args
+            self.assertIn('t.reply_count = t.reply_count - 1', sql)
+            self.assertIn('t.last_activity_at = COALESCE(r.created_at, t.created_at)', sql)
+            self.assertEqual((TOPIC_ID, TOPIC_ID), params)
 
     # cat is private, no write access
     def test_canUserAccessTopicContent_returnsFalseAndCorrectMsg_whenCategoryPrivateAndNotHasWriteAccess(self):
-        with patch('services.replies_services.get_cat_by_id') as mock_get_cat, \
+        with patch('services.replies_services.get_cat_record') as mock_get_cat, \
                 patch('services.replies_services.has_write_access') as mock_has_write_access:
 
             mock_category = fake_category(is_private=True)
@@ -128,9 +169,9 @@ class RepliesServices_Should(unittest.TestCase):
 
     # cat is private, has write access, topic locked
     def test_CanUserAccessTopicContent_returnsFalseAndCorrectMsg_whenTopicLocked(self):
-        with patch('services.replies_services.get_cat_by_id') as mock_get_cat, \
+        with patch('services.replies_services.get_cat_record') as mock_get_cat, \
                 patch('services.replies_services.has_write_access') as mock_has_write_access, \
-                patch('services.replies_services.get_topic_by_id') as mock_get_topic:
+                patch('services.replies_services.get_topic_record') as mock_get_topic:
 
             mock_category = fake_category(is_private=True)
             mock_get_cat.return_value = mock_category
@@ -145,9 +186,9 @@ class RepliesServices_Should(unittest.TestCase):
 
     # cat is private, has_write_access, topic open
     def test_CanUserAccessTopicContent_returnsTrueAndOk_whenCatPrivate_hasWriteAccess(self):
-        with patch('services.replies_services.get_cat_by_id') as mock_get_cat, \
+        with patch('services.replies_services.get_cat_record') as mock_get_cat, \
                 patch('services.replies_services.has_write_access') as mock_has_write_access, \
-                patch('services.replies_services.get_topic_by_id') as mock_get_topic:
+                patch('services.replies_services.get_topic_record') as mock_get_topic:
 
             mock_category = fake_category(is_private=False)
             mock_get_cat.return_value = mock_category
@@ -164,9 +205,9 @@ class RepliesServices_Should(unittest.TestCase):
 
     # cat not private, topic not locked
     def test_CanUserAccessTopicContent_returnsTrueAndOk_whenCatNotPrivate_TopicNotLocked(self):
-        with patch('services.replies_services.get_cat_by_id') as mock_get_cat, \
+        with patch('services.replies_services.get_cat_record') as mock_get_cat, \
                 patch('services.replies_services.has_write_access') as mock_has_write_access, \
-                patch('services.replies_services.get_topic_by_id') as mock_get_topic:
+                patch('services.replies_services.get_topic_record') as mock_get_topic:
 
             mock_category = fake_category(is_private=False)
             mock_get_cat.return_value = mock_category
@@ -183,9 +224,9 @@ class RepliesServices_Should(unittest.TestCase):
 
     # cat not private, topic locked
     def test_CanUserAccessTopicContent_returnsFalseAndCorrectMsg_whenCatNotPrivate_TopicLocked(self):
-        with patch('services.replies_services.get_cat_by_id') as mock_get_cat, \
+        with patch('services.replies_services.get_cat_record') as mock_get_cat, \
                 patch('services.replies_services.has_write_access') as mock_has_write_access, \
-                patch('services.replies_services.get_topic_by_id') as mock_get_topic:
+                patch('services.replies_services.get_topic_record') as mock_get_topic:
 
             mock_category = fake_category(is_private=False)
             mock_get_cat.return_value = mock_category
@@ -200,6 +241,26 @@ class RepliesServices_Should(unittest.TestCase):
 
             self.assertEqual(expected, actual)
 
+    def test_expand_marksBestReply_withoutQueries(self):
+        with patch('services.replies_services.get_user_votes') as mock_get_user_votes:
+            page = [create_reply(1), create_reply(2)]
+
+            replies.expand(page, Mock(best_reply_id=2), user_id=USER_ID)
+
+            self.assertEqual([False, True], [reply.is_best_reply for reply in page])
+            self.assertEqual([None, None], [reply.my_vote for reply in page])
+            mock_get_user_votes.assert_not_called()
+
+    def test_expand_setsMyVote_withOneQueryForPage(self):
+        with patch('services.replies_services.get_user_votes') as mock_get_user_votes:
+            mock_get_user_votes.return_value = {2: 'down'}
+            page = [create_reply(1), create_reply(2)]
+
+            replies.expand(page, Mock(best_reply_id=None), user_id=USER_ID, my_vote=True)
+
+            self.assertEqual([None, 'down'], [reply.my_vote for reply in page])
+            mock_get_user_votes.assert_called_once_with(USER_ID, [1, 2])
+
     def test_replyExists_returnsTrue_ifReply(self):
         with patch('services.replies_services.read_query') as mock_exists:
 
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import Mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from common.cache import InvalidationChannel
+from common.response_cache import CachedResponse, ResponseCache, ResponseCacheMiddleware, cache_response
+
+TAGS = frozenset({'topics', 'topic:1'})
+
+
+def create_app(cache: ResponseCache, calls: list):
+    app = FastAPI()
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+
+    @app.get('/public')
+    def public(request: Request):
+        calls.append('public')
+        cache_response(request, 'topics', 'topic:1')
+        return {'calls': len(calls)}
+
+    @app.get('/private')
+    def private():
+        calls.append('private')
+        return {'calls': len(calls)}
+
+    return app
+
+
+class ResponseCache_Should(unittest.TestCase):
+
+    def test_invalidate_dropsResponsesWithAnyTag(self):
+        cache = ResponseCache()
+        cache.set('a', CachedResponse(b'a', 'application/json', TAGS), cache.generation)
+        cache.set('b', CachedResponse(b'b', 'application/json', frozenset({'categories'})), cache.generation)
+
+        cache.invalidate('topic:1')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+
+    def test_invalidateAll_clearsEveryWorker(self):
+        cache, other = ResponseCache(), ResponseCache()
+        channel, other_channel = Mock(spec=InvalidationChannel), Mock(spec=InvalidationChannel)
+        cache.attach(channel)
+        other.attach(other_channel)
+        other.set('a', CachedResponse(b'a', 'application/json', TAGS), other.generation)
+
+        cache.invalidate_all()
+        other_channel.subscribe.call_args.args[1](*channel.publish.call_args.args[1:])
+
+        self.assertIsNone(other.get('a'))
+
+    def test_set_skipsResponse_whenInvalidatedMeanwhile(self):
+        cache = ResponseCache()
+        generation = cache.generation
+
+        cache.invalidate('categories')
+        cache.set('a', CachedResponse(b'a', 'application/json', TAGS), generation)
+
+        self.assertIsNone(cache.get('a'))
+
+
+class ResponseCacheMiddleware_Should(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache()
+        self.calls = []
+        self.client = TestClient(create_app(self.cache, self.calls))
+
+    def test_servesCachedResponse_toAnonymousUsers(self):
+        first = self.client.get('/public')
+        second = self.client.get('/public')
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first.headers['etag'], second.headers['etag'])
+        self.assertIn('public', second.headers['cache-control'])
+        self.assertEqual(1, len(self.calls))
+
+    def test_returnsNotModified_whenETagMatches(self):
+        etag = self.client.get('/public').headers['etag']
+
+        response = self.client.get('/public', headers={'If-None-Match': etag})
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+
+    def test_recomputes_afterInvalidation(self):
+        self.client.get('/public')
+        self.cache.invalidate('topic:1')
+
+        response = self.client.get('/public')
+
+        self.assertEqual({'calls': 2}, response.json())
+
+    def test_bypassesCache_forAuthenticatedRequests(self):
+        self.client.get('/public')
+        self.client.get('/public', headers={'Authorization': 'Bearer token'})
+
+        self.assertEqual(2, len(self.calls))
+
+    def test_doesNotCache_responsesWithoutTags(self):
+        self.client.get('/private')
+        response = self.client.get('/private')
+
+        self.assertEqual(2, len(self.calls))
+        self.assertNotIn('etag', response.headers)
@@ -0,0 +1,33 @@
+import json
+import unittest
+from datetime import datetime
+from common.responses import LeanRoute, ModelResponse
+from data.models.category import Category
+from data.models.topic import TopicResponse
+
+TOPIC_ROW = (1, 'title', 2, 'author', 1, None, 3, 'category', 4, 5, datetime(2024, 5, 1, 12, 30), None, None)
+
+
+class LeanRoute_Should(unittest.TestCase):
+
+    def test_render_returnsModelResponse_withStatusCodeOfRoute_whenEndpointReturnsModels(self):
+        route = LeanRoute('/', lambda: [Category.from_query(1, 'name', 1, 0)], status_code=201)
+
+        response = route.endpoint()
+
+        self.assertIsInstance(response, ModelResponse)
+        self.assertEqual(201, response.status_code)
+        self.assertEqual([{'category_id': 1, 'name': 'name', 'is_locked': True, 'is_private': False}],
+                         json.loads(response.body))
+
+    def test_render_returnsContentAsIs_whenNotModels(self):
+        route = LeanRoute('/', lambda: 'Message sent')
+
+        self.assertEqual('Message sent', route.endpoint())
+
+    def test_modelResponse_rendersSameDocumentAsValidatedModel(self):
+        topic = TopicResponse.from_query(*TOPIC_ROW)
+
+        self.assertEqual(TopicResponse(**topic.model_dump()), topic)
+        self.assertEqual(json.loads(TopicResponse(**topic.model_dump()).model_dump_json()),
+                         json.loads(ModelResponse(topic).body))
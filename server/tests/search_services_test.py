@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import patch
+from data.models.search import SearchResult
+from data.models.user import AnonymousUser
+from services import search_services as search
+from tests.test_utils import USER_ID, create_user
+
+QUERY = 'fishing'
+PAGE = 1
+SIZE = 5
+
+
+class SearchServices_Should(unittest.TestCase):
+
+    def test_search_returnsRankedResultsAndTotal(self):
+        with patch('services.search_services.read_query') as mock_read_query, \
+                patch('services.search_services.query_count') as mock_query_count:
+            mock_query_count.return_value = 2
+            mock_read_query.return_value = [
+                ('topic', 10, None, 'Where to go fishing?', 'Where to go fishing?', 2.5),
+                ('reply', 10, 3, 'Where to go fishing?', 'I caught some big fish there', 0.7)]
+
+            expected = [
+                SearchResult(kind='topic', topic_id=10, reply_id=None, title='Where to go fishing?',
+                             snippet='Where to go fishing?', score=2.5),
+                SearchResult(kind='reply', topic_id=10, reply_id=3, title='Where to go fishing?',
+                             snippet='I caught some big fish there', score=0.7)]
+
+            result = search.search(QUERY, AnonymousUser(), PAGE, SIZE)
+
+            self.assertEqual((expected, 2), result)
+
+    def test_search_filtersPrivateCategories_forAnonymousUser(self):
+        with patch('services.search_services.read_query') as mock_read_query, \
+                patch('services.search_services.query_count'):
+            mock_read_query.return_value = []
+
+            search.search(QUERY, AnonymousUser(), PAGE, SIZE)
+
+            sql, params = mock_read_query.call_args.args
+            self.assertEqual(2, sql.count('AND c.is_private = 0'))
+            self.assertEqual((QUERY,) * 4 + (SIZE, 0), params)
+
+    def test_search_includesPermittedPrivateCategories_forRegularUser(self):
+        with patch('services.search_services.read_query') as mock_read_query, \
+                patch('services.search_services.query_count'):
+            mock_read_query.return_value = []
+
+            search.search(QUERY, create_user(), PAGE, SIZE)
+
+            sql, params = mock_read_query.call_args.args
+            self.assertEqual(2, sql.count('FROM users_categories_permissions WHERE user_id = ?'))
+            self.assertEqual((QUERY, QUERY, USER_ID, QUERY, QUERY, USER_ID, SIZE, 0), params)
+
+    def test_search_doesNotFilterCategories_forAdmin(self):
+        with patch('services.search_services.read_query') as mock_read_query, \
+                patch('services.search_services.query_count'):
+            mock_read_query.return_value = []
+
+            search.search(QUERY, create_user(is_admin=True), PAGE, SIZE)
+
+            sql, _ = mock_read_query.call_args.args
+            self.assertNotIn('is_private', sql)
+
+    def test_makeSnippet_returnsWholeText_whenShort(self):
+        self.assertEqual('short text', search.make_snippet('short text', ['text']))
+
+    def test_makeSnippet_returnsWindowAroundFirstMatch_whenLong(self):
+        text = 'a' * 300 + ' fishing ' + 'b' * 300
+
+        result = search.make_snippet(text, ['fishing'], length=40)
+
+        self.assertIn('fishing', result)
+        self.assertTrue(result.startswith('...') and result.endswith('...'))
+
+    def test_titleFilter_requiresEveryWordAsPrefix_throughFulltextIndex(self):
+        self.assertEqual(('MATCH(t.title) AGAINST(? IN BOOLEAN MODE)', ('+where* +fishing*',)),
+                         search.title_filter('Where to "fishing"'))
+
+    def test_titleFilter_fallsBackToLike_whenNoWordIsIndexed(self):
+        self.assertEqual(('t.title LIKE ?', ('%to%',)), search.title_filter('to'))
@@ -0,0 +1,160 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+from services.topic_ranking import RankedSet, TopicRanking, hot_score
+
+CATEGORY_ID = 1
+OTHER_CATEGORY_ID = 2
+OPEN, LOCKED = 0, 1
+NOW = datetime(2024, 5, 1, 12, 0)
+
+
+def topic_row(topic_id, net_votes=0, reply_count=0, category_id=CATEGORY_ID, is_locked=OPEN, last_activity_at=NOW):
+    return topic_id, category_id, is_locked, reply_count, last_activity_at, net_votes
+
+
+class RankedSet_Should(unittest.TestCase):
+
+    def test_page_returnsHighestScoreFirst_andNewestTopicOnTies(self):
+        ranked = RankedSet()
+        for topic_id, score in ((1, 5.0), (2, 9.0), (3, 5.0), (4, 1.0)):
+            ranked.set(topic_id, score)
+
+        self.assertEqual([(2, 9.0), (3, 5.0)], ranked.page(0, 2))
+        self.assertEqual([(1, 5.0), (4, 1.0)], ranked.page(2, 2))
+        self.assertEqual([(4, 1.0), (1, 5.0)], ranked.page(0, 2, reverse=True))
+
+    def test_after_seeksPastCursor_inBothDirections(self):
+        ranked = RankedSet()
+        for topic_id, score in ((1, 5.0), (2, 9.0), (3, 5.0), (4, 1.0)):
+            ranked.set(topic_id, score)
+
+        self.assertEqual([(1, 5.0), (4, 1.0)], ranked.after(5.0, 3, 5))
+        self.assertEqual([(3, 5.0), (2, 9.0)], ranked.after(5.0, 1, 5, reverse=True))
+
+    def test_set_movesTopic_whenScoreChanges(self):
+        ranked = RankedSet()
+        ranked.set(1, 1.0)
+        ranked.set(2, 2.0)
+
+        self.assertTrue(ranked.set(1, 3.0))
+        self.assertFalse(ranked.set(1, 3.0))
+
+        self.assertEqual([(1, 3.0), (2, 2.0)], ranked.page(0, 5))
+        self.assertEqual(2, len(ranked))
+
+
+class TopicRanking_Should(unittest.TestCase):
+
+    def test_hotScore_favoursPoints_andRecentActivity(self):
+        self.assertGreater(hot_score(10, 0, NOW), hot_score(1, 0, NOW))
+        self.assertGreater(hot_score(1, 0, NOW + timedelta(hours=1)), hot_score(1, 0, NOW))
+        self.assertLess(hot_score(-10, 0, NOW), hot_score(0, 0, NOW))
+
+    def test_refresh_ranksTopicsByCategoryAndStatus(self):
+        ranking = TopicRanking()
+        ranking.loaded_at = 0
+        rows = [topic_row(1, net_votes=3), topic_row(2, net_votes=7, category_id=OTHER_CATEGORY_ID),
+                topic_row(3, net_votes=5, is_locked=LOCKED)]
+
+        with patch('services.topic_ranking.read_query', return_value=rows):
+            ranking.refresh([1, 2, 3])
+
+        self.assertEqual(([(2, 7), (3, 5), (1, 3)], 3), ranking.page('top', 0, 5))
+        self.assertEqual(([(3, 5), (1, 3)], 2), ranking.page('top', 0, 5, category_id=CATEGORY_ID))
+        self.assertEqual(([(1, 3)], 1), ranking.page('top', 0, 5, category_id=CATEGORY_ID, is_locked=OPEN))
+
+    def test_refresh_dropsTopic_whenItNoLongerExists(self):
+        ranking = TopicRanking()
+        ranking.loaded_at = 0
+        with patch('services.topic_ranking.read_query', return_value=[topic_row(1), topic_row(2)]):
+            ranking.refresh([1, 2])
+
+        with patch('services.topic_ranking.read_query', return_value=[topic_row(1)]):
+            ranking.refresh([1, 2])
+
+        self.assertEqual(([(1, 0)], 1), ranking.page('top', 0, 5, category_id=CATEGORY_ID))
+
+    def test_refresh_movesTopic_whenLocked(self):
+        ranking = TopicRanking()
+        ranking.loaded_at = 0
+        with patch('services.topic_ranking.read_query', return_value=[topic_row(1)]):
+            ranking.refresh([1])
+
+        with patch('services.topic_ranking.read_query', return_value=[topic_row(1, is_locked=LOCKED)]):
+            ranking.refresh([1])
+
+        self.assertEqual(0, ranking.page('hot', 0, 5, is_locked=OPEN)[1])
+        self.assertEqual(1, ranking.page('hot', 0, 5, is_locked=LOCKED)[1])
+
+    def test_touch_marksTopicsPending(self):
+        ranking = TopicRanking()
+
+        ranking.touch(1, 2)
+        ranking.touch(2)
+
+        self.assertEqual(2, ranking.stats()['pending'])
+
+    def test_persist_writesChangedScoresOnce(self):
+        ranking = TopicRanking()
+        ranking.loaded_at = 0
+        with patch('services.topic_ranking.read_query', return_value=[topic_row(1, net_votes=2)]):
+            ranking.refresh([1])
+
+        with patch('services.topic_ranking.update_query') as mock_update_query, \
+                patch('services.topic_ranking.transaction', MagicMock()):
+            self.assertEqual(1, ranking.persist())
+            self.assertEqual(0, ranking.persist())
+
+        sql, params = mock_update_query.call_args.args
+        self.assertIn('INSERT INTO topic_scores(topic_id, hot, top)', sql)
+        self.assertEqual((1, hot_score(2, 0, NOW), 2), params)
+
+    def test_load_scoresOnlyTopicsMissingFromSnapshot(self):
+        ranking = TopicRanking()
+        snapshot = [(1, CATEGORY_ID, OPEN, 4.5, 4), (2, CATEGORY_ID, OPEN, None, None)]
+
+        with patch('services.topic_ranking.read_query', side_effect=[snapshot, [topic_row(2, net_votes=9)]]) \
+                as mock_read_query:
+            self.assertEqual(1, ranking.load())
+
+        self.assertEqual((2,), mock_read_query.call_args.args[1])
+        self.assertEqual(([(2, 9), (1, 4)], 2), ranking.page('top', 0, 5))
+
+    def test_page_queriesDatabase_untilScoresLoaded(self):
+        ranking = TopicRanking()
+
+        with patch('services.topic_ranking.read_query', side_effect=[[(3, 7), (1, 2)], [(4,)]]) as mock_read_query:
+            self.assertEqual(([(3, 7), (1, 2)], 4), ranking.page('top', 0, 2, category_id=CATEGORY_ID))
+
+        sql, params = mock_read_query.call_args_list[0].args
+        self.assertIn('ORDER BY score DESC, topic_id DESC LIMIT ? OFFSET ?', sql)
+        self.assertEqual((CATEGORY_ID, 2, 0), params)
+        self.assertEqual((CATEGORY_ID,), mock_read_query.call_args_list[1].args[1])
+
+    def test_after_queriesDatabasePastCursor_untilScoresLoaded(self):
+        ranking = TopicRanking()
+
+        with patch('services.topic_ranking.read_query', side_effect=[[(2, 1)], [(3,)]]) as mock_read_query:
+            self.assertEqual(([(2, 1)], 3), ranking.after('top', 7, 3, 2, reverse=True))
+
+        sql, params = mock_read_query.call_args_list[0].args
+        self.assertIn('WHERE score > ? OR (score = ? AND topic_id > ?) ORDER BY score ASC, topic_id ASC', sql)
+        self.assertEqual((7, 7, 3, 2, 0), params)
+
+    def test_start_loadsScoresInBackground(self):
+        ranking = TopicRanking(interval=0.01)
+        loaded = threading.Event()
+
+        def load():
+            loaded.wait(5)
+            ranking.loaded_at = 0
+
+        with patch.object(ranking, 'load', side_effect=load) as mock_load:
+            ranking.start()
+            self.assertIsNone(ranking.loaded_at)
+            loaded.set()
+            ranking.stop()
+
+        mock_load.assert_called_once_with()
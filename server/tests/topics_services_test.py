@@ -1,9 +1,9 @@
+from datetime import datetime
 from unittest import TestCase
 from unittest.mock import patch
-from data.models.topic import TopicResponse, TopicCreate
-from data.models.user import User
+from data.models.topic import TopicResponse, TopicCreate, TopicRecord
+from data.models.user import AuthUser
 from services import topics_services as topics
-from mariadb import IntegrityError
 
 
 #TOPIC
@@ -21,6 +21,10 @@ PAGE = 1
 SIZE = 1
 
 
+def create_auth_user():
+    return AuthUser(USER_ID, AUTHOR, 'user@example.com', None, None, False)
+
+
 def create_topic(topic_id, topic_title=TITLE, author=AUTHOR):
     return TopicResponse(
         topic_id=topic_id,
@@ -91,16 +95,67 @@ class TopicsServices_Should(TestCase):
                 ('filter_1', 'filter_2')
             ) 
     
+    def test_countTopics_readsSummaryTable_whenOnlyCategoryAndStatusFilters(self):
+        with patch('services.topics_services.query_count') as mock_query_count:
+            mock_query_count.return_value = 4
+
+            result = topics.count_topics(category=CATEGORY_NAME, status='locked')
+
+            self.assertEqual(4, result)
+            mock_query_count.assert_called_once_with(
+                'SELECT COALESCE(SUM(tc.total), 0) FROM topic_counts tc '
+                'JOIN categories c ON tc.category_id = c.category_id '
+                'WHERE c.name = ? AND tc.is_locked = ?',
+                (CATEGORY_NAME, 1)
+            )
+
+    def test_countTopics_countsFilteredJoin_whenSearchFilter(self):
+        with patch('services.topics_services.get_total_count') as mock_get_total_count:
+            mock_get_total_count.return_value = 2
+
+            result = topics.count_topics(search='example')
+
+            self.assertEqual(2, result)
+            sql, params = mock_get_total_count.call_args.args
+            self.assertIn('WHERE MATCH(t.title) AGAINST(? IN BOOLEAN MODE)', sql)
+            self.assertEqual(('+example*',), params)
+
+    def test_countTopics_returnsPlanEstimate_whenSearchFilterAndEstimate(self):
+        with patch('services.topics_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [
+                (1, 'SIMPLE', 't', 'ALL', None, None, None, None, 1000, 10.0, 'Using where'),
+                (1, 'SIMPLE', 'u', 'eq_ref', 'PRIMARY', 'PRIMARY', '4', 'forum.t.user_id', 1, 100.0, ''),
+            ]
+
+            result = topics.count_topics(search='example', estimate=True)
+
+            self.assertEqual(100, result)
+            self.assertTrue(mock_read_query.call_args.args[0].startswith('EXPLAIN EXTENDED SELECT'))
+
+    def test_updateLocking_movesTopicBetweenStatusCounters(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.update_query') as mock_update_query, \
+                patch('services.topics_services.insert_query') as mock_insert_query:
+            mock_read_query.return_value = [(CATEGORY_ID, 0)]
+
+            topics.update_locking(True, TOPIC_ID)
+
+            mock_update_query.assert_called_once_with(
+                'UPDATE topics SET is_locked = ?, updated_at = CURRENT_TIMESTAMP WHERE topic_id = ?',
+                (True, TOPIC_ID))
+            self.assertEqual([(CATEGORY_ID, 0, 0, -1), (CATEGORY_ID, 1, 1, 1)],
+                             [call.args[1] for call in mock_insert_query.call_args_list])
+
     def test_getAll_returns_ListOfTopicResponseObjectssAndTotalCount_when_TopicsExist_when_noFilters(self):
         with patch('services.topics_services.read_query') as mock_read_query, \
-                patch('services.topics_services.get_total_count') as mock_get_total_count:
+                patch('services.topics_services.count_topics') as mock_count_topics:
                     
             topic_id_1, topic_id_2, topic_id_3 = 1, 2, 3
             mock_read_query.return_value = [(topic_id_1, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME),
                                             (topic_id_2, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME),
                                             (topic_id_3, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME)]
             
-            mock_get_total_count.return_value = 3
+            mock_count_topics.return_value = 3
 
             expected_topics = [create_topic(topic_id_1),
                                create_topic(topic_id_2),
@@ -113,10 +168,10 @@ class TopicsServices_Should(TestCase):
             
     def test_getAll_returnsEmptyTuple_whenNoTopics(self): 
         with patch('services.topics_services.read_query') as mock_read_query, \
-                patch('services.topics_services.get_total_count') as mock_get_total_count: 
+                patch('services.topics_services.count_topics') as mock_count_topics: 
                     
             mock_read_query.return_value = []  
-            mock_get_total_count.return_value = 0
+            mock_count_topics.return_value = 0
             expected_result = ([], 0)  
             
             result = topics.get_all(page=PAGE, size=SIZE)
@@ -125,22 +180,24 @@ class TopicsServices_Should(TestCase):
     
     def test_getAll_checksIf_ReadQueryCalled_withCorrectSqlAndParams_whenSearchFilter(self):
         with patch('services.topics_services.read_query') as mock_read_query, \
-                patch('services.topics_services.get_total_count') as mock_get_total_count:
+                patch('services.topics_services.count_topics') as mock_count_topics:
                     
-            mock_get_total_count.return_value = 1
+            mock_count_topics.return_value = 1
                    
             expected_sql= (
-    'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name ' 
+    'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name, '
+    't.reply_count, t.last_reply_id, t.last_activity_at, t.created_at, t.updated_at '
     'FROM topics t ' 
     'JOIN users u ON t.user_id = u.user_id ' 
     'JOIN categories c ON t.category_id = c.category_id ' 
-    'WHERE t.title LIKE ? ' 
-    'LIMIT ? OFFSET ?'
+    'WHERE MATCH(t.title) AGAINST(? IN BOOLEAN MODE)'
+    ' ORDER BY t.topic_id ASC'
+    ' LIMIT ? OFFSET ?'
 )
             search_filter = 'example'
             limit = SIZE
             offset = SIZE * (PAGE - 1)  
-            expected_params = (f'%{search_filter}%', limit, offset) 
+            expected_params = (f'+{search_filter}*', limit, offset) 
             
             topics.get_all(PAGE, SIZE, search=search_filter)                                    
             mock_read_query.assert_called_with(expected_sql, expected_params)
@@ -148,21 +205,22 @@ class TopicsServices_Should(TestCase):
     
     def test_getAll_checksIf_ReadQueryCalled_withCorrectSqlAndParams_whenAllFiltersAndSortApplied(self):
         with patch('services.topics_services.read_query') as mock_read_query, \
-                patch('services.topics_services.get_total_count') as mock_get_total_count:
+                patch('services.topics_services.count_topics') as mock_count_topics:
                     
-            mock_get_total_count.return_value = 1
+            mock_count_topics.return_value = 1
                    
             expected_sql = (
-    'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name '
+    'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name, '
+    't.reply_count, t.last_reply_id, t.last_activity_at, t.created_at, t.updated_at '
     'FROM topics t '
     'JOIN users u ON t.user_id = u.user_id '
     'JOIN categories c ON t.category_id = c.category_id '
-    'WHERE t.title LIKE ? '
+    'WHERE MATCH(t.title) AGAINST(? IN BOOLEAN MODE) '
     'AND u.username = ? '
     'AND c.name = ? '
-    'AND t.is_locked = ? '
-    'ORDER BY title IS NULL, title ASC '
-    'LIMIT ? OFFSET ?'
+    'AND t.is_locked = ?'
+    ' ORDER BY t.title ASC, t.topic_id ASC'
+    ' LIMIT ? OFFSET ?'
 )
                           
             search_filter = 'example'
@@ -173,7 +231,7 @@ class TopicsServices_Should(TestCase):
             sort_by = 'title'
             limit = SIZE
             offset = SIZE * (PAGE - 1)  
-            expected_params = (f'%{search_filter}%', username_filter, category_filter, status_filter, limit, offset) 
+            expected_params = (f'+{search_filter}*', username_filter, category_filter, status_filter, limit, offset) 
             
             topics.get_all(PAGE,
                            SIZE, 
@@ -188,6 +246,132 @@ class TopicsServices_Should(TestCase):
             mock_read_query.assert_called_with(expected_sql, expected_params)
             
               
+    def test_getAllKeyset_readsFirstPage_withoutSeekFilter_whenEmptyCursor(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.count_topics') as mock_count_topics:
+
+            mock_count_topics.return_value = 1
+            mock_read_query.return_value = [
+                (TOPIC_ID, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME)]
+
+            expected_sql = (
+    'SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name, '
+    't.reply_count, t.last_reply_id, t.last_activity_at, t.created_at, t.updated_at '
+    'FROM topics t '
+    'JOIN users u ON t.user_id = u.user_id '
+    'JOIN categories c ON t.category_id = c.category_id '
+    ' ORDER BY t.title ASC, t.topic_id ASC'
+    ' LIMIT ?'
+)
+            result = topics.get_all_keyset(SIZE, cursor='', sort='asc', sort_by='title')
+
+            mock_read_query.assert_called_with(expected_sql, (SIZE + 1,))
+            self.assertEqual(([create_topic(TOPIC_ID)], 1, None), result)
+
+    def test_getAllKeyset_returnsNextCursor_whenMoreRows(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.count_topics') as mock_count_topics:
+
+            mock_count_topics.return_value = 2
+            mock_read_query.return_value = [
+                (1, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME),
+                (2, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME)]
+
+            topics_page, _, next_cursor = topics.get_all_keyset(SIZE, cursor='', sort='desc', sort_by='title')
+
+            self.assertEqual([create_topic(1)], topics_page)
+            self.assertEqual((TITLE, 1), topics.decode_topics_cursor(next_cursor, 'title', 'desc'))
+
+    def test_getAllKeyset_seeksPastCursor(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.count_topics') as mock_count_topics:
+
+            mock_count_topics.return_value = 1
+            mock_read_query.return_value = []
+            cursor = topics.encode_topics_cursor('user_id', 'asc', USER_ID, TOPIC_ID)
+
+            topics.get_all_keyset(SIZE, cursor=cursor, search='example', sort='asc', sort_by='user_id')
+
+            sql, params = mock_read_query.call_args.args
+            self.assertIn('WHERE MATCH(t.title) AGAINST(? IN BOOLEAN MODE) AND (t.user_id > ? OR (t.user_id = ? AND t.topic_id > ?))', sql)
+            self.assertEqual(('+example*', USER_ID, USER_ID, TOPIC_ID, SIZE + 1), params)
+
+    def test_getAllKeyset_keepsNullsLast_whenSortByNullableColumn(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.count_topics') as mock_count_topics:
+
+            mock_count_topics.return_value = 1
+            mock_read_query.return_value = []
+            cursor = topics.encode_topics_cursor('best_reply_id', 'asc', None, TOPIC_ID)
+
+            topics.get_all_keyset(SIZE, cursor=cursor, sort='asc', sort_by='best_reply_id')
+
+            sql, params = mock_read_query.call_args.args
+            self.assertIn('WHERE (t.best_reply_missing = 1 AND t.topic_id > ?)', sql)
+            self.assertIn('ORDER BY t.best_reply_missing, t.best_reply_id ASC, t.topic_id ASC', sql)
+            self.assertEqual((TOPIC_ID, SIZE + 1), params)
+
+    def test_getAll_keepsNullsLastWithIndexOrder_whenSortByBestReplyDesc(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.count_topics') as mock_count_topics:
+
+            mock_count_topics.return_value = 0
+            mock_read_query.return_value = []
+
+            topics.get_all(PAGE, SIZE, sort='desc', sort_by='best_reply_id')
+
+            sql, _ = mock_read_query.call_args.args
+            self.assertIn(' ORDER BY t.best_reply_missing, t.best_reply_id DESC, t.topic_id DESC LIMIT', sql)
+            self.assertNotIn('IS NULL', sql)
+
+    def test_decodeCursor_raisesBadRequest_whenCursorForAnotherSort(self):
+        cursor = topics.encode_topics_cursor('title', 'asc', TITLE, TOPIC_ID)
+
+        with self.assertRaises(topics.HTTPBadRequest):
+            topics.decode_topics_cursor(cursor, 'title', 'desc')
+
+    def test_getAllKeyset_seeksPastLastActivity_whenSortByActivity(self):
+        with patch('services.topics_services.read_query') as mock_read_query, \
+                patch('services.topics_services.count_topics') as mock_count_topics:
+
+            mock_count_topics.return_value = 1
+            mock_read_query.return_value = []
+            last_activity = datetime(2024, 5, 1, 12, 30)
+            cursor = topics.encode_topics_cursor('activity', 'desc', last_activity, TOPIC_ID)
+
+            topics.get_all_keyset(SIZE, cursor=cursor, sort='desc', sort_by='activity')
+
+            sql, params = mock_read_query.call_args.args
+            self.assertIn('WHERE (t.last_activity_at < ? OR (t.last_activity_at = ? AND t.topic_id < ?))', sql)
+            self.assertIn('ORDER BY t.last_activity_at DESC, t.topic_id DESC', sql)
+            self.assertEqual((last_activity, last_activity, TOPIC_ID, SIZE + 1), params)
+
+    def test_getRanked_returnsTopicsInRankOrder_withNextCursor(self):
+        with patch('services.topics_services.topic_ranking') as mock_ranking, \
+                patch('services.topics_services.read_query') as mock_read_query:
+            mock_ranking.page.return_value = ([(2, 7), (1, 3)], 5)
+            mock_read_query.return_value = [
+                (1, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME),
+                (2, TITLE, USER_ID, AUTHOR, STATUS_OPEN, BEST_REPLY_ID, CATEGORY_ID, CATEGORY_NAME)]
+
+            result, total, next_cursor = topics.get_ranked(SIZE, cursor='', sort_by='top')
+
+            mock_ranking.page.assert_called_once_with('top', 0, SIZE + 1, None, None, reverse=False)
+            self.assertEqual(([create_topic(2)], 5), (result, total))
+            self.assertEqual((7, 2), topics.decode_topics_cursor(next_cursor, 'top', 'desc'))
+
+    def test_getTopicsPaginateLinks_raisesBadRequest_whenRankedSortWithSearch(self):
+        with self.assertRaises(topics.HTTPBadRequest):
+            topics.get_topics_paginate_links(None, PAGE, SIZE, sort_by='hot', search='example')
+
+    def test_decodeTopicsCursor_raisesBadRequest_whenCursorOfAnotherListing(self):
+        with self.assertRaises(topics.HTTPBadRequest):
+            topics.decode_topics_cursor(topics.encode_cursor('replies', 10), 'title', 'asc')
+
+    def test_decodeCursor_raisesBadRequest_whenCursorMalformed(self):
+        with self.assertRaises(topics.HTTPBadRequest):
+            topics.decode_topics_cursor('not-a-cursor', 'title', 'asc')
+
     def test_create_returnsTopicId(self):
         with patch('services.topics_services.insert_query') as mock_insert_query:
             topic_id = 1
@@ -208,7 +392,7 @@ class TopicsServices_Should(TestCase):
 
     
     def test_updateBestReply_updatesBestReplyId_returns_Message(self):
-        with patch('services.topics_services.update_query') as mock_update_query:
+        with patch('services.topics_services.update_query'):
             best_reply_id = 1
         
             expected = f"Best Reply Id updated to {best_reply_id}"
@@ -223,14 +407,33 @@ class TopicsServices_Should(TestCase):
     def test_get_topic_replies_returnsEmptyList_whenNoReplies(self):
         pass    
           
+    def test_getRecord_selectsOnlyAccessColumns(self):
+        with patch('services.topics_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [(TOPIC_ID, TITLE, USER_ID, 1, CATEGORY_ID)]
+
+            result = topics.get_record(TOPIC_ID)
+
+            self.assertEqual(TopicRecord(TOPIC_ID, TITLE, USER_ID, 'locked', CATEGORY_ID), result)
+            self.assertNotIn('JOIN', mock_read_query.call_args.args[0])
+
     def test_validate_topic_access_returnsErrorResponse_whenTopicNotExist(self):
-        pass
+        with patch('services.topics_services.get_record', return_value=None):
+            self.assertEqual((False, f"Topic #ID:{TOPIC_ID} does not exist"),
+                             topics.validate_topic_access(TOPIC_ID, create_auth_user()))
     
     def test_validate_topic_access_returnsErrorResponse_whenTopicIsLocked(self):
-        pass
+        with patch('services.topics_services.get_record',
+                   return_value=TopicRecord(TOPIC_ID, TITLE, USER_ID, 'locked', CATEGORY_ID)):
+            self.assertEqual((False, f"Topic #ID:{TOPIC_ID} is locked"),
+                             topics.validate_topic_access(TOPIC_ID, create_auth_user()))
     
     def test_validate_topic_access_returnsErrorResponse_whenUserIsNotOwner(self):
-        pass
+        with patch('services.topics_services.get_record',
+                   return_value=TopicRecord(TOPIC_ID, TITLE, USER_ID + 1, 'open', CATEGORY_ID)):
+            self.assertEqual((False, 'You are not allowed to edit topics created by other users'),
+                             topics.validate_topic_access(TOPIC_ID, create_auth_user()))
     
     def test_validate_topic_access_returnsNone_whenValidatingSuccessful(self):
-        pass
\ No newline at end of file
+        with patch('services.topics_services.get_record',
+                   return_value=TopicRecord(TOPIC_ID, TITLE, USER_ID, 'open', CATEGORY_ID)):
+            self.assertEqual((True, 'OK'), topics.validate_topic_access(TOPIC_ID, create_auth_user()))
\ No newline at end of file
@@ -1,6 +1,7 @@
+import asyncio
 import unittest
 from unittest.mock import patch
-from data.models.user import UserInfo, UserUpdate, User, UserRegister
+from data.models.user import UserUpdate, UserRegister, AuthUser
 from services import users_services as users
 from services.users_services import IntegrityError
 from tests.test_utils import EMAIL, FIRST_NAME, LAST_NAME, USER_ID, USERNAME, PASSWORD, create_user, create_user_info
@@ -74,6 +75,51 @@ class UsersServices_Should(unittest.TestCase):
 
             self.assertEqual(expected, actual)
 
+    def test_findAuthUser_returnsUserWithoutPassword(self):
+        with patch('services.users_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [(USER_ID, USERNAME, EMAIL, FIRST_NAME, LAST_NAME, 0, 2)]
+
+            actual = users.find_auth_user(USERNAME)
+
+            self.assertEqual(AuthUser(USER_ID, USERNAME, EMAIL, FIRST_NAME, LAST_NAME, False, 2), actual)
+            self.assertFalse(hasattr(actual, 'password'))
+            self.assertNotIn('password', mock_read_query.call_args.args[0])
+
+    def test_findByUsernameCached_queriesOnce_forRepeatedLookups(self):
+        with patch('services.users_services.find_auth_user') as mock_find_by_name:
+            users.users_cache.clear()
+            mock_find_by_name.return_value = create_user()
+
+            first = users.find_by_username_cached(USERNAME)
+            second = users.find_by_username_cached(USERNAME)
+
+            self.assertEqual(first, second)
+            mock_find_by_name.assert_called_once_with(USERNAME)
+
+    def test_findByUsernameCached_doesNotCacheMissingUser(self):
+        with patch('services.users_services.find_auth_user') as mock_find_by_name:
+            users.users_cache.clear()
+            mock_find_by_name.return_value = None
+
+            users.find_by_username_cached(USERNAME)
+            users.find_by_username_cached(USERNAME)
+
+            self.assertEqual(2, mock_find_by_name.call_count)
+
+    def test_changePassword_invalidatesCachedUser_andRevokesTokens(self):
+        with patch('services.users_services.update_query') as mock_update_query, \
+                patch('services.users_services.read_query') as mock_read_query, \
+                patch('services.users_services.revoke_user_tokens') as mock_revoke:
+            users.users_cache.clear()
+            users.users_cache.set(USERNAME, create_user())
+            mock_read_query.return_value = [(USERNAME,)]
+
+            users.change_password(USER_ID, PASSWORD)
+
+            self.assertIsNone(users.users_cache.get(USERNAME))
+            mock_revoke.assert_called_once_with(USERNAME)
+            self.assertIn('token_version = token_version + 1', mock_update_query.call_args.args[0])
+
     def test_registerReturnsUser_ifSuccessful(self):
         with patch('services.users_services.hash_pass') as mock_hash_pass, \
                 patch('services.users_services.insert_query') as mock_register_user:
@@ -82,11 +128,11 @@ class UsersServices_Should(unittest.TestCase):
             mock_register_user.return_value = USER_ID
             expected = USER_ID
 
-            actual = users.register(user=UserRegister(username=USERNAME,
-                                                      password=PASSWORD,
-                                                      email=EMAIL,
-                                                      first_name=FIRST_NAME,
-                                                      last_name=LAST_NAME))
+            actual = asyncio.run(users.register(user=UserRegister(username=USERNAME,
+                                                                  password=PASSWORD,
+                                                                  email=EMAIL,
+                                                                  first_name=FIRST_NAME,
+                                                                  last_name=LAST_NAME)))
 
             self.assertEqual(expected, actual)
 
@@ -97,27 +143,54 @@ class UsersServices_Should(unittest.TestCase):
             mock_hash_pass.return_value = PASSWORD
             mock_register_user.side_effect = IntegrityError
 
-            result = users.register(user=UserRegister(username=USERNAME,
-                                                      password=PASSWORD,
-                                                      email=EMAIL,
-                                                      first_name=FIRST_NAME,
-                                                      last_name=LAST_NAME))
+            result = asyncio.run(users.register(user=UserRegister(username=USERNAME,
+                                                                  password=PASSWORD,
+                                                                  email=EMAIL,
+                                                                  first_name=FIRST_NAME,
+                                                                  last_name=LAST_NAME)))
             self.assertIsInstance(result, IntegrityError)
 
     def test_tryLogin_returnsUser_ifUserAndPass(self):
         with patch('services.users_services.find_by_username') as mock_find_user, \
-                patch('services.users_services.verify_password') as mock_verify_pass:
+                patch('services.users_services.verify_and_update_password') as mock_verify_pass:
 
             user = create_user()
             mock_find_user.return_value = user
-            mock_verify_pass.return_value = True
+            mock_verify_pass.return_value = (True, None)
             excepted = user
 
-            actual = users.try_login(
-                username=user.username, password=user.password)
+            actual = asyncio.run(users.try_login(
+                username=user.username, password=user.password))
 
             self.assertEqual(excepted, actual)
 
+    def test_tryLogin_rehashesPassword_ifHashOutdated(self):
+        with patch('services.users_services.find_by_username') as mock_find_user, \
+                patch('services.users_services.verify_and_update_password') as mock_verify_pass, \
+                patch('services.users_services.rehash_password') as mock_rehash_password:
+
+            user = create_user()
+            mock_find_user.return_value = user
+            mock_verify_pass.return_value = (True, 'new_hash')
+
+            actual = asyncio.run(users.try_login(username=user.username, password='plain'))
+
+            self.assertEqual('new_hash', actual.password)
+            mock_rehash_password.assert_called_once_with(USER_ID, 'new_hash')
+
+    def test_tryLogin_releasesConnection_beforeVerifyingPassword(self):
+        calls = []
+        with patch('services.users_services.find_by_username') as mock_find_user, \
+                patch('services.users_services.release_connection') as mock_release, \
+                patch('services.users_services.verify_and_update_password') as mock_verify_pass:
+            mock_find_user.return_value = create_user()
+            mock_release.side_effect = lambda: calls.append('release')
+            mock_verify_pass.side_effect = lambda *args: calls.append('verify') or (True, None)
+
+            asyncio.run(users.try_login(username=USERNAME, password=PASSWORD))
+
+            self.assertEqual(['release', 'verify'], calls)
+
     def test_tryLogin_returnsNone_ifNotUser(self):
         with patch('services.users_services.find_by_username') as mock_find_user:
 
@@ -125,22 +198,22 @@ class UsersServices_Should(unittest.TestCase):
             mock_find_user.return_value = None
             excepted = None
 
-            actual = users.try_login(
-                username=user.username, password=user.password)
+            actual = asyncio.run(users.try_login(
+                username=user.username, password=user.password))
 
             self.assertEqual(excepted, actual)
 
     def test_tryLogin_returnsNone_ifUserAndNotPass(self):
         with patch('services.users_services.find_by_username') as mock_find_user, \
-                patch('services.users_services.verify_password') as mock_verify_pass:
+                patch('services.users_services.verify_and_update_password') as mock_verify_pass:
 
             user = create_user()
             mock_find_user.return_value = user
-            mock_verify_pass.return_value = False
+            mock_verify_pass.return_value = (False, None)
             excepted = None
 
-            actual = users.try_login(
-                username=user.username, password=user.password)
+            actual = asyncio.run(users.try_login(
+                username=user.username, password=user.password))
 
             self.assertEqual(excepted, actual)
 
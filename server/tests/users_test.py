@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from unittest.mock import Mock, patch
 from routers import users
@@ -16,7 +17,7 @@ class UsersRouter_Should(unittest.TestCase):
             mock_register.return_value = user.user_id
             expected = f"User with ID: {user.user_id} registered"
 
-            actual = users.register_user(user=registration_info)
+            actual = asyncio.run(users.register_user(user=registration_info))
 
             self.assertEqual(expected, actual)
 
@@ -29,7 +30,7 @@ class UsersRouter_Should(unittest.TestCase):
             mock_register.side_effect = fake_integrity_error
 
             with self.assertRaises(HTTPException) as ex:
-                users.register_user(user=registration_info)
+                asyncio.run(users.register_user(user=registration_info))
 
                 self.assertEqual(400, ex.exception.status_code)
 
@@ -42,8 +43,8 @@ class UsersRouter_Should(unittest.TestCase):
             mock_create_token.return_value = fake_token
             expected = fake_token
 
-            actual = users.login(form_data=OAuth2PasswordRequestForm(
-                username=USERNAME, password=PASSWORD))
+            actual = asyncio.run(users.login(form_data=OAuth2PasswordRequestForm(
+                username=USERNAME, password=PASSWORD)))
 
             self.assertEqual(expected, actual)
 
@@ -54,8 +55,8 @@ class UsersRouter_Should(unittest.TestCase):
 
             with self.assertRaises(HTTPException) as ex:
 
-                users.login(form_data=OAuth2PasswordRequestForm(
-                    username=USERNAME, password=PASSWORD))
+                asyncio.run(users.login(form_data=OAuth2PasswordRequestForm(
+                    username=USERNAME, password=PASSWORD)))
 
                 self.assertEqual(401, ex.exception.status_code)
                 self.assertEqual("Invalid credentials", ex.exception.detail)
@@ -105,7 +106,7 @@ class UsersRouter_Should(unittest.TestCase):
             self.assertEqual(expected, actual)
 
     def test_changeUserPassword_returnsSuccessMessage_ifSuccessful(self):
-        with patch('routers.users.utils.verify_password') as mock_verify_pass, \
+        with patch('routers.users.users_services.verify_current_password') as mock_verify_pass, \
                 patch('routers.users.utils.hash_pass') as mock_hash_pass, \
                 patch('routers.users.users_services.change_password') as mock_change_pass:
             mock_verify_pass.return_value = True
@@ -115,54 +116,54 @@ class UsersRouter_Should(unittest.TestCase):
                 current_password='password', new_password='somepass', confirm_password='somepass')
             expected = 'Password changed successfully'
 
-            actual = users.change_user_password(data, fake_user())
+            actual = asyncio.run(users.change_user_password(data, fake_user()))
 
             self.assertEqual(expected, actual)
 
     def test_changeUserPassword_raises401_ifCurrentPassNotMatch(self):
-        with patch('routers.users.utils.verify_password') as mock_verify_pass:
+        with patch('routers.users.users_services.verify_current_password') as mock_verify_pass:
             mock_verify_pass.return_value = False
             data = Mock()
 
             with self.assertRaises(HTTPException) as ex:
-                users.change_user_password(data, fake_user())
+                asyncio.run(users.change_user_password(data, fake_user()))
 
                 self.assertEqual(401, ex.exception.status_code)
                 self.assertEqual(
                     "Current password does not match", ex.exception.detail)
 
     def test_change_UserPassword_raises401_ifNewPasswordNotMatch(self):
-        with patch('routers.users.utils.verify_password') as mock_verify_pass:
+        with patch('routers.users.users_services.verify_current_password') as mock_verify_pass:
             mock_verify_pass.return_value = True
             data = UserChangePassword(
                 current_password='password', new_password='somepass', confirm_password='pass')
 
             with self.assertRaises(HTTPException) as ex:
-                users.change_user_password(data, fake_user())
+                asyncio.run(users.change_user_password(data, fake_user()))
 
                 self.assertEqual(401, ex.exception.status_code)
                 self.assertEqual("New password does not match",
                                  ex.exception.detail)
 
     def test_deleteReturnsNone_ifSuccess(self):
-        with patch('routers.users.utils.verify_password') as mock_verify_pass, \
+        with patch('routers.users.users_services.verify_current_password') as mock_verify_pass, \
                 patch('routers.users.users_services.delete') as mock_delete:
             mock_verify_pass.return_value = True
             mock_delete.return_value = True
             expected = None
 
-            actual = users.delete_user_by_id(
-                existing_user=fake_user(), body=UserDelete(current_password=PASSWORD))
+            actual = asyncio.run(users.delete_user_by_id(
+                existing_user=fake_user(), body=UserDelete(current_password=PASSWORD)))
 
             self.assertEqual(expected, actual)
 
     def test_delete_raises400_ifCurrentPasswordNotMatch(self):
-        with patch('routers.users.utils.verify_password') as mock_verify_pass:
+        with patch('routers.users.users_services.verify_current_password') as mock_verify_pass:
             mock_verify_pass.return_value = False
 
             with self.assertRaises(HTTPException) as ex:
-                users.delete_user_by_id(existing_user=fake_user(
-                ), body=UserDelete(current_password=PASSWORD))
+                asyncio.run(users.delete_user_by_id(existing_user=fake_user(
+                ), body=UserDelete(current_password=PASSWORD)))
 
                 self.assertEqual(400, ex.exception.status_code)
                 self.assertEqual("Current password does not match", ex.exception.detail)
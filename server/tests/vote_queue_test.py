@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+from mariadb import IntegrityError
+from services.vote_queue import VoteQueue, apply_votes
+from common.responses import HTTPTooManyRequests
+from tests.test_utils import REPLY_ID, USER_ID
+
+OTHER_USER_ID = 2
+
+
+class VoteQueue_Should(unittest.TestCase):
+
+    def test_put_coalescesVotesOfSameUserAndReply(self):
+        queue = VoteQueue()
+
+        queue.put(USER_ID, REPLY_ID, 'up')
+        queue.put(USER_ID, REPLY_ID, 'down')
+        queue.put(USER_ID, REPLY_ID, None)
+
+        stats = queue.stats()
+        self.assertEqual(1, stats['depth'])
+        self.assertEqual(2, stats['coalesced'])
+
+    def test_put_raisesTooManyRequests_whenFull(self):
+        queue = VoteQueue(max_pending=1)
+        queue.put(USER_ID, REPLY_ID, 'up')
+
+        with self.assertRaises(HTTPTooManyRequests):
+            queue.put(OTHER_USER_ID, REPLY_ID, 'up')
+
+    def test_flush_writesLatestVotes(self):
+        queue = VoteQueue()
+        queue.put(USER_ID, REPLY_ID, 'up')
+        queue.put(USER_ID, REPLY_ID, 'down')
+
+        with patch('services.vote_queue.apply_votes') as mock_apply_votes:
+            self.assertEqual(1, queue.flush())
+
+        mock_apply_votes.assert_called_once_with({(USER_ID, REPLY_ID): 'down'})
+        self.assertEqual(0, queue.stats()['depth'])
+
+    def test_flush_keepsVotes_whenWriteFails(self):
+        queue = VoteQueue()
+        queue.put(USER_ID, REPLY_ID, 'up')
+
+        with patch('services.vote_queue.apply_votes', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            queue.flush()
+
+        self.assertEqual(1, queue.stats()['depth'])
+        self.assertEqual(1, queue.failures)
+
+    def test_flush_dropsVotesThatCannotBeWritten_andWritesTheOthers(self):
+        queue = VoteQueue()
+        queue.put(USER_ID, REPLY_ID, 'up')
+        queue.put(OTHER_USER_ID, REPLY_ID, 'up')
+
+        def apply_votes(votes):
+            if (USER_ID, REPLY_ID) in votes:
+                raise IntegrityError('reply no longer exists')
+
+        with patch('services.vote_queue.apply_votes', side_effect=apply_votes) as mock_apply_votes:
+            self.assertEqual(1, queue.flush())
+
+        mock_apply_votes.assert_called_with({(OTHER_USER_ID, REPLY_ID): 'up'})
+        self.assertEqual(0, queue.stats()['depth'])
+        self.assertEqual(1, queue.stats()['dropped'])
+
+    def test_stop_flushesPendingVotes(self):
+        queue = VoteQueue(interval=60)
+        queue.start()
+        queue.put(USER_ID, REPLY_ID, 'up')
+
+        with patch('services.vote_queue.apply_votes') as mock_apply_votes:
+            queue.stop()
+
+        mock_apply_votes.assert_called_once_with({(USER_ID, REPLY_ID): 'up'})
+
+
+class ApplyVotes_Should(unittest.TestCase):
+
+    def test_upsertsRemovesAndAdjustsTallies(self):
+        with patch('services.vote_queue.read_query') as mock_read_query, \
+                patch('services.vote_queue.publish_tallies') as mock_publish_tallies, \
+                patch('services.vote_queue.insert_query') as mock_insert_query, \
+                patch('services.vote_queue.update_query') as mock_update_query:
+            # user 1 switches up -> down, user 2 removes a downvote
+            mock_read_query.return_value = [(USER_ID, REPLY_ID, 1), (OTHER_USER_ID, REPLY_ID, 0)]
+
+            apply_votes({(USER_ID, REPLY_ID): 'down', (OTHER_USER_ID, REPLY_ID): None})
+
+            self.assertEqual((USER_ID, REPLY_ID, 0), mock_insert_query.call_args.args[1])
+            self.assertEqual(
+                ('DELETE FROM votes WHERE (user_id, reply_id) IN ((?,?))', (OTHER_USER_ID, REPLY_ID)),
+                mock_update_query.call_args_list[0].args)
+            self.assertEqual((-1, 0, REPLY_ID), mock_update_query.call_args_list[1].args[1])
+            mock_publish_tallies.assert_called_once_with([REPLY_ID])
+
+    def test_skipsUnchangedVotes(self):
+        with patch('services.vote_queue.read_query') as mock_read_query, \
+                patch('services.vote_queue.insert_query') as mock_insert_query, \
+                patch('services.vote_queue.update_query') as mock_update_query:
+            mock_read_query.return_value = [(USER_ID, REPLY_ID, 1)]
+
+            apply_votes({(USER_ID, REPLY_ID): 'up'})
+
+            mock_insert_query.assert_not_called()
+            mock_update_query.assert_not_called()
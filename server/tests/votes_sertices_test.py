@@ -1,6 +1,7 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, call
 from services import votes_services as votes
+from data.models.vote import VoteTally
 from tests.test_utils import REPLY_ID, USER_ID, VOTE_TYPE_INT, VOTE_TYPE_STR
 
 
@@ -50,3 +51,100 @@ class VotesServices_Should(unittest.TestCase):
                 reply_id=REPLY_ID, user_id=USER_ID)
 
             self.assertEqual(expected, actual)
+
+    def test_getTally_returnsVoteTally_ifReply(self):
+        with patch('services.votes_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [(3, 1, 2)]
+
+            actual = votes.get_tally(reply_id=REPLY_ID)
+
+            self.assertEqual(VoteTally(upvotes=3, downvotes=1, score=2), actual)
+
+    def test_getUserVotes_returnsVoteTypesByReply(self):
+        with patch('services.votes_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [(1, 1), (3, 0)]
+
+            actual = votes.get_user_votes(user_id=USER_ID, reply_ids=[1, 2, 3])
+
+            self.assertEqual({1: 'up', 3: 'down'}, actual)
+            mock_read_query.assert_called_once_with(
+                'SELECT reply_id, type FROM votes WHERE user_id = ? AND reply_id IN (?,?,?)',
+                (USER_ID, 1, 2, 3))
+
+    def test_addVote_incrementsTallyOfType(self):
+        with patch('services.votes_services.insert_query'), \
+                patch('services.votes_services.publish_tallies'), \
+                patch('services.votes_services.update_query') as mock_update_query:
+            votes.add_vote(user_id=USER_ID, reply_id=REPLY_ID, type='down')
+
+            mock_update_query.assert_called_once_with(
+                'UPDATE replies SET downvotes = downvotes + ? WHERE reply_id = ?', (1, REPLY_ID))
+
+    def test_switchVote_movesTallyBetweenTypes(self):
+        with patch('services.votes_services.read_query', return_value=[(1,)]), \
+                patch('services.votes_services.publish_tallies'), \
+                patch('services.votes_services.update_query') as mock_update_query:
+            switched = votes.switch_vote(user_id=USER_ID, reply_id=REPLY_ID, type='up')
+
+            self.assertTrue(switched)
+            self.assertEqual(
+                [call('UPDATE replies SET upvotes = upvotes + ? WHERE reply_id = ?', (-1, REPLY_ID)),
+                 call('UPDATE replies SET downvotes = downvotes + ? WHERE reply_id = ?', (1, REPLY_ID))],
+                mock_update_query.call_args_list[1:])
+
+    def test_switchVote_leavesTallies_whenVoteAlreadySwitchedOrDeleted(self):
+        for locked_vote in ([(0,)], []):
+            with patch('services.votes_services.read_query', return_value=locked_vote), \
+                    patch('services.votes_services.publish_tallies') as mock_publish_tallies, \
+                    patch('services.votes_services.update_query') as mock_update_query:
+                switched = votes.switch_vote(user_id=USER_ID, reply_id=REPLY_ID, type='up')
+
+                self.assertFalse(switched)
+                mock_update_query.assert_not_called()
+                mock_publish_tallies.assert_not_called()
+
+    def test_deleteVote_decrementsTally_ifVote(self):
+        with patch('services.votes_services.read_query') as mock_read_query, \
+                patch('services.votes_services.publish_tallies') as mock_publish_tallies, \
+                patch('services.votes_services.update_query') as mock_update_query:
+            mock_read_query.return_value = [(VOTE_TYPE_INT,)]
+
+            votes.delete_vote(reply_id=REPLY_ID, user_id=USER_ID)
+
+            mock_update_query.assert_called_with(
+                'UPDATE replies SET upvotes = upvotes + ? WHERE reply_id = ?', (-1, REPLY_ID))
+            mock_publish_tallies.assert_called_once_with([REPLY_ID])
+
+    def test_publishTallies_publishesTallyToTopicChannel(self):
+        with patch('services.votes_services.read_query') as mock_read_query, \
+                patch('services.votes_services.publish_event') as mock_publish_event:
+            mock_read_query.return_value = [(REPLY_ID, 4, 3, 1, 2)]
+
+            votes.publish_tallies([REPLY_ID])
+
+            mock_publish_event.assert_called_once_with(
+                'topic:4', 'votes_changed', {'reply_id': REPLY_ID, 'upvotes': 3, 'downvotes': 1, 'score': 2})
+
+    def test_deleteVote_changesNothing_ifNotVote(self):
+        with patch('services.votes_services.read_query') as mock_read_query, \
+                patch('services.votes_services.update_query') as mock_update_query:
+            mock_read_query.return_value = []
+
+            votes.delete_vote(reply_id=REPLY_ID, user_id=USER_ID)
+
+            mock_update_query.assert_not_called()
+
+    def test_reconcileTallies_updatesOnlyRepliesWithWrongTallies(self):
+        with patch('services.votes_services.read_query') as mock_read_query, \
+                patch('services.votes_services.update_query') as mock_update_query, \
+                patch('services.votes_services.invalidate_responses') as mock_invalidate, \
+                patch('services.votes_services.topic_ranking') as mock_ranking:
+            mock_read_query.side_effect = [[(25,)], [], [(12, 4), (15, 4)], []]
+
+            scanned = votes.reconcile_tallies(batch_size=10)
+
+            self.assertEqual(25, scanned)
+            self.assertEqual([(11, 20, 11, 20)], [c.args[1] for c in mock_read_query.call_args_list[2:3]])
+            self.assertEqual([(11, 20, 12, 15)], [c.args[1] for c in mock_update_query.call_args_list])
+            mock_invalidate.assert_called_once_with('reply:12', 'reply:15')
+            mock_ranking.touch.assert_called_once_with(4)
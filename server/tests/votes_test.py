@@ -68,6 +68,22 @@ class VotesRouter_Should(unittest.TestCase):
 
             self.assertEqual(expected, actual)
 
+    def test_getAllVotesForReply_returnsTally_ifNoType(self):
+        with patch('routers.votes.topic_exists') as mock_t_exists, \
+                patch('routers.votes.reply_exists') as mock_r_exists, \
+                patch('routers.votes.can_user_access_topic_content') as mock_access, \
+                patch('routers.votes.votes_services.get_tally') as mock_get_tally:
+
+            mock_t_exists.return_value = True
+            mock_r_exists.return_value = True
+            mock_access.return_value = (True, 'OK')
+            mock_get_tally.return_value = fake_tally = Mock()
+
+            actual = votes_router.get_all_votes_for_reply_by_type(
+                reply_id=REPLY_ID, topic_id=TOPIC_ID, current_user=fake_user())
+
+            self.assertEqual(fake_tally, actual)
+
     def test_addOrSwitch_raises404_ifNoSuchTopic(self):
         with patch('routers.votes.topic_exists') as mock_exists:
             mock_exists.return_value = False
@@ -172,6 +188,26 @@ class VotesRouter_Should(unittest.TestCase):
 
             self.assertEqual(expected, actual)
 
+    def test_addOrSwitch_returnsNotSwitched_ifVoteChangedConcurrently(self):
+        with patch('routers.votes.topic_exists') as mock_t_exists, \
+                patch('routers.votes.reply_exists') as mock_r_exists, \
+                patch('routers.votes.can_user_access_topic_content') as mock_access, \
+                patch('routers.votes.votes_services.get_vote_with_type') as mock_v_exists, \
+                patch('routers.votes.votes_services.switch_vote') as mock_switch_vote:
+
+            mock_t_exists.return_value = True
+            mock_r_exists.return_value = True
+            mock_access.return_value = (True, 'OK')
+            mock_v_exists.return_value = VOTE_TYPE_STR
+            mock_switch_vote.return_value = False
+
+            expected = f'Your vote for REPLY with ID: {REPLY_ID} changed meanwhile, it was not switched'
+
+            actual = votes_router.add_or_switch(
+                type=NEW_VOTE_TYPE, reply_id=REPLY_ID, topic_id=TOPIC_ID, current_user=fake_user())
+
+            self.assertEqual(expected, actual)
+
     def test_removeVote_raises404_ifNoSuchTopic(self):
         with patch('routers.votes.topic_exists') as mock_exists:
             mock_exists.return_value = False